@@ -18,7 +18,7 @@ if config.config_file_name is not None:
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app.database import Base
-from app.models import User, Spot, Comment  # Make sure all models are imported
+from app.models import User, Spot, Comment, Vote, SpotGridCell, TrendingEpoch, Job, Photo, SpotPhoto  # Make sure all models are imported
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,43 @@
+"""add spot_grid_cells for heatmap aggregates
+
+Revision ID: 3b7e2c91d4a5
+Revises: 846662e0f76b
+Create Date: 2026-10-19 10:12:03.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import heatmap
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e2c91d4a5'
+down_revision: Union[str, None] = '846662e0f76b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('spot_grid_cells',
+    sa.Column('geohash', sa.String(length=12), nullable=False),
+    sa.Column('precision', sa.SmallInteger(), nullable=False),
+    sa.Column('center_lon', sa.Float(), nullable=False),
+    sa.Column('center_lat', sa.Float(), nullable=False),
+    sa.Column('spot_count', sa.Integer(), nullable=False),
+    sa.Column('vote_count', sa.Integer(), nullable=False),
+    sa.Column('comment_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('geohash')
+    )
+    op.create_index('ix_spot_grid_cells_precision_lat_lon', 'spot_grid_cells', ['precision', 'center_lat', 'center_lon'], unique=False)
+
+    # Backfill from existing spots, votes and comments with the same SQL as
+    # the heatmap.rebuild job.
+    for statement in heatmap.REBUILD:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_spot_grid_cells_precision_lat_lon', table_name='spot_grid_cells')
+    op.drop_table('spot_grid_cells')
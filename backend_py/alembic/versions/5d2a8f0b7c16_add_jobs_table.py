@@ -0,0 +1,46 @@
+"""add jobs table for background work
+
+Revision ID: 5d2a8f0b7c16
+Revises: 9c41f6a8e2b3
+Create Date: 2026-10-19 14:05:51.337620
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a8f0b7c16'
+down_revision: Union[str, None] = '9c41f6a8e2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(length=64), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='queued', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('max_attempts', sa.Integer(), server_default='5', nullable=False),
+    sa.Column('dedupe_key', sa.String(length=200), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_queued_run_at', 'jobs', ['run_at'], unique=False, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('uq_jobs_queued_dedupe_key', 'jobs', ['dedupe_key'], unique=True, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_jobs_kind_finished_at', 'jobs', ['kind', 'finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_kind_finished_at', table_name='jobs')
+    op.drop_index('uq_jobs_queued_dedupe_key', table_name='jobs', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_index('ix_jobs_queued_run_at', table_name='jobs', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_table('jobs')
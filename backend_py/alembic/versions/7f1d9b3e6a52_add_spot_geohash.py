@@ -0,0 +1,41 @@
+"""add generated geohash column to spots
+
+Revision ID: 7f1d9b3e6a52
+Revises: e3b58f1a7c04
+Create Date: 2026-10-19 19:40:18.114360
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f1d9b3e6a52'
+down_revision: Union[str, None] = 'e3b58f1a7c04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A stored generated column: adding it rewrites the table, which fills in
+    # the geohash of every existing spot, and Postgres keeps it current on
+    # insert and on location updates.
+    op.add_column(
+        'spots',
+        sa.Column(
+            'geohash',
+            sa.String(length=9, collation='C'),
+            sa.Computed('ST_GeoHash(location, 9)', persisted=True),
+            nullable=True,
+        ),
+    )
+    # "C" collation makes the default btree opclass byte ordered, so prefix
+    # ranges (and LIKE 'prefix%') use it.
+    op.create_index('ix_spots_geohash', 'spots', ['geohash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_spots_geohash', table_name='spots')
+    op.drop_column('spots', 'geohash')
@@ -0,0 +1,66 @@
+"""add trending_score to spots and trending_epoch
+
+Revision ID: 9c41f6a8e2b3
+Revises: 3b7e2c91d4a5
+Create Date: 2026-10-19 11:40:27.902114
+
+"""
+from typing import Sequence, Union
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41f6a8e2b3'
+down_revision: Union[str, None] = '3b7e2c91d4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match the defaults in app/trending.py
+HALF_LIFE_HOURS = 72
+VOTE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+NEW_SPOT_WEIGHT = 1.0
+
+
+def upgrade() -> None:
+    op.add_column('spots', sa.Column('trending_score', sa.Float(), server_default='0', nullable=False))
+    op.create_index('ix_spots_trending_score', 'spots', [sa.text('trending_score DESC')], unique=False)
+
+    op.create_table('trending_epoch',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('epoch', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO trending_epoch (id, epoch) VALUES (1, timezone('utc', now()))")
+
+    # Backfill: with the epoch at "now", each event contributes its fully
+    # decayed weight exp(-λ·age).
+    decay = math.log(2) / (HALF_LIFE_HOURS * 3600)
+    op.execute(f"""
+        UPDATE spots s
+        SET trending_score = {NEW_SPOT_WEIGHT}
+                * exp(-{decay} * extract(epoch FROM timezone('utc', now()) - s2.created_at))
+            + COALESCE(v.score, 0) + COALESCE(c.score, 0)
+        FROM spots s2
+        LEFT JOIN (
+            SELECT spot_id,
+                   sum(value * {VOTE_WEIGHT}
+                       * exp(-{decay} * extract(epoch FROM timezone('utc', now()) - created_at))) AS score
+            FROM votes GROUP BY spot_id
+        ) v ON v.spot_id = s2.id
+        LEFT JOIN (
+            SELECT spot_id,
+                   sum({COMMENT_WEIGHT}
+                       * exp(-{decay} * extract(epoch FROM timezone('utc', now()) - created_at))) AS score
+            FROM comments GROUP BY spot_id
+        ) c ON c.spot_id = s2.id
+        WHERE s.id = s2.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('trending_epoch')
+    op.drop_index('ix_spots_trending_score', table_name='spots')
+    op.drop_column('spots', 'trending_score')
@@ -0,0 +1,65 @@
+"""content-addressed photos with reference counting
+
+Revision ID: a81c3e5f9d27
+Revises: 5d2a8f0b7c16
+Create Date: 2026-10-19 16:22:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81c3e5f9d27'
+down_revision: Union[str, None] = '5d2a8f0b7c16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('photos',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('bytes', sa.Integer(), nullable=True),
+    sa.Column('variants', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('spot_photos',
+    sa.Column('spot_id', sa.UUID(), nullable=False),
+    sa.Column('photo_sha256', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['photo_sha256'], ['photos.sha256'], ),
+    sa.ForeignKeyConstraint(['spot_id'], ['spots.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('spot_id', 'photo_sha256')
+    )
+    op.create_index(op.f('ix_spot_photos_photo_sha256'), 'spot_photos', ['photo_sha256'], unique=False)
+
+    # Existing URLs are hashed and moved over by the photos.import_legacy job,
+    # which needs object storage access a migration does not have.
+    op.alter_column('spots', 'photos', new_column_name='legacy_photos')
+    op.execute("""
+        INSERT INTO jobs (id, kind, payload, status, attempts, max_attempts, created_at, run_at)
+        SELECT gen_random_uuid(), 'photos.import_legacy', '{}'::jsonb, 'queued', 0, 5,
+               timezone('utc', now()), timezone('utc', now())
+        WHERE EXISTS (
+            SELECT 1 FROM spots
+            WHERE jsonb_typeof(legacy_photos) = 'array' AND legacy_photos <> '[]'::jsonb
+        )
+    """)
+
+
+def downgrade() -> None:
+    # Photos attached since the upgrade are not copied back.
+    op.alter_column('spots', 'legacy_photos', new_column_name='photos')
+    op.drop_index(op.f('ix_spot_photos_photo_sha256'), table_name='spot_photos')
+    op.drop_table('spot_photos')
+    op.drop_table('photos')
@@ -0,0 +1,107 @@
+"""partition votes by spot and comments by month
+
+Revision ID: b5e08c4d1f39
+Revises: 7f1d9b3e6a52
+Create Date: 2026-10-19 20:06:51.730442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e08c4d1f39'
+down_revision: Union[str, None] = '7f1d9b3e6a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.partitions.VOTE_PARTITIONS.
+VOTE_PARTITIONS = 16
+# Months created past the current one; the partitions.comments job keeps
+# this topped up afterwards.
+COMMENT_MONTHS_AHEAD = 3
+
+# Rows are copied into the new tables before their constraints and indexes
+# exist, which is much faster than maintaining them row by row. Both tables
+# are locked against writes until the migration commits.
+
+
+def upgrade() -> None:
+    op.execute("LOCK TABLE votes, comments IN ACCESS EXCLUSIVE MODE")
+
+    op.execute("CREATE TABLE votes_new (LIKE votes INCLUDING DEFAULTS) PARTITION BY HASH (spot_id)")
+    for remainder in range(VOTE_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE votes_p{remainder:02d} PARTITION OF votes_new "
+            f"FOR VALUES WITH (MODULUS {VOTE_PARTITIONS}, REMAINDER {remainder})"
+        )
+    op.execute("INSERT INTO votes_new SELECT * FROM votes")
+    op.execute("DROP TABLE votes")
+    op.execute("ALTER TABLE votes_new RENAME TO votes")
+    op.create_primary_key('votes_pkey', 'votes', ['id', 'spot_id'])
+    op.create_unique_constraint('uq_user_spot_vote', 'votes', ['user_id', 'spot_id'])
+    op.create_foreign_key('votes_spot_id_fkey', 'votes', 'spots', ['spot_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('votes_user_id_fkey', 'votes', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    # Scores and cascading spot deletes look votes up by spot.
+    op.create_index('ix_votes_spot_id', 'votes', ['spot_id'], unique=False)
+
+    op.execute("CREATE TABLE comments_new (LIKE comments INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    # One partition per month from the oldest comment (or now) to a few
+    # months ahead, named like app.partitions.comment_partition_name.
+    op.execute(f"""
+DO $$
+DECLARE
+    month date := date_trunc('month', COALESCE(
+        (SELECT min(created_at) FROM comments), timezone('utc', now())));
+    last date := date_trunc('month', timezone('utc', now())) + interval '{COMMENT_MONTHS_AHEAD} months';
+BEGIN
+    WHILE month <= last LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF comments_new FOR VALUES FROM (%L) TO (%L)',
+            'comments_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+            month, month + interval '1 month');
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$
+""")
+    op.execute("CREATE TABLE comments_default PARTITION OF comments_new DEFAULT")
+    op.execute("INSERT INTO comments_new SELECT * FROM comments")
+    op.execute("DROP TABLE comments")
+    op.execute("ALTER TABLE comments_new RENAME TO comments")
+    op.create_primary_key('comments_pkey', 'comments', ['id', 'created_at'])
+    op.create_foreign_key(
+        'comments_spot_id_fkey', 'comments', 'spots', ['spot_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key('comments_user_id_fkey', 'comments', 'users', ['user_id'], ['id'])
+    op.create_index('ix_comments_spot_id', 'comments', ['spot_id'], unique=False)
+    # The separate ix_votes_id / ix_comments_id indexes are not recreated:
+    # lookups by id use the leading column of the primary keys.
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE votes, comments IN ACCESS EXCLUSIVE MODE")
+
+    op.execute("CREATE TABLE votes_old (LIKE votes INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO votes_old SELECT * FROM votes")
+    op.execute("DROP TABLE votes")  # drops the partitions too
+    op.execute("ALTER TABLE votes_old RENAME TO votes")
+    op.create_primary_key('votes_pkey', 'votes', ['id'])
+    op.create_unique_constraint('uq_user_spot_vote', 'votes', ['user_id', 'spot_id'])
+    op.create_foreign_key('votes_spot_id_fkey', 'votes', 'spots', ['spot_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('votes_user_id_fkey', 'votes', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_votes_id', 'votes', ['id'], unique=False)
+
+    op.execute("CREATE TABLE comments_old (LIKE comments INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO comments_old SELECT * FROM comments")
+    op.execute("DROP TABLE comments")
+    op.execute("ALTER TABLE comments_old RENAME TO comments")
+    op.create_primary_key('comments_pkey', 'comments', ['id'])
+    op.create_foreign_key(
+        'comments_spot_id_fkey', 'comments', 'spots', ['spot_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_foreign_key('comments_user_id_fkey', 'comments', 'users', ['user_id'], ['id'])
+    op.create_index('ix_comments_id', 'comments', ['id'], unique=False)
+    op.create_index('ix_comments_spot_id', 'comments', ['spot_id'], unique=False)
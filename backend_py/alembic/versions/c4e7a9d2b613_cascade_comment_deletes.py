@@ -0,0 +1,33 @@
+"""delete comments with their spot in the database
+
+Revision ID: c4e7a9d2b613
+Revises: a81c3e5f9d27
+Create Date: 2026-10-19 18:41:05.527194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a9d2b613'
+down_revision: Union[str, None] = 'a81c3e5f9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_constraint('comments_spot_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key(
+        'comments_spot_id_fkey', 'comments', 'spots', ['spot_id'], ['id'], ondelete='CASCADE'
+    )
+    # Loading a spot's comments by spot goes through this instead of a scan.
+    op.create_index(op.f('ix_comments_spot_id'), 'comments', ['spot_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_comments_spot_id'), table_name='comments')
+    op.drop_constraint('comments_spot_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key('comments_spot_id_fkey', 'comments', 'spots', ['spot_id'], ['id'])
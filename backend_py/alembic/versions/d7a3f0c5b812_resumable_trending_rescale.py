@@ -0,0 +1,28 @@
+"""track batched trending rescales on trending_epoch
+
+Revision ID: d7a3f0c5b812
+Revises: b5e08c4d1f39
+Create Date: 2026-10-20 09:12:44.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f0c5b812'
+down_revision: Union[str, None] = 'b5e08c4d1f39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trending_epoch', sa.Column('pending_epoch', sa.DateTime(), nullable=True))
+    op.add_column('trending_epoch', sa.Column('rescaled_below', postgresql.UUID(as_uuid=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('trending_epoch', 'rescaled_below')
+    op.drop_column('trending_epoch', 'pending_epoch')
@@ -0,0 +1,33 @@
+"""indexes for spot duplicate detection
+
+Revision ID: e3b58f1a7c04
+Revises: c4e7a9d2b613
+Create Date: 2026-10-19 19:12:47.302815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b58f1a7c04'
+down_revision: Union[str, None] = 'c4e7a9d2b613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # similarity() for name matching (app/duplicates.py).
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # ST_DWithin in metres on CAST(location AS geography), used by duplicate
+    # checks and /spots/nearby, can only use an index on that expression.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_spots_location_geography "
+        "ON spots USING gist ((CAST(location AS geography)))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_spots_location_geography")
@@ -0,0 +1,110 @@
+"""Small in-process caches for hot read paths."""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, Set, Tuple, TypeVar
+
+from . import metrics
+from .singleflight import SingleFlight
+
+T = TypeVar("T")
+
+
+class SWRCache(Generic[T]):
+    """LRU cache with a freshness TTL and a stale-while-revalidate window.
+
+    * fresh (age < ``ttl``): served from memory.
+    * stale (age < ``ttl + stale_ttl``): served from memory immediately while a
+      background refresh replaces it.
+    * missing/expired: loaded inline; concurrent misses for the same key share
+      one load.
+
+    ``None`` results (e.g. "not found") are not cached. Each worker process
+    has its own cache, so invalidation is per process and ``ttl`` bounds how
+    stale other workers can be.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int = 10_000):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[T, float]]" = OrderedDict()
+        self._flight = SingleFlight(f"{name}_load")
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Bumped on every invalidation; loads that started before an
+        # invalidation must not store their (possibly outdated) result.
+        self._epoch = 0
+
+    def _store(self, key: Hashable, value: Optional[T], epoch: int) -> None:
+        if value is None or epoch != self._epoch:
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Optional[T]]],
+        refresher: Callable[[], Awaitable[Optional[T]]],
+    ) -> Optional[T]:
+        """Return the cached value for ``key``.
+
+        ``loader`` runs inline on a miss (it may use the request's session);
+        ``refresher`` runs in the background after the response is sent, so
+        it must open its own session.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                metrics.record_cache(self.name, hit=True)
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                metrics.record_cache(self.name, hit=True)
+                self._revalidate(key, refresher)
+                return value
+            del self._entries[key]
+
+        metrics.record_cache(self.name, hit=False)
+        epoch = self._epoch
+        value = await self._flight.do(key, loader)
+        self._store(key, value, epoch)
+        return value
+
+    def _revalidate(self, key: Hashable, refresher: Callable[[], Awaitable[Optional[T]]]) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        epoch = self._epoch
+
+        async def run() -> None:
+            try:
+                value = await refresher()
+                if value is None:
+                    self._entries.pop(key, None)
+                else:
+                    self._store(key, value, epoch)
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(run())
+        # Hold a reference so the task is not garbage collected mid-flight.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._epoch += 1
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
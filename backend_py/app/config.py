@@ -2,7 +2,8 @@ from functools import lru_cache
 from pydantic import Field
 from pydantic_settings import BaseSettings
 import os
-import boto3
+
+from . import tracing
 
 
 class Settings(BaseSettings):
@@ -25,11 +26,32 @@ R2_BUCKET = os.getenv("R2_BUCKET")
 R2_ENDPOINT = os.getenv("R2_ENDPOINT")
 R2_TOKEN = os.getenv("R2_TOKEN")
 
+_r2_client = None
+
+
 def get_r2_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=R2_ENDPOINT,
-        aws_access_key_id=R2_ACCOUNT_ID,
-        aws_secret_access_key=R2_TOKEN,
-        region_name="auto",
-    ) 
\ No newline at end of file
+    """Return the worker's shared R2 (S3) client, creating it on first use.
+
+    boto3 is imported lazily: it adds noticeably to import time and most
+    requests never touch object storage.
+    """
+    global _r2_client
+    if _r2_client is None:
+        import boto3
+
+        _r2_client = boto3.client(
+            "s3",
+            endpoint_url=R2_ENDPOINT,
+            aws_access_key_id=R2_ACCOUNT_ID,
+            aws_secret_access_key=R2_TOKEN,
+            region_name="auto",
+        )
+        tracing.instrument_boto_client(_r2_client)
+    return _r2_client
+
+
+def reset_r2_client() -> None:
+    """Forget the cached client (e.g. one inherited across a fork)."""
+    global _r2_client
+    _r2_client = None
+ 
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""Request-scoped batching of lookups by key ("DataLoader").
+
+Code that needs "the user with this id" or "the comments of this spot" calls
+``await loader.load(key)`` wherever it is convenient. Every key requested in
+the same event-loop turn is collected and fetched with a single ``WHERE key
+IN (...)`` query, and each result is cached for the rest of the request. A
+page of N spots then costs one query per kind of data instead of N round
+trips, however the code that asks is structured.
+
+Handlers get the loaders for their request from :func:`get_loaders`. They
+share the request's read session, and their queries are serialised on it
+because an ``AsyncSession`` cannot run two statements at once.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, TypeVar
+from uuid import UUID
+
+from fastapi import Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import schemas
+from .database import get_read_db
+from .models import Comment, Photo, Spot, SpotPhoto, User, Vote
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchFn = Callable[[List[K]], Awaitable[Dict[K, V]]]
+
+
+class DataLoader(Generic[K, V]):
+    """Coalesce ``load(key)`` calls into one ``batch(keys)`` call per event-loop turn.
+
+    ``batch`` returns a mapping; keys it leaves out resolve to ``default()``
+    (None if no default is given). A failed batch fails every load waiting
+    on it and is not cached.
+    """
+
+    def __init__(self, batch: BatchFn, default: Optional[Callable[[], V]] = None):
+        self._batch = batch
+        self._default = default
+        self._cache: Dict[K, asyncio.Future] = {}
+        self._queue: List[K] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _future(self, key: K) -> asyncio.Future:
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Runs after every coroutine already scheduled for this turn
+                # has had the chance to add its keys.
+                loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._run(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: List[K]) -> None:
+        try:
+            values = await self._batch(keys)
+        except asyncio.CancelledError:
+            for key in keys:
+                self._cache.pop(key).cancel()
+            raise
+        except Exception as exc:
+            for key in keys:
+                self._cache.pop(key).set_exception(exc)
+            return
+        for key in keys:
+            if key in values:
+                value = values[key]
+            else:
+                value = self._default() if self._default else None
+            self._cache[key].set_result(value)
+
+    def prime(self, key: K, value: V) -> None:
+        """Cache a value fetched some other way so later loads skip the query."""
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._cache[key] = future
+
+    async def load(self, key: K) -> V:
+        # Shielded: one caller being cancelled must not cancel the shared result.
+        return await asyncio.shield(self._future(key))
+
+    async def load_many(self, keys: Iterable[K]) -> List[V]:
+        futures = [self._future(key) for key in keys]
+        return list(await asyncio.shield(asyncio.gather(*futures))) if futures else []
+
+
+class Loaders:
+    """The loaders for one request, all on the request's session."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._lock = asyncio.Lock()
+        self.users: DataLoader[UUID, Optional[User]] = DataLoader(self._users)
+        self.spots: DataLoader[UUID, Optional[Spot]] = DataLoader(self._spots)
+        self.spots_by_short_id: DataLoader[str, Optional[Spot]] = DataLoader(self._spots_by_short_id)
+        self.scores: DataLoader[UUID, int] = DataLoader(self._scores, default=int)
+        self.comments: DataLoader[UUID, List[Comment]] = DataLoader(self._comments, default=list)
+        self.photos: DataLoader[UUID, List[Photo]] = DataLoader(self._photos, default=list)
+        self._recent_comments: Dict[int, DataLoader[UUID, List[Comment]]] = {}
+
+    async def _execute(self, stmt):
+        async with self._lock:
+            return await self.db.execute(stmt)
+
+    async def _users(self, ids: List[UUID]) -> Dict[UUID, User]:
+        result = await self._execute(select(User).where(User.id.in_(ids)))
+        return {user.id: user for user in result.scalars()}
+
+    async def _spots(self, ids: List[UUID]) -> Dict[UUID, Spot]:
+        result = await self._execute(select(Spot).where(Spot.id.in_(ids)))
+        return {spot.id: spot for spot in result.scalars()}
+
+    async def _spots_by_short_id(self, short_ids: List[str]) -> Dict[str, Spot]:
+        result = await self._execute(select(Spot).where(Spot.short_id.in_(short_ids)))
+        spots = {}
+        for spot in result.scalars():
+            self.spots.prime(spot.id, spot)
+            spots[spot.short_id] = spot
+        return spots
+
+    async def _scores(self, spot_ids: List[UUID]) -> Dict[UUID, int]:
+        result = await self._execute(
+            select(Vote.spot_id, func.sum(Vote.value)).where(Vote.spot_id.in_(spot_ids)).group_by(Vote.spot_id)
+        )
+        return {spot_id: total or 0 for spot_id, total in result.all()}
+
+    def recent_comments(self, limit: int) -> DataLoader[UUID, List[Comment]]:
+        """Loader for each spot's newest ``limit`` comments, cut per spot in SQL."""
+        loader = self._recent_comments.get(limit)
+        if loader is None:
+            loader = DataLoader(functools.partial(self._comments, limit=limit), default=list)
+            self._recent_comments[limit] = loader
+        return loader
+
+    async def _comments(self, spot_ids: List[UUID], limit: Optional[int] = None) -> Dict[UUID, List[Comment]]:
+        if limit is None:
+            query = select(Comment).where(Comment.spot_id.in_(spot_ids)).order_by(Comment.created_at.desc())
+        else:
+            rank = func.row_number().over(partition_by=Comment.spot_id, order_by=Comment.created_at.desc())
+            ranked = select(Comment, rank.label("rank")).where(Comment.spot_id.in_(spot_ids)).subquery()
+            recent = aliased(Comment, ranked)
+            query = select(recent).where(ranked.c.rank <= limit).order_by(ranked.c.created_at.desc())
+        result = await self._execute(query)
+        comments: Dict[UUID, List[Comment]] = defaultdict(list)
+        for comment in result.scalars():
+            comments[comment.spot_id].append(comment)
+        return comments
+
+    async def _photos(self, spot_ids: List[UUID]) -> Dict[UUID, List[Photo]]:
+        result = await self._execute(
+            select(SpotPhoto.spot_id, Photo)
+            .join(Photo, Photo.sha256 == SpotPhoto.photo_sha256)
+            .where(SpotPhoto.spot_id.in_(spot_ids))
+            .order_by(SpotPhoto.position)
+        )
+        photos: Dict[UUID, List[Photo]] = defaultdict(list)
+        for spot_id, photo in result.all():
+            photos[spot_id].append(photo)
+        return photos
+
+    # -- responses ------------------------------------------------------------
+
+    async def comment_models(self, comments: List[Comment]) -> List[schemas.Comment]:
+        users = await self.users.load_many(comment.user_id for comment in comments)
+        for comment, user in zip(comments, users):
+            set_committed_value(comment, "user", user)
+        return [schemas.Comment.model_validate(comment) for comment in comments]
+
+    async def spot_models(self, spots: List[Spot]) -> List[schemas.Spot]:
+        """Build ``schemas.Spot`` for ``spots`` with one query per related table, without ``my_vote``."""
+        ids = [spot.id for spot in spots]
+        comments, photos, scores = await asyncio.gather(
+            self.comments.load_many(ids), self.photos.load_many(ids), self.scores.load_many(ids)
+        )
+        # Spot and comment authors in one query.
+        authors = await self.users.load_many(
+            [spot.user_id for spot in spots] + [c.user_id for spot_comments in comments for c in spot_comments]
+        )
+        authors_by_id = {user.id: user for user in authors if user is not None}
+        for spot, spot_comments, spot_photos, score in zip(spots, comments, photos, scores):
+            for comment in spot_comments:
+                set_committed_value(comment, "user", authors_by_id.get(comment.user_id))
+            set_committed_value(spot, "user", authors_by_id.get(spot.user_id))
+            set_committed_value(spot, "comments", spot_comments)
+            set_committed_value(spot, "photos", spot_photos)
+            spot.score = score
+            spot.my_vote = None
+        return [schemas.Spot.model_validate(spot) for spot in spots]
+
+
+async def get_loaders(db: AsyncSession = Depends(get_read_db)) -> Loaders:
+    """FastAPI dependency: fresh loaders for this request on its read session."""
+    return Loaders(db)
@@ -0,0 +1,219 @@
+"""Duplicate spot detection and merging: ``python -m app.duplicates [scan|merge]``.
+
+Two spots are likely the same place when they lie within
+DUPLICATE_RADIUS_M metres of each other and either their names are
+trigram-similar (``pg_trgm``) or they are within DUPLICATE_SAME_PLACE_M,
+where the name hardly matters. Distances use the geography cast of
+``spots.location``, which has its own GiST index, so a check only looks at
+nearby rows.
+
+``create_spot`` refuses likely duplicates with a 409 listing the candidates
+unless the client passes ``force=true``. Duplicates that already exist are
+found by ``scan`` and folded into one canonical spot per cluster by
+``merge``: the most active spot, then the oldest. Votes, comments and photos
+move over in bulk, keeping one vote per user.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, List, Sequence
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import heatmap, jobs, photos
+from .read_model import notify_spot_changed
+
+RADIUS_M = float(os.getenv("DUPLICATE_RADIUS_M", "50"))
+SAME_PLACE_M = float(os.getenv("DUPLICATE_SAME_PLACE_M", "10"))
+NAME_SIMILARITY = float(os.getenv("DUPLICATE_NAME_SIMILARITY", "0.35"))
+
+_CANDIDATES = text("""
+SELECT s.id, s.short_id, s.name,
+       ST_Distance(CAST(s.location AS geography), p.g) AS distance_m,
+       similarity(lower(s.name), lower(CAST(:name AS text))) AS name_similarity
+FROM spots s, (
+    SELECT CAST(ST_SetSRID(ST_MakePoint(
+        CAST(:lon AS double precision), CAST(:lat AS double precision)), 4326) AS geography) AS g
+) AS p
+WHERE ST_DWithin(CAST(s.location AS geography), p.g, CAST(:radius AS double precision))
+  AND (similarity(lower(s.name), lower(CAST(:name AS text))) >= CAST(:min_similarity AS real)
+       OR ST_DWithin(CAST(s.location AS geography), p.g, CAST(:same_place AS double precision)))
+ORDER BY distance_m
+LIMIT :limit
+""")
+
+
+async def find_candidates(db: AsyncSession, lon: float, lat: float, name: str, limit: int = 5) -> List[Dict]:
+    """Existing spots that a new spot called ``name`` at (lon, lat) probably duplicates, nearest first."""
+    result = await db.execute(
+        _CANDIDATES,
+        {
+            "lon": lon,
+            "lat": lat,
+            "name": name,
+            "radius": RADIUS_M,
+            "same_place": SAME_PLACE_M,
+            "min_similarity": NAME_SIMILARITY,
+            "limit": limit,
+        },
+    )
+    return [dict(row) for row in result.mappings()]
+
+
+# -- offline ------------------------------------------------------------------
+
+_PAIRS = text("""
+SELECT a.id AS a, b.id AS b
+FROM spots a
+JOIN spots b
+  ON b.id > a.id
+ AND ST_DWithin(CAST(a.location AS geography), CAST(b.location AS geography),
+                CAST(:radius AS double precision))
+WHERE similarity(lower(a.name), lower(b.name)) >= CAST(:min_similarity AS real)
+   OR ST_DWithin(CAST(a.location AS geography), CAST(b.location AS geography),
+                 CAST(:same_place AS double precision))
+""")
+
+# Most votes + comments first, then the oldest.
+_RANK = text("""
+SELECT s.id
+FROM spots s
+WHERE s.id = ANY(:ids)
+ORDER BY (SELECT count(*) FROM votes v WHERE v.spot_id = s.id)
+       + (SELECT count(*) FROM comments c WHERE c.spot_id = s.id) DESC,
+         s.created_at, s.id
+""")
+
+
+async def find_clusters(db: AsyncSession) -> List[List[UUID]]:
+    """Groups of likely duplicates, each ordered canonical spot first."""
+    parent: Dict[UUID, UUID] = {}
+
+    def root(spot_id: UUID) -> UUID:
+        while parent.setdefault(spot_id, spot_id) != spot_id:
+            parent[spot_id] = parent[parent[spot_id]]
+            spot_id = parent[spot_id]
+        return spot_id
+
+    pairs = await db.execute(
+        _PAIRS, {"radius": RADIUS_M, "same_place": SAME_PLACE_M, "min_similarity": NAME_SIMILARITY}
+    )
+    for a, b in pairs.all():
+        parent[root(a)] = root(b)
+
+    groups: Dict[UUID, List[UUID]] = {}
+    for spot_id in list(parent):
+        groups.setdefault(root(spot_id), []).append(spot_id)
+    clusters = []
+    for members in groups.values():
+        ranked = await db.execute(_RANK, {"ids": members})
+        clusters.append(list(ranked.scalars()))
+    return clusters
+
+
+_LOCK_SPOTS = text("SELECT id FROM spots WHERE id = ANY(:ids) ORDER BY id FOR UPDATE")
+
+# One vote per user survives: the one on the canonical spot, else the latest.
+_DROP_DUPLICATE_VOTES = text("""
+DELETE FROM votes
+WHERE spot_id = ANY(:duplicates)
+  AND id NOT IN (
+      SELECT DISTINCT ON (user_id) id
+      FROM votes
+      WHERE spot_id = ANY(:ids)
+      ORDER BY user_id, spot_id = :canonical DESC, created_at DESC
+  )
+""")
+_MOVE_VOTES = text("UPDATE votes SET spot_id = :canonical WHERE spot_id = ANY(:duplicates)")
+_MOVE_COMMENTS = text("UPDATE comments SET spot_id = :canonical WHERE spot_id = ANY(:duplicates)")
+
+# Photos the canonical spot lacks move after its own; each image once.
+_MOVE_PHOTOS = text("""
+UPDATE spot_photos sp
+SET spot_id = :canonical,
+    position = sp.position + COALESCE(
+        (SELECT max(position) + 1 FROM spot_photos WHERE spot_id = :canonical), 0)
+WHERE (sp.spot_id, sp.photo_sha256) IN (
+    SELECT DISTINCT ON (photo_sha256) spot_id, photo_sha256
+    FROM spot_photos
+    WHERE spot_id = ANY(:duplicates)
+    ORDER BY photo_sha256, position
+)
+  AND NOT EXISTS (
+    SELECT 1 FROM spot_photos c WHERE c.spot_id = :canonical AND c.photo_sha256 = sp.photo_sha256
+)
+""")
+_DELETE_SPOTS = text("DELETE FROM spots WHERE id = ANY(:duplicates)")
+
+
+async def merge(db: AsyncSession, canonical: UUID, duplicates: Sequence[UUID]) -> None:
+    """Fold ``duplicates`` into ``canonical`` and delete them, in ``db``'s transaction."""
+    duplicates = [spot_id for spot_id in duplicates if spot_id != canonical]
+    if not duplicates:
+        return
+    ids = [canonical, *duplicates]
+    params = {"canonical": canonical, "duplicates": duplicates, "ids": ids}
+
+    await db.execute(_LOCK_SPOTS, {"ids": ids})
+    # Uncount every spot with its activity, then count the merged one again.
+    for spot_id in ids:
+        await heatmap.remove_spot(db, spot_id)
+    await db.execute(_DROP_DUPLICATE_VOTES, params)
+    await db.execute(_MOVE_VOTES, params)
+    await db.execute(_MOVE_COMMENTS, params)
+    await db.execute(_MOVE_PHOTOS, params)
+    for spot_id in duplicates:
+        # Whatever did not move was already on the canonical spot.
+        await photos.detach(db, spot_id)
+    await db.execute(_DELETE_SPOTS, params)
+    await heatmap.add_spot(db, canonical)
+
+    for spot_id in ids:
+        await notify_spot_changed(db, spot_id)
+    prefix = f"{canonical.bytes[0]:02x}"
+    await jobs.enqueue(
+        db, "trending.reconcile_chunk", {"prefix": prefix}, dedupe_key=f"trending.reconcile_chunk:{prefix}"
+    )
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from .database import AsyncSessionLocal, engine
+
+    async with AsyncSessionLocal() as db:
+        clusters = await find_clusters(db)
+    merged = 0
+    for cluster in clusters:
+        print(json.dumps({"canonical": str(cluster[0]), "duplicates": [str(s) for s in cluster[1:]]}))
+        if args.command == "merge" and not args.dry_run:
+            async with AsyncSessionLocal() as db:
+                await merge(db, cluster[0], cluster[1:])
+                await db.commit()
+            merged += len(cluster) - 1
+    print(f"{len(clusters)} clusters, {merged} spots merged")
+    await engine.dispose()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Find and merge duplicate spots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", help="Print clusters of likely duplicates as JSON lines")
+    merge_cmd = sub.add_parser("merge", help="Merge each cluster into its most active spot")
+    merge_cmd.add_argument("--dry-run", action="store_true", help="Only print what would be merged")
+    for cmd in sub.choices.values():
+        cmd.add_argument("--radius", type=float, help=f"Metres (default {RADIUS_M:g})")
+        cmd.add_argument("--similarity", type=float, help=f"Minimum name similarity (default {NAME_SIMILARITY:g})")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.radius is not None:
+        RADIUS_M = args.radius
+    if args.similarity is not None:
+        NAME_SIMILARITY = args.similarity
+    asyncio.run(_run(args))
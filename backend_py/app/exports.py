@@ -0,0 +1,110 @@
+"""Full-data exports built by the job workers.
+
+``POST /api/admin/exports`` enqueues an ``exports.spots`` job and returns its
+id. The job streams every spot (optionally only those in a bounding box) in
+primary-key batches. It writes one gzipped GeoJSON FeatureCollection to the
+photo storage under ``exports/<id>.geojson.gz``.
+``GET /api/admin/exports/<id>`` reports the job's status and, once it is
+done, the file's URL. Building happens off the API workers, so large exports
+never hold a request open.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import jobs
+from .storage import get_storage
+
+BATCH_SIZE = 5000
+CONTENT_TYPE = "application/gzip"
+
+_BATCH = text("""
+SELECT s.id, s.short_id, s.name, s.description, ST_X(s.location) AS lon, ST_Y(s.location) AS lat,
+       s.created_at,
+       COALESCE((SELECT sum(v.value) FROM votes v WHERE v.spot_id = s.id), 0) AS score
+FROM spots s
+WHERE (CAST(:after AS uuid) IS NULL OR s.id > CAST(:after AS uuid))
+  AND (CAST(:west AS double precision) IS NULL
+       OR ST_Contains(ST_MakeEnvelope(:west, :south, :east, :north, 4326), s.location))
+ORDER BY s.id
+LIMIT :limit
+""")
+
+_STATUS = text("""
+SELECT status, attempts, last_error, created_at, finished_at
+FROM jobs
+WHERE kind = 'exports.spots' AND payload->>'export_id' = :export_id
+ORDER BY created_at DESC
+LIMIT 1
+""")
+
+
+def export_key(export_id: str) -> str:
+    return f"exports/{export_id}.geojson.gz"
+
+
+def _feature(row) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "id": str(row.id),
+        "geometry": {"type": "Point", "coordinates": [row.lon, row.lat]},
+        "properties": {
+            "short_id": row.short_id,
+            "name": row.name,
+            "description": row.description,
+            "score": int(row.score),
+            "created_at": row.created_at.isoformat(),
+        },
+    }
+
+
+async def enqueue_export(db: AsyncSession, bbox: Optional[tuple] = None) -> str:
+    """Queue a spot export in ``db``'s transaction and return its id."""
+    export_id = str(uuid.uuid4())
+    payload: Dict[str, Any] = {"export_id": export_id}
+    if bbox is not None:
+        payload["bbox"] = list(bbox)
+    await jobs.enqueue(db, "exports.spots", payload, max_attempts=3)
+    return export_id
+
+
+async def export_status(db: AsyncSession, export_id: str) -> Optional[Dict[str, Any]]:
+    """The export's job state, plus its URL once done; None for an unknown id."""
+    row = (await db.execute(_STATUS, {"export_id": export_id})).mappings().first()
+    if row is None:
+        return None
+    status = {"id": export_id, **row}
+    if row["status"] == "done":
+        status["url"] = get_storage().url(export_key(export_id))
+    return status
+
+
+@jobs.handler("exports.spots", timeout=1800)
+async def build_spot_export(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    west, south, east, north = payload.get("bbox") or (None,) * 4
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as out:
+        out.write(b'{"type":"FeatureCollection","features":[')
+        after = None
+        first = True
+        while True:
+            rows = (await db.execute(_BATCH, {
+                "after": after, "west": west, "south": south, "east": east, "north": north,
+                "limit": BATCH_SIZE,
+            })).all()
+            if not rows:
+                break
+            chunk = ",".join(json.dumps(_feature(row), separators=(",", ":")) for row in rows)
+            out.write((chunk if first else "," + chunk).encode())
+            first = False
+            after = str(rows[-1].id)
+        out.write(b"]}")
+    await asyncio.to_thread(get_storage().put, export_key(payload["export_id"]), buffer.getvalue(), CONTENT_TYPE)
@@ -0,0 +1,158 @@
+"""Geohash encoding, cell bounds and neighbours.
+
+Matches PostGIS ``ST_GeoHash`` so keys computed here line up with the
+generated ``spots.geohash`` column (precision 9, about 5m cells) and with
+``spot_grid_cells``. Arguments are lon/lat ordered like the rest of the
+codebase.
+
+A geohash prefix is the containing cell at a coarser precision, and all
+hashes in a cell sort together. That makes region lookups B-tree range scans
+on ``spots.geohash`` (see :func:`prefix_range`).
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+# Precision of the stored spots.geohash column.
+SPOT_PRECISION = 9
+
+Bounds = Tuple[float, float, float, float]  # west, south, east, north
+
+
+def is_valid(geohash: str) -> bool:
+    return 0 < len(geohash) <= 12 and all(char in _DECODE for char in geohash)
+
+
+def encode(lon: float, lat: float, precision: int = SPOT_PRECISION) -> str:
+    """The geohash of the cell containing (lon, lat)."""
+    west, east, south, north = -180.0, 180.0, -90.0, 90.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # bits alternate lon, lat, starting with lon
+    while len(chars) < precision:
+        if even:
+            mid = (west + east) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                west = mid
+            else:
+                value *= 2
+                east = mid
+        else:
+            mid = (south + north) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                south = mid
+            else:
+                value *= 2
+                north = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Bounds:
+    """(west, south, east, north) of the cell ``geohash``."""
+    west, east, south, north = -180.0, 180.0, -90.0, 90.0
+    even = True
+    for char in geohash:
+        try:
+            value = _DECODE[char]
+        except KeyError:
+            raise ValueError(f"invalid geohash {geohash!r}") from None
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (west + east) / 2
+                if bit:
+                    west = mid
+                else:
+                    east = mid
+            else:
+                mid = (south + north) / 2
+                if bit:
+                    south = mid
+                else:
+                    north = mid
+            even = not even
+    return west, south, east, north
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Width and height in degrees of a cell of ``precision``."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 360.0 / 2 ** lon_bits, 180.0 / 2 ** lat_bits
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Centre (lon, lat) of the cell."""
+    west, south, east, north = bounds(geohash)
+    return (west + east) / 2, (south + north) / 2
+
+
+def adjacent(geohash: str, dx: int, dy: int) -> Optional[str]:
+    """The same-precision cell ``dx`` cells east and ``dy`` cells north.
+
+    Longitude wraps at the antimeridian; there is no cell beyond a pole.
+    """
+    west, south, east, north = bounds(geohash)
+    lon = (west + east) / 2 + dx * (east - west)
+    lat = (south + north) / 2 + dy * (north - south)
+    if not -90.0 < lat < 90.0:
+        return None
+    lon = (lon + 180.0) % 360.0 - 180.0
+    return encode(lon, lat, len(geohash))
+
+
+_DIRECTIONS = {
+    "n": (0, 1), "ne": (1, 1), "e": (1, 0), "se": (1, -1),
+    "s": (0, -1), "sw": (-1, -1), "w": (-1, 0), "nw": (-1, 1),
+}
+
+
+def neighbors(geohash: str) -> Dict[str, str]:
+    """The up to eight cells around ``geohash`` keyed by compass direction."""
+    cells = {}
+    for direction, (dx, dy) in _DIRECTIONS.items():
+        cell = adjacent(geohash, dx, dy)
+        if cell is not None:
+            cells[direction] = cell
+    return cells
+
+
+def cover(west: float, south: float, east: float, north: float, precision: int) -> List[str]:
+    """The cells of ``precision`` that intersect a bounding box, row by row from the south-west."""
+    sw = encode(west, south, precision)
+    cell_west, cell_south, cell_east, cell_north = bounds(sw)
+    width, height = cell_east - cell_west, cell_north - cell_south
+    columns = max(1, math.ceil((east - cell_west) / width))
+    rows = max(1, math.ceil((north - cell_south) / height))
+    cells = []
+    for row in range(rows):
+        lat = min(cell_south + (row + 0.5) * height, 90.0 - height / 2)
+        for column in range(columns):
+            lon = cell_west + (column + 0.5) * width
+            cells.append(encode((lon + 180.0) % 360.0 - 180.0, lat, precision))
+    return list(dict.fromkeys(cells))
+
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """Half-open range ``[lo, hi)`` of every geohash starting with ``prefix``.
+
+    Compared in byte order (``spots.geohash`` is ``COLLATE "C"``), so the
+    range works with bound parameters and generic plans where ``LIKE
+    'prefix%'`` would not.
+    """
+    if not prefix:
+        raise ValueError("empty geohash prefix")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
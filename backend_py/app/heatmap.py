@@ -0,0 +1,129 @@
+"""Multi-resolution spot density/activity aggregates for the heatmap endpoint.
+
+``spot_grid_cells`` holds one row per geohash cell at each precision in
+``PRECISIONS`` with the number of spots, votes and comments inside it. Write
+paths keep it current with small ``INSERT ... ON CONFLICT`` deltas in the
+same transaction, so reading a heatmap costs one indexed range scan over the
+cells in view no matter how many spots they contain. ``rebuild`` recomputes
+everything from scratch; run it as the ``heatmap.rebuild`` job after bulk
+loads or to undo drift from cascading deletes.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import geohash, jobs
+
+# Precision 1 (~5000km cells) for the world view down to 7 (~150m) at street level.
+MIN_PRECISION = 1
+MAX_PRECISION = 7
+
+# Periodic full rebuild; off by default since it briefly blocks vote/comment writes.
+REBUILD_INTERVAL_SECONDS = float(os.getenv("HEATMAP_REBUILD_INTERVAL_SECONDS", "0")) or None
+
+_UPSERT_TAIL = """
+ON CONFLICT (geohash) DO UPDATE SET
+    spot_count = spot_grid_cells.spot_count + EXCLUDED.spot_count,
+    vote_count = spot_grid_cells.vote_count + EXCLUDED.vote_count,
+    comment_count = spot_grid_cells.comment_count + EXCLUDED.comment_count
+"""
+
+_CELL_COLUMNS = """
+    ST_GeoHash(s.location, p) AS geohash,
+    p AS precision,
+    ST_X(ST_Centroid(ST_GeomFromGeoHash(ST_GeoHash(s.location, p)))) AS center_lon,
+    ST_Y(ST_Centroid(ST_GeomFromGeoHash(ST_GeoHash(s.location, p)))) AS center_lat
+"""
+
+_ACTIVITY_DELTA = text(f"""
+INSERT INTO spot_grid_cells
+    (geohash, precision, center_lon, center_lat, spot_count, vote_count, comment_count)
+SELECT {_CELL_COLUMNS}, 0, CAST(:votes AS integer), CAST(:comments AS integer)
+FROM spots s, generate_series({MIN_PRECISION}, {MAX_PRECISION}) AS p
+WHERE s.id = :spot_id
+{_UPSERT_TAIL}
+""")
+
+# Adds (sign=1) or removes (sign=-1) a spot together with its current votes
+# and comments, e.g. on create/delete or before/after a move.
+_SPOT_DELTA = text(f"""
+INSERT INTO spot_grid_cells
+    (geohash, precision, center_lon, center_lat, spot_count, vote_count, comment_count)
+SELECT {_CELL_COLUMNS},
+    CAST(:sign AS integer),
+    CAST(:sign AS integer) * (SELECT count(*) FROM votes v WHERE v.spot_id = s.id),
+    CAST(:sign AS integer) * (SELECT count(*) FROM comments c WHERE c.spot_id = s.id)
+FROM spots s, generate_series({MIN_PRECISION}, {MAX_PRECISION}) AS p
+WHERE s.id = :spot_id
+{_UPSERT_TAIL}
+""")
+
+# Also the backfill of the migration that created the table.
+REBUILD = [
+    # Block incremental deltas (but not reads) until the rebuilt table is
+    # committed; writers already in flight finish first and are counted.
+    text("LOCK TABLE spot_grid_cells IN EXCLUSIVE MODE"),
+    text("DELETE FROM spot_grid_cells"),
+    text(f"""
+INSERT INTO spot_grid_cells
+    (geohash, precision, center_lon, center_lat, spot_count, vote_count, comment_count)
+SELECT geohash, precision, center_lon, center_lat,
+       count(*), sum(n_votes), sum(n_comments)
+FROM (
+    SELECT {_CELL_COLUMNS}, s.n_votes, s.n_comments
+    -- Count each spot's activity once, then fan it out to every precision.
+    FROM (
+        SELECT spots.id, spots.location,
+               COALESCE(v.n, 0) AS n_votes, COALESCE(c.n, 0) AS n_comments
+        FROM spots
+        LEFT JOIN (SELECT spot_id, count(*) AS n FROM votes GROUP BY spot_id) v ON v.spot_id = spots.id
+        LEFT JOIN (SELECT spot_id, count(*) AS n FROM comments GROUP BY spot_id) c ON c.spot_id = spots.id
+    ) s, generate_series({MIN_PRECISION}, {MAX_PRECISION}) AS p
+) per_spot
+GROUP BY geohash, precision, center_lon, center_lat
+"""),
+]
+
+
+def precision_for_zoom(zoom: int) -> int:
+    """Geohash precision giving roughly 8 cells across a 256px map tile at ``zoom``."""
+    # A precision-p geohash spends ceil(5p/2) bits on longitude; a tile at
+    # zoom z spans 2^-z of the world, so aim for z + 3 longitude bits.
+    precision = round(2 * (zoom + 3) / 5)
+    return max(MIN_PRECISION, min(MAX_PRECISION, precision))
+
+
+def center_bounds(west: float, south: float, east: float, north: float, precision: int) -> geohash.Bounds:
+    """Box holding the centres of exactly the ``precision`` cells that intersect a bounding box.
+
+    Same-size cells intersect the box iff their centre lies within half a
+    cell of it, so this is the box grown by half a cell on each side.
+    """
+    width, height = geohash.cell_size(precision)
+    return west - width / 2, south - height / 2, east + width / 2, north + height / 2
+
+
+async def add_activity(db: AsyncSession, spot_id: UUID, *, votes: int = 0, comments: int = 0) -> None:
+    if votes or comments:
+        await db.execute(_ACTIVITY_DELTA, {"spot_id": spot_id, "votes": votes, "comments": comments})
+
+
+async def add_spot(db: AsyncSession, spot_id: UUID) -> None:
+    """Count a (flushed) spot at its current location."""
+    await db.execute(_SPOT_DELTA, {"spot_id": spot_id, "sign": 1})
+
+
+async def remove_spot(db: AsyncSession, spot_id: UUID) -> None:
+    """Uncount a spot at its current location; call before deleting or moving it."""
+    await db.execute(_SPOT_DELTA, {"spot_id": spot_id, "sign": -1})
+
+
+@jobs.handler("heatmap.rebuild", timeout=1800, every=REBUILD_INTERVAL_SECONDS)
+async def rebuild(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    for statement in REBUILD:
+        await db.execute(statement)
@@ -0,0 +1,340 @@
+"""Durable background jobs backed by the ``jobs`` table.
+
+Request handlers call :func:`enqueue` inside their own transaction, so a job
+exists exactly when the change that asked for it commits. Worker processes
+(``python -m app.worker``) claim runnable jobs with ``FOR UPDATE SKIP LOCKED``.
+Claiming counts the attempt and stamps ``started_at`` in its own committed
+transaction, which leases the job to the worker for its kind's timeout plus
+LEASE_GRACE_SECONDS. The handler then runs in the transaction that marks the
+job done, so a job's database effects and its completion commit together.
+
+Failures are retried with exponential backoff until ``max_attempts``, after
+which the job stays in the table as ``failed`` for inspection. A worker that
+dies mid-job (OOM, segfault, SIGKILL) leaves the attempt counted; the job is
+claimed again when the lease runs out, and given up once it has used all its
+attempts. Queue depth
+and latency are computed from the table itself, so ``/metrics`` on any API
+worker covers every job worker.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger("skatespot.jobs")
+
+NOTIFY_CHANNEL = "jobs_ready"
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+# Beyond the handler timeout before a claimed job counts as abandoned.
+LEASE_GRACE_SECONDS = float(os.getenv("JOB_LEASE_GRACE_SECONDS", "60"))
+# Window for the "recent" latency figures in stats().
+STATS_WINDOW_SECONDS = 300
+
+Handler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class JobKind:
+    name: str
+    fn: Handler
+    timeout: float
+    every: Optional[float]
+
+
+HANDLERS: Dict[str, JobKind] = {}
+
+
+def handler(kind: str, *, timeout: float = 300.0, every: Optional[float] = None):
+    """Register ``fn(db, payload)`` as the handler for ``kind``.
+
+    Handlers run inside the job's transaction and normally do not commit.
+    A handler that works through a large table in batches may commit between
+    them, as long as running it again after a crash picks up correctly. With
+    ``every`` (seconds) the worker also enqueues the job periodically.
+    """
+    def decorator(fn: Handler) -> Handler:
+        HANDLERS[kind] = JobKind(kind, fn, timeout, every)
+        return fn
+    return decorator
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    *,
+    delay: float = 0.0,
+    dedupe_key: Optional[str] = None,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> None:
+    """Add a job to ``db``'s transaction; workers see it once ``db`` commits.
+
+    With ``dedupe_key`` nothing is added while a job with the same key is
+    still queued or running (one pending "rebuild" is enough).
+    """
+    now = datetime.utcnow()
+    stmt = pg_insert(Job).values(
+        id=uuid.uuid4(),
+        kind=kind,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        dedupe_key=dedupe_key,
+        created_at=now,
+        run_at=now + timedelta(seconds=delay),
+    )
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=["dedupe_key"], index_where=text("status = 'queued'")
+        )
+    await db.execute(stmt)
+    if not delay:
+        # Delivered on commit; wakes idle workers instead of waiting for a poll.
+        await db.execute(text("SELECT pg_notify(:channel, :kind)"), {"channel": NOTIFY_CHANNEL, "kind": kind})
+
+
+# -- running ------------------------------------------------------------------
+
+# A job is runnable once due, unless a worker claimed it within the lease.
+_CLAIM = text("""
+SELECT id, kind, payload, attempts, max_attempts
+FROM jobs
+WHERE status = 'queued' AND run_at <= timezone('utc', now()) AND kind = ANY(:kinds)
+  AND (started_at IS NULL
+       OR started_at < timezone('utc', now()) - make_interval(secs => CAST(:lease AS double precision)))
+ORDER BY run_at
+LIMIT 1
+FOR UPDATE SKIP LOCKED
+""")
+
+_START = text("""
+UPDATE jobs SET attempts = attempts + 1, started_at = timezone('utc', now()) WHERE id = :id
+""")
+
+_ABANDONED = text("""
+UPDATE jobs
+SET status = 'failed',
+    finished_at = timezone('utc', now()),
+    last_error = 'worker died during the last attempt'
+WHERE id = :id
+""")
+
+# Guarded on attempts/status so a job whose lease ran out and was claimed
+# again is only finished by its current attempt.
+_DONE = text("""
+UPDATE jobs
+SET status = 'done',
+    finished_at = timezone('utc', clock_timestamp()),
+    last_error = NULL
+WHERE id = :id AND status = 'queued' AND attempts = :attempts
+""")
+
+# A retry clears started_at so it is runnable again at its new run_at.
+_FAILED = text("""
+UPDATE jobs
+SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    run_at = timezone('utc', now()) + make_interval(secs => CAST(:backoff AS double precision)),
+    started_at = CASE WHEN attempts >= max_attempts THEN started_at END,
+    finished_at = CASE WHEN attempts >= max_attempts THEN timezone('utc', now()) END,
+    last_error = :error
+WHERE id = :id AND status = 'queued' AND attempts = :attempts
+""")
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry ``attempts + 1``: exponential, jittered between half and full."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts)
+    return random.uniform(delay / 2, delay)
+
+
+def lease_seconds(kinds: Sequence[str]) -> float:
+    """How long a claim on any of ``kinds`` holds off other workers."""
+    return max(HANDLERS[kind].timeout for kind in kinds) + LEASE_GRACE_SECONDS
+
+
+async def run_one(sessionmaker: async_sessionmaker[AsyncSession], kinds: Sequence[str]) -> bool:
+    """Claim and run one runnable job of ``kinds``. Returns False if there was none."""
+    async with sessionmaker() as db:
+        row = (await db.execute(_CLAIM, {"kinds": list(kinds), "lease": lease_seconds(kinds)})).first()
+        if row is None:
+            await db.rollback()
+            return False
+        if row.attempts >= row.max_attempts:
+            # Every attempt was claimed and never finished: the worker died.
+            await db.execute(_ABANDONED, {"id": row.id})
+            await db.commit()
+            logger.error("job %s (%s) given up after %d abandoned attempts", row.id, row.kind, row.attempts)
+            return True
+        await db.execute(_START, {"id": row.id})
+        await db.commit()
+
+        attempt = row.attempts + 1
+        kind = HANDLERS[row.kind]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(kind.fn(db, row.payload), kind.timeout)
+            await db.execute(_DONE, {"id": row.id, "attempts": attempt})
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            logger.exception("job %s (%s) failed on attempt %d", row.id, row.kind, attempt)
+            await db.execute(
+                _FAILED,
+                {
+                    "id": row.id,
+                    "attempts": attempt,
+                    "backoff": backoff_seconds(row.attempts),
+                    "error": f"{type(exc).__name__}: {exc}"[:2000],
+                },
+            )
+            await db.commit()
+            return True
+
+    logger.info("job %s (%s) done in %.0fms", row.id, row.kind, (time.perf_counter() - started) * 1000)
+    return True
+
+
+_SCHEDULE = text("""
+INSERT INTO jobs (id, kind, payload, status, attempts, max_attempts, dedupe_key, created_at, run_at)
+SELECT :id, :kind, CAST('{}' AS jsonb), 'queued', 0, :max_attempts, :kind,
+       timezone('utc', now()), timezone('utc', now())
+WHERE NOT EXISTS (
+    SELECT 1 FROM jobs
+    WHERE kind = :kind
+      AND status IN ('done', 'failed')
+      AND finished_at > timezone('utc', now()) - make_interval(secs => CAST(:every AS double precision))
+)
+ON CONFLICT (dedupe_key) WHERE status = 'queued' DO NOTHING
+""")
+
+
+async def schedule_periodic(db: AsyncSession) -> None:
+    """Enqueue every periodic kind whose last run finished more than ``every`` ago."""
+    for kind in HANDLERS.values():
+        if kind.every:
+            await db.execute(
+                _SCHEDULE,
+                {"id": uuid.uuid4(), "kind": kind.name, "every": kind.every, "max_attempts": MAX_ATTEMPTS},
+            )
+    await db.commit()
+
+
+@handler("jobs.prune", every=3600)
+async def prune(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Delete finished jobs older than JOB_RETENTION_HOURS (failed ones are kept)."""
+    await db.execute(
+        text(
+            "DELETE FROM jobs WHERE status = 'done' "
+            "AND finished_at < timezone('utc', now()) - make_interval(hours => CAST(:hours AS integer))"
+        ),
+        {"hours": int(RETENTION_HOURS)},
+    )
+
+
+# -- visibility ---------------------------------------------------------------
+
+_QUEUE_STATS = text("""
+SELECT kind, status, count(*) AS jobs,
+       COALESCE(extract(epoch FROM timezone('utc', now())
+           - min(run_at) FILTER (WHERE run_at <= timezone('utc', now()))), 0) AS oldest_due_seconds
+FROM jobs
+WHERE status IN ('queued', 'failed')
+GROUP BY kind, status
+""")
+
+_RECENT_STATS = text("""
+SELECT kind, count(*) AS completed,
+       avg(extract(epoch FROM started_at - run_at)) AS avg_wait_seconds,
+       max(extract(epoch FROM started_at - run_at)) AS max_wait_seconds,
+       avg(extract(epoch FROM finished_at - started_at)) AS avg_run_seconds
+FROM jobs
+WHERE status = 'done'
+  AND finished_at > timezone('utc', now()) - make_interval(secs => CAST(:window AS double precision))
+GROUP BY kind
+""")
+
+
+async def stats(db: AsyncSession) -> Dict[str, List[Dict[str, Any]]]:
+    """Queue depth per kind/status plus latency of jobs finished in the last STATS_WINDOW_SECONDS."""
+    queues = (await db.execute(_QUEUE_STATS)).mappings().all()
+    recent = (await db.execute(_RECENT_STATS, {"window": STATS_WINDOW_SECONDS})).mappings().all()
+    return {
+        "queues": [{k: _plain(v) for k, v in row.items()} for row in queues],
+        "recent": [{k: _plain(v) for k, v in row.items()} for row in recent],
+    }
+
+
+def _plain(value: Any) -> Any:
+    # extract() returns Decimal
+    return float(value) if value is not None and not isinstance(value, (str, int)) else value
+
+
+JOBS = metrics.Gauge(
+    "skatespot_jobs",
+    "Jobs in the queue by kind and status (queued includes retries not yet due).",
+    ("kind", "status"),
+)
+JOB_OLDEST_DUE_SECONDS = metrics.Gauge(
+    "skatespot_job_oldest_due_seconds",
+    "How long the oldest runnable job of each kind has been waiting.",
+    ("kind",),
+)
+JOBS_COMPLETED_RECENT = metrics.Gauge(
+    "skatespot_jobs_completed_recent",
+    f"Jobs completed in the last {STATS_WINDOW_SECONDS}s.",
+    ("kind",),
+)
+JOB_WAIT_SECONDS = metrics.Gauge(
+    "skatespot_job_wait_seconds_avg",
+    f"Mean time from due to started for jobs completed in the last {STATS_WINDOW_SECONDS}s.",
+    ("kind",),
+)
+JOB_RUN_SECONDS = metrics.Gauge(
+    "skatespot_job_run_seconds_avg",
+    f"Mean run time of jobs completed in the last {STATS_WINDOW_SECONDS}s.",
+    ("kind",),
+)
+
+
+async def collect_metrics(sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    """Metrics collector: refresh the job gauges from the table."""
+    try:
+        async with sessionmaker() as db:
+            snapshot = await stats(db)
+    except Exception:
+        logger.warning("could not collect job stats", exc_info=True)
+        return
+
+    # Report drained queues as zero rather than leaving the last value.
+    for kind in HANDLERS:
+        for status in ("queued", "failed"):
+            JOBS.set(0, (kind, status))
+        for gauge in (JOB_OLDEST_DUE_SECONDS, JOBS_COMPLETED_RECENT, JOB_WAIT_SECONDS, JOB_RUN_SECONDS):
+            gauge.set(0, (kind,))
+    for row in snapshot["queues"]:
+        JOBS.set(row["jobs"], (row["kind"], row["status"]))
+        if row["status"] == "queued":
+            JOB_OLDEST_DUE_SECONDS.set(row["oldest_due_seconds"], (row["kind"],))
+    for row in snapshot["recent"]:
+        labels = (row["kind"],)
+        JOBS_COMPLETED_RECENT.set(row["completed"], labels)
+        JOB_WAIT_SECONDS.set(row["avg_wait_seconds"], labels)
+        JOB_RUN_SECONDS.set(row["avg_run_seconds"], labels)
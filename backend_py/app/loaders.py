@@ -0,0 +1,29 @@
+"""Relationship loading strategies, one per response shape.
+
+Every relationship in ``app/models`` is ``lazy="raise"``: touching one that a
+query did not load raises instead of emitting SQL, which under asyncio would
+otherwise fail later with ``MissingGreenlet`` (or, on a sync session, quietly
+add a query per row). Queries pick what they need from here:
+
+    select(Spot).options(*loaders.SPOT).where(...)
+
+Many-to-one links (a spot's author) are joined, which adds columns but never
+rows. Collections use ``selectinload``: one extra ``WHERE ... IN (...)``
+query per collection instead of a join that repeats every spot row once per
+comment and has to be de-duplicated with ``.unique()`` in Python.
+"""
+from __future__ import annotations
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Comment, Spot
+
+# schemas.Comment: the comment and its author.
+COMMENT = (joinedload(Comment.user, innerjoin=True),)
+
+# schemas.Spot: author, comments with their authors, photos.
+SPOT = (
+    joinedload(Spot.user, innerjoin=True),
+    selectinload(Spot.comments).joinedload(Comment.user, innerjoin=True),
+    selectinload(Spot.photos),
+)
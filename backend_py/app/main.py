@@ -1,12 +1,87 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from .config import get_settings
-from .routers import auth, spots, comments
-from .database import Base, engine
+from .config import R2_ENDPOINT, get_r2_client, get_settings, reset_r2_client
+from .routers import admin, auth, spots, comments
+from .database import AsyncSessionLocal, Base, DATABASE_LISTEN_URL, engine, read_sessionmaker, replica_engines
+from . import exports, heatmap, jobs, metrics, photos, profiling, ratelimit, read_model, storage, tracing, trending  # noqa: F401  (job kinds for metrics)
+
+metrics.instrument_engine(engine)
+for i, replica in enumerate(replica_engines):
+    metrics.instrument_engine(replica, f"replica{i}")
+if tracing.enabled():
+    tracing.instrument_engine(engine)
+    for i, replica in enumerate(replica_engines):
+        tracing.instrument_engine(replica, f"replica{i}")
+    tracing.instrument_fastapi_serialization()
+# Queue depth/latency of the background job workers (app/worker.py).
+metrics.register_collector(lambda: jobs.collect_metrics(read_sessionmaker()))
+
+logger = logging.getLogger("skatespot")
+
+STARTUP_SECONDS = metrics.Gauge(
+    "skatespot_startup_seconds",
+    "Worker startup time by phase (module imports, lifespan startup).",
+    ("phase",),
+)
+STARTUP_SECONDS.set(time.perf_counter() - _import_started, ("import",))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup/shutdown.
 
-app = FastAPI(title="SkateSpot API", version="0.1.0")
+    Under gunicorn with ``preload_app`` the module is imported once in the
+    master and then forked, so anything holding sockets must be (re)created
+    here, inside the worker. The engines are lazy and have not connected
+    yet, but we drop any inherited pool state without touching the parent's
+    connections to be safe.
+    """
+    started = time.perf_counter()
+    for db_engine in (engine, *replica_engines):
+        await db_engine.dispose(close=False)
+    reset_r2_client()
+    if R2_ENDPOINT:
+        # boto3 client construction is slow; pay it before the first upload request.
+        await asyncio.to_thread(get_r2_client)
+
+    listener = None
+    if read_model.ENABLED:
+        listener = read_model.ChangeListener(DATABASE_LISTEN_URL, AsyncSessionLocal)
+        await listener.start()
+
+    STARTUP_SECONDS.set(time.perf_counter() - started, ("lifespan",))
+    logger.info(
+        "worker %s started: imports %.0fms, lifespan %.0fms",
+        os.getpid(),
+        STARTUP_SECONDS.value(("import",)) * 1000,
+        STARTUP_SECONDS.value(("lifespan",)) * 1000,
+    )
+    yield
+
+    if listener is not None:
+        await listener.stop()
+    for db_engine in (engine, *replica_engines):
+        await db_engine.dispose()
+
+
+app = FastAPI(
+    title="SkateSpot API",
+    version="0.1.0",
+    default_response_class=metrics.TimedJSONResponse,
+    lifespan=lifespan,
+)
 
 # Allow frontend origin during dev
 frontend_port = os.getenv("FRONTEND_PORT", "5173")
@@ -15,6 +90,12 @@ origins = [
     "http://localhost:5173",  # fallback
     "http://localhost:5174",  # fallback
 ]
+if profiling.ENABLED:
+    # Inside the rate limiter: rejected requests are not profiled.
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Inside CORS and metrics, so rejections still get CORS headers and are
+# counted, but before routing and any DB session.
+app.add_middleware(ratelimit.RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -23,10 +104,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(SessionMiddleware, secret_key=get_settings().JWT_SECRET)
+# Added last so it wraps everything else and times the full request.
+app.add_middleware(metrics.MetricsMiddleware)
+if tracing.enabled():
+    # Outermost, so the root span covers the metrics middleware as well.
+    app.add_middleware(tracing.TracingMiddleware)
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(spots.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+
+if storage.STORAGE_BACKEND == "local" and not storage.PUBLIC_BASE_URL:
+    # Dev only: serve locally stored photos and their variants.
+    os.makedirs(storage.LOCAL_DIR, exist_ok=True)
+    app.mount("/media", StaticFiles(directory=storage.LOCAL_DIR), name="media")
 
 @app.get("/health")
 async def health():
@@ -34,6 +126,17 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    return PlainTextResponse(
+        await metrics.render_latest(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+# Development entry point with auto-reload. Production runs under gunicorn,
+# see gunicorn.conf.py.
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,286 @@
+"""Prometheus-style metrics for the API.
+
+Metrics live in plain process-local dicts and are rendered in the Prometheus
+text exposition format by the ``/metrics`` endpoint.  We deliberately avoid
+``prometheus_client`` here: the hot path is a couple of dict updates per
+request, and every worker process exposes its own series (scrape each worker,
+or aggregate in Prometheus with ``sum by``).
+"""
+from __future__ import annotations
+
+import inspect
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple, Union
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from . import tracing
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                label_str = _format_labels(self.labelnames + ("le",), labels + (le,))
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {series[-1]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+Collector = Callable[[], Union[None, Awaitable[None]]]
+_COLLECTORS: List[Collector] = []
+
+
+def register_collector(fn: Collector) -> Collector:
+    """Register a (sync or async) callable that refreshes gauges right before a scrape."""
+    _COLLECTORS.append(fn)
+    return fn
+
+
+async def render_latest() -> str:
+    """Run collectors and render every registered metric in text exposition format."""
+    for collector in _COLLECTORS:
+        result = collector()
+        if inspect.isawaitable(result):
+            await result
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Metric definitions
+# ---------------------------------------------------------------------------
+
+HTTP_REQUESTS = Counter(
+    "skatespot_http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "skatespot_http_request_duration_seconds",
+    "HTTP request latency by method and route template.",
+    ("method", "route"),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "skatespot_http_requests_in_flight",
+    "HTTP requests currently being processed.",
+    ("method",),
+)
+SERIALIZATION_SECONDS = Histogram(
+    "skatespot_response_serialization_seconds",
+    "Time spent encoding JSON response bodies.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+DB_QUERIES = Counter(
+    "skatespot_db_queries_total",
+    "SQL statements executed, by engine role.",
+    ("engine",),
+)
+DB_QUERY_SECONDS = Histogram(
+    "skatespot_db_query_duration_seconds",
+    "SQL statement execution time, by engine role.",
+    ("engine",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "skatespot_db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ("engine",),
+)
+DB_POOL_SIZE = Gauge(
+    "skatespot_db_pool_size",
+    "Configured pool size (excluding overflow).",
+    ("engine",),
+)
+DB_POOL_OVERFLOW = Gauge(
+    "skatespot_db_pool_overflow",
+    "Overflow connections currently open beyond the pool size.",
+    ("engine",),
+)
+CACHE_REQUESTS = Counter(
+    "skatespot_cache_requests_total",
+    "Lookups against in-process caches, by cache name and result (hit/miss).",
+    ("cache", "result"),
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc((cache, "hit" if hit else "miss"))
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation hooks
+# ---------------------------------------------------------------------------
+
+def instrument_engine(engine, role: str = "primary") -> None:
+    """Attach query counting/timing hooks and a pool collector to an async engine."""
+    sync_engine = engine.sync_engine
+    labels = (role,)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["_metrics_query_start"].pop()
+        DB_QUERIES.inc(labels)
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, labels)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_metrics_query_start"):
+            conn.info["_metrics_query_start"].pop()
+
+    def _collect_pool() -> None:
+        pool = sync_engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.set(pool.checkedout(), labels)
+            DB_POOL_SIZE.set(pool.size(), labels)
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0), labels)
+
+    register_collector(_collect_pool)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency and in-flight requests.
+
+    Labels use the matched route template (``/api/spots/{spot_id}``) rather
+    than the raw path so series cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc((method,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec((method,))
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            HTTP_LATENCY.observe(elapsed, (method, template))
+            HTTP_REQUESTS.inc((method, template, str(status_code)))
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class that records how long body encoding takes."""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        with tracing.span("json.render"):
+            body = super().render(content)
+        SERIALIZATION_SECONDS.observe(time.perf_counter() - start)
+        return body
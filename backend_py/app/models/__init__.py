@@ -3,4 +3,8 @@
 from .user import User
 from .spot import Spot
 from .comment import Comment
-from .vote import Vote 
\ No newline at end of file
+from .vote import Vote 
+from .spot_grid_cell import SpotGridCell
+from .trending_epoch import TrendingEpoch
+from .job import Job
+from .photo import Photo, SpotPhoto
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import uuid
 from datetime import datetime
 
 from sqlalchemy import (
@@ -12,19 +11,23 @@ from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
 from ..database import Base
+from ..ids import uuid7
 
 
 class Comment(Base):
     __tablename__ = "comments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # In Postgres the table is range-partitioned by month of created_at (see
+    # app/partitions.py), so its primary key is (id, created_at); id alone
+    # is unique and identifies a row for the ORM.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     content = Column(Text, nullable=False)
 
-    spot_id = Column(UUID(as_uuid=True), ForeignKey("spots.id"), nullable=False)
-    spot = relationship("Spot", back_populates="comments")
+    spot_id = Column(UUID(as_uuid=True), ForeignKey("spots.id", ondelete="CASCADE"), nullable=False, index=True)
+    spot = relationship("Spot", back_populates="comments", lazy="raise")
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    user = relationship("User", back_populates="comments")
+    user = relationship("User", back_populates="comments", lazy="raise")
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False) 
\ No newline at end of file
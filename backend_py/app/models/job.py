@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from ..database import Base
+
+
+class Job(Base):
+    """A unit of deferred background work (see app/jobs.py)."""
+
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    # queued -> done, or back to queued with a later run_at until
+    # max_attempts is reached, then failed.
+    status = Column(String(16), nullable=False, default="queued", server_default="queued")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False, default=5, server_default="5")
+    # Optional key; at most one queued job may carry a given key.
+    dedupe_key = Column(String(200), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set when an attempt is claimed; while queued, it leases the job to
+    # that worker (see app/jobs.py).
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan runnable jobs.
+        Index("ix_jobs_queued_run_at", "run_at", postgresql_where=text("status = 'queued'")),
+        Index(
+            "uq_jobs_queued_dedupe_key",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index("ix_jobs_kind_finished_at", "kind", "finished_at"),
+    )
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from ..database import Base
+
+
+def original_key(sha256: str) -> str:
+    """Object storage key of a photo's original upload."""
+    return f"originals/{sha256}"
+
+
+class Photo(Base):
+    """A unique image, keyed by the SHA-256 of its original bytes (see app/photos.py)."""
+
+    __tablename__ = "photos"
+
+    sha256 = Column(String(64), primary_key=True)
+    # pending -> ready | failed
+    status = Column(String(16), nullable=False, default="pending")
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    bytes = Column(Integer, nullable=True)
+    # {"thumb": {"webp": {"url", "width", "height", "bytes"}, ...}, "medium": ...}
+    variants = Column(JSONB, nullable=False, default=dict)
+    # Number of spot_photos rows pointing here; at zero the stored objects
+    # are garbage collected.
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def key(self) -> str:
+        return original_key(self.sha256)
+
+    @property
+    def url(self) -> str:
+        from ..storage import get_storage
+
+        return get_storage().url(self.key)
+
+
+class SpotPhoto(Base):
+    __tablename__ = "spot_photos"
+
+    spot_id = Column(UUID(as_uuid=True), ForeignKey("spots.id", ondelete="CASCADE"), primary_key=True)
+    photo_sha256 = Column(String(64), ForeignKey("photos.sha256"), primary_key=True, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    position = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
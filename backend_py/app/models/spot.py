@@ -6,7 +6,10 @@ from datetime import datetime
 
 from sqlalchemy import (
     Column,
+    Computed,
     DateTime,
+    Float,
+    Index,
     String,
     Text,
     ForeignKey,
@@ -35,14 +38,39 @@ class Spot(Base):
     
     # Using SRID 4326 for standard WGS 84 geographic coordinates (lat/lng)
     location = Column(Geometry(geometry_type='POINT', srid=4326), nullable=False, index=True)
+    # Discrete spatial key maintained by Postgres (see app/geohash.py). Byte
+    # ordered so a region is one B-tree range scan: geohash >= 'c2b2' AND
+    # geohash < 'c2b3'.
+    geohash = Column(String(9, collation="C"), Computed("ST_GeoHash(location, 9)", persisted=True))
 
-    photos = Column(JSONB, nullable=True, default=[])
+    # Pre content-addressing photo URLs, moved into ``photos`` by the
+    # photos.import_legacy job.
+    legacy_photos = Column(JSONB, nullable=True, default=[])
+    photos = relationship(
+        "Photo", secondary="spot_photos", order_by="SpotPhoto.position", viewonly=True, lazy="raise"
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    user = relationship("User", back_populates="spots")
+    user = relationship("User", back_populates="spots", lazy="raise")
 
-    comments = relationship("Comment", back_populates="spot", cascade="all, delete-orphan")
-    votes = relationship("Vote", back_populates="spot", cascade="all, delete-orphan")
+    # Relationships never lazy-load; queries choose a strategy from
+    # app/loaders.py. Deleting a spot leaves its comments and votes to the
+    # ON DELETE CASCADE foreign keys rather than loading them first.
+    comments = relationship(
+        "Comment", back_populates="spot", cascade="all, delete-orphan", passive_deletes=True, lazy="raise"
+    )
+    votes = relationship(
+        "Vote", back_populates="spot", cascade="all, delete-orphan", passive_deletes=True, lazy="raise"
+    )
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False) 
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Exponentially time-decayed vote/comment activity, stored relative to
+    # TrendingEpoch so it can be bumped incrementally (see app/trending.py).
+    trending_score = Column(Float, nullable=False, default=0.0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_spots_trending_score", trending_score.desc()),
+        Index("ix_spots_geohash", geohash),
+    ) 
\ No newline at end of file
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Float, Index, Integer, SmallInteger, String
+
+from ..database import Base
+
+
+class SpotGridCell(Base):
+    """Pre-aggregated spot density/activity per geohash cell (see app/heatmap.py)."""
+
+    __tablename__ = "spot_grid_cells"
+
+    geohash = Column(String(12), primary_key=True)
+    precision = Column(SmallInteger, nullable=False)
+    center_lon = Column(Float, nullable=False)
+    center_lat = Column(Float, nullable=False)
+    spot_count = Column(Integer, nullable=False, default=0)
+    vote_count = Column(Integer, nullable=False, default=0)
+    comment_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_spot_grid_cells_precision_lat_lon", "precision", "center_lat", "center_lon"),
+    )
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer
+from sqlalchemy.dialects.postgresql import UUID
+
+from ..database import Base
+
+
+class TrendingEpoch(Base):
+    """Single-row reference time for ``Spot.trending_score`` (see app/trending.py)."""
+
+    __tablename__ = "trending_epoch"
+
+    id = Column(Integer, primary_key=True, default=1)
+    epoch = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # While a rescale is in progress: spots with id < rescaled_below are
+    # already relative to pending_epoch, the rest still to epoch.
+    pending_epoch = Column(DateTime, nullable=True)
+    rescaled_below = Column(UUID(as_uuid=True), nullable=True)
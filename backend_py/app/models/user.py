@@ -20,6 +20,6 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     last_login = Column(DateTime, default=datetime.utcnow, nullable=False)
     
-    spots = relationship("Spot", back_populates="user", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan")
-    votes = relationship("Vote", back_populates="user", cascade="all, delete-orphan") 
\ No newline at end of file
+    spots = relationship("Spot", back_populates="user", cascade="all, delete-orphan", lazy="raise")
+    comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan", lazy="raise")
+    votes = relationship("Vote", back_populates="user", cascade="all, delete-orphan", lazy="raise") 
\ No newline at end of file
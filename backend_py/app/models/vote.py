@@ -1,23 +1,27 @@
 from __future__ import annotations
-import uuid
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, DateTime, Index, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
 from ..database import Base
+from ..ids import uuid7
 
 class Vote(Base):
     __tablename__ = "votes"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # In Postgres the table is hash-partitioned by spot_id (see
+    # app/partitions.py), so its primary key is (id, spot_id); id alone is
+    # unique and identifies a row for the ORM.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     spot_id = Column(UUID(as_uuid=True), ForeignKey("spots.id", ondelete="CASCADE"), nullable=False)
     value = Column(Integer, nullable=False)  # +1 or -1
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    user = relationship("User", back_populates="votes")
-    spot = relationship("Spot", back_populates="votes")
+    user = relationship("User", back_populates="votes", lazy="raise")
+    spot = relationship("Spot", back_populates="votes", lazy="raise")
 
     __table_args__ = (
         UniqueConstraint("user_id", "spot_id", name="uq_user_spot_vote"),
+        Index("ix_votes_spot_id", "spot_id"),
     ) 
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""Table partitioning for ``votes`` and ``comments``.
+
+``votes`` is hash-partitioned by ``spot_id`` into ``VOTE_PARTITIONS`` tables
+(``votes_p00`` ...). Everything that touches votes filters by spot, so each
+query reads one partition and its smaller indexes, and concurrent inserts
+spread over several B-trees instead of contending on one.
+
+``comments`` is range-partitioned by month of ``created_at``
+(``comments_y2026m10`` ...), with a ``comments_default`` partition to catch
+anything outside the existing ranges. New comments all go to the current
+month, whose indexes stay small and cached; old months can be detached or
+archived whole. The daily ``partitions.comments`` job creates months
+``COMMENT_PARTITION_MONTHS_AHEAD`` (default 3) in advance so rows never
+land in the default partition.
+
+Postgres requires a partitioned table's primary key to include the partition
+key, so the keys are ``(id, spot_id)`` and ``(id, created_at)``. Ids are
+UUIDv7 (app/ids.py), so they are unique on their own and a comment's id also
+tells which month it lives in.
+
+The tables are converted by migration b5e08c4d1f39, which copies the rows
+and holds ACCESS EXCLUSIVE locks for the duration, so run it in a
+maintenance window. ``python -m bench.partitions`` compares insert throughput
+and index sizes of the old and new layouts.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+# Fixed by the migration; changing it means rewriting the table.
+VOTE_PARTITIONS = 16
+
+COMMENT_PARTITION_MONTHS_AHEAD = int(os.getenv("COMMENT_PARTITION_MONTHS_AHEAD", "3"))
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def comment_partition_name(month: date) -> str:
+    return f"comments_y{month.year:04d}m{month.month:02d}"
+
+
+_PARTITION_EXISTS = text("SELECT to_regclass(:name) IS NOT NULL")
+
+
+async def ensure_comment_partition(db: AsyncSession, month: date) -> bool:
+    """Create the partition for the month containing ``month``; False if it already exists."""
+    start = month.replace(day=1)
+    name = comment_partition_name(start)
+    if (await db.execute(_PARTITION_EXISTS, {"name": name})).scalar():
+        return False
+    # DDL cannot take bind parameters; every value here is generated above.
+    await db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF comments "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+    ))
+    return True
+
+
+@jobs.handler("partitions.comments", every=86400)
+async def ensure_comment_partitions(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Make sure this month and the next COMMENT_PARTITION_MONTHS_AHEAD have partitions."""
+    this_month = datetime.utcnow().date().replace(day=1)
+    for ahead in range(COMMENT_PARTITION_MONTHS_AHEAD + 1):
+        month = add_months(this_month, ahead)
+        if await ensure_comment_partition(db, month):
+            logger.info("created comment partition %s", comment_partition_name(month))
@@ -0,0 +1,315 @@
+"""Content-addressed spot photos and their web-sized variants.
+
+Every image is stored once under the SHA-256 of its bytes. Clients hash a
+file before uploading; ``create_presigned_url`` answers "already exists" for
+known hashes, so re-uploads and the same photo on several spots cost no
+bandwidth or storage. Spots reference photos through ``spot_photos``, and
+``Photo.ref_count`` tracks how many links a photo has; unreferenced photos
+are garbage collected after a grace period.
+
+The first attach of a new image enqueues a ``photos.process`` job. The job
+checks the hash, decodes the original once, applies its EXIF orientation and
+writes ``thumb`` and ``medium`` variants as WebP (and AVIF where Pillow
+supports it) without any metadata. Decoding and encoding run in a process
+pool so several photos use several cores and the job worker's event loop
+keeps serving its other slots.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from uuid import UUID
+
+from sqlalchemy import case, delete, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import jobs
+from .models import Photo, Spot, SpotPhoto
+from .models.photo import original_key
+from .storage import Storage, get_storage
+
+logger = logging.getLogger("skatespot.photos")
+
+# Longest edge in pixels; a thumb fills the sidebar card at 2x density.
+VARIANTS = {"medium": 1280, "thumb": 320}
+QUALITY = {"webp": 80, "avif": 55}
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+PHOTO_PROCESSES = int(os.getenv("PHOTO_PROCESSES", "2"))
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def _formats() -> List[str]:
+    from PIL import features
+
+    return ["webp", "avif"] if features.check("avif") else ["webp"]
+
+
+def process_image(data: bytes) -> Dict[str, Any]:
+    """Decode an original and encode every variant. Runs in the pool, so it must stay picklable.
+
+    Returns ``{"width", "height", "variants": {name: {format: {"width",
+    "height", "bytes", "data"}}}}`` with dimensions after EXIF rotation.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        width, height = original.size
+        if original.getexif().get(_EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        # For JPEGs, let the decoder downscale by a power of two up front
+        # instead of decoding all of a 12MP frame.
+        largest = max(VARIANTS.values())
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    formats = _formats()
+    variants: Dict[str, Dict[str, Any]] = {}
+    # Largest first, each variant resized from the previous one.
+    for name, edge in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        # Only the ICC profile survives: no EXIF (GPS, camera serials), no XMP.
+        image.info = {k: v for k, v in image.info.items() if k == "icc_profile"}
+        encoded = {}
+        for fmt in formats:
+            buf = io.BytesIO()
+            image.save(buf, format=fmt.upper(), quality=QUALITY[fmt])
+            encoded[fmt] = {
+                "width": image.width,
+                "height": image.height,
+                "bytes": buf.tell(),
+                "data": buf.getvalue(),
+            }
+        variants[name] = encoded
+    return {"width": width, "height": height, "variants": variants}
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> Executor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(PHOTO_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def variant_key(sha256: str, variant: str, fmt: str) -> str:
+    return f"variants/{sha256}/{variant}.{fmt}"
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+async def build_variants(storage: Storage, sha256: str, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Fetch the original for ``sha256``, encode its variants off the event loop and store them.
+
+    Returns the photo's metadata (without image bytes); re-running it simply
+    overwrites the same variant keys.
+    """
+    original = await asyncio.to_thread(storage.get, original_key(sha256))
+    if await asyncio.to_thread(lambda: hashlib.sha256(original).hexdigest()) != sha256:
+        raise ChecksumMismatch(f"uploaded bytes do not hash to {sha256}")
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(executor or _executor(), process_image, original)
+    for name, formats in result["variants"].items():
+        for fmt, info in formats.items():
+            target = variant_key(sha256, name, fmt)
+            await asyncio.to_thread(storage.put, target, info.pop("data"), CONTENT_TYPES[fmt])
+            info["url"] = storage.url(target)
+    result["bytes"] = len(original)
+    return result
+
+
+# -- references ---------------------------------------------------------------
+
+# Detached photos linger this long before their objects are deleted, so an
+# undo or a re-upload of the same image does not have to start over.
+GC_GRACE_SECONDS = float(os.getenv("PHOTO_GC_GRACE_SECONDS", "3600"))
+
+
+async def attach(db: AsyncSession, spot_id: UUID, sha256: str, user_id: Optional[UUID]) -> Optional[Photo]:
+    """Link the uploaded original ``sha256`` to a spot, taking a reference.
+
+    The caller must hold the spot's row lock. Returns None if the spot already
+    has this photo. New (or previously failed) photos get a processing job;
+    known ones reuse their variants.
+    """
+    linked = await db.scalar(
+        select(SpotPhoto.photo_sha256).where(SpotPhoto.spot_id == spot_id, SpotPhoto.photo_sha256 == sha256)
+    )
+    if linked is not None:
+        return None
+
+    upsert = pg_insert(Photo).values(
+        sha256=sha256, status="pending", variants={}, ref_count=1, created_at=datetime.utcnow()
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[Photo.sha256],
+        set_={
+            "ref_count": Photo.ref_count + 1,
+            "status": case((Photo.status == "failed", "pending"), else_=Photo.status),
+        },
+    ).returning(Photo)
+    photo = (
+        await db.scalars(upsert, execution_options={"populate_existing": True})
+    ).one()
+
+    await db.execute(
+        pg_insert(SpotPhoto).values(
+            spot_id=spot_id,
+            photo_sha256=sha256,
+            user_id=user_id,
+            position=select(func.coalesce(func.max(SpotPhoto.position) + 1, 0))
+            .where(SpotPhoto.spot_id == spot_id)
+            .scalar_subquery(),
+            created_at=datetime.utcnow(),
+        )
+    )
+    if photo.status == "pending":
+        await jobs.enqueue(db, "photos.process", {"sha256": sha256}, dedupe_key=f"photos.process:{sha256}")
+    return photo
+
+
+async def detach(db: AsyncSession, spot_id: UUID, sha256: Optional[str] = None) -> List[str]:
+    """Unlink one photo (or all of them) from a spot, dropping their references.
+
+    Photos left without references are queued for garbage collection.
+    Returns the unlinked hashes.
+    """
+    unlink = delete(SpotPhoto).where(SpotPhoto.spot_id == spot_id)
+    if sha256 is not None:
+        unlink = unlink.where(SpotPhoto.photo_sha256 == sha256)
+    unlink = unlink.returning(SpotPhoto.photo_sha256).execution_options(synchronize_session=False)
+    unlinked = list((await db.execute(unlink)).scalars())
+    if not unlinked:
+        return []
+
+    released = await db.execute(
+        update(Photo)
+        .where(Photo.sha256.in_(unlinked))
+        .values(ref_count=Photo.ref_count - 1)
+        .returning(Photo.sha256, Photo.ref_count)
+        .execution_options(synchronize_session=False)
+    )
+    for sha, refs in released.all():
+        if refs <= 0:
+            await jobs.enqueue(
+                db, "photos.gc", {"sha256": sha}, delay=GC_GRACE_SECONDS, dedupe_key=f"photos.gc:{sha}"
+            )
+    return unlinked
+
+
+# -- jobs ---------------------------------------------------------------------
+
+async def _set_status(db: AsyncSession, sha256: str, **values: Any) -> None:
+    await db.execute(
+        update(Photo)
+        .where(Photo.sha256 == sha256)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@jobs.handler("photos.process", timeout=600)
+async def process_photo(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    from PIL import Image, UnidentifiedImageError
+
+    sha256 = payload["sha256"]
+    storage = get_storage()
+    try:
+        result = await build_variants(storage, sha256)
+    except ChecksumMismatch as exc:
+        # Not the image the hash promised; drop it so the real one can be uploaded.
+        logger.warning("photo %s rejected: %s", sha256, exc)
+        await asyncio.to_thread(storage.delete, original_key(sha256))
+        await _set_status(db, sha256, status="failed")
+        return
+    except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        # Retrying cannot fix a missing file or one that is not a usable image.
+        logger.warning("photo %s rejected: %s", sha256, exc)
+        await _set_status(db, sha256, status="failed")
+        return
+    await _set_status(
+        db,
+        sha256,
+        status="ready",
+        width=result["width"],
+        height=result["height"],
+        bytes=result["bytes"],
+        variants=result["variants"],
+    )
+
+
+@jobs.handler("photos.gc")
+async def collect_photo(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Delete an unreferenced photo's objects and row (unless it was re-attached meanwhile)."""
+    sha256 = payload["sha256"]
+    photo = await db.scalar(select(Photo).where(Photo.sha256 == sha256).with_for_update())
+    if photo is None or photo.ref_count > 0:
+        return
+    if await db.scalar(select(SpotPhoto.spot_id).where(SpotPhoto.photo_sha256 == sha256).limit(1)):
+        return
+    storage = get_storage()
+    keys = [original_key(sha256)] + [
+        variant_key(sha256, name, fmt) for name, formats in (photo.variants or {}).items() for fmt in formats
+    ]
+    for key in keys:
+        await asyncio.to_thread(storage.delete, key)
+    await db.delete(photo)
+
+
+def _legacy_key(entry: Any, storage: Storage) -> str:
+    if isinstance(entry, dict):
+        return entry.get("key") or _legacy_key(entry.get("url", ""), storage)
+    base = storage.url("")
+    return entry[len(base):] if entry.startswith(base) else urlparse(entry).path.lstrip("/")
+
+
+_LEGACY_BATCH = 50
+
+
+@jobs.handler("photos.import_legacy", timeout=1800)
+async def import_legacy(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Move ``Spot.legacy_photos`` URLs into content-addressed photos, a batch of spots per run."""
+    spots = (
+        await db.execute(
+            select(Spot)
+            .where(
+                func.jsonb_typeof(Spot.legacy_photos) == "array",
+                Spot.legacy_photos != literal_column("'[]'::jsonb"),
+            )
+            .limit(_LEGACY_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+    ).scalars().all()
+    storage = get_storage()
+    for spot in spots:
+        for entry in spot.legacy_photos:
+            key = _legacy_key(entry, storage)
+            try:
+                data = await asyncio.to_thread(storage.get, key)
+            except FileNotFoundError:
+                logger.warning("dropping legacy photo %r of spot %s: object is gone", entry, spot.id)
+                continue
+            sha256 = hashlib.sha256(data).hexdigest()
+            if not await asyncio.to_thread(storage.exists, original_key(sha256)):
+                content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+                await asyncio.to_thread(storage.put, original_key(sha256), data, content_type)
+            await attach(db, spot.id, sha256, spot.user_id)
+        spot.legacy_photos = []
+    if len(spots) == _LEGACY_BATCH:
+        await jobs.enqueue(db, "photos.import_legacy")
@@ -0,0 +1,211 @@
+"""On-demand CPU and allocation profiles of single requests.
+
+Off unless ``PROFILING_ENABLED=1``. When off, the middleware is not even
+installed. When on, a request is profiled if:
+
+- it carries ``X-Profile: 1`` and a bearer token of an admin
+  (``ADMIN_EMAILS``), or
+- it falls in the random sample ``PROFILE_SAMPLE_RATE`` (0 to 1, default 0).
+
+A profiled request records:
+
+- a CPU call tree. With ``PROFILER=cprofile`` (the default) this is a
+  pstats dump plus a text summary. With ``PROFILER=pyinstrument`` it is an
+  HTML call tree, which needs the ``pyinstrument`` package.
+- a tracemalloc snapshot of what the request allocated and still held at
+  the end, plus a top-lines summary and the peak traced memory.
+
+They are written to ``PROFILE_DIR``, which keeps the newest ``PROFILE_KEEP``.
+Admins list and download them from ``/api/admin/profiles``. The response of
+a profiled request carries ``X-Profile-Id``.
+
+cProfile and tracemalloc are process-wide, so only one request per worker is
+profiled at a time, and work that other requests do meanwhile on the same
+event loop shows up too. pyinstrument's async mode attributes time to the
+profiled task only. Profile a quiet worker, or a single request with the
+header, for clean numbers.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import re
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .routers.auth import decode_bearer, is_admin_email
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+# Downloadable artifacts by suffix.
+ARTIFACTS = {
+    "prof": "application/octet-stream",  # pstats; open with snakeviz or pstats
+    "txt": "text/plain; charset=utf-8",  # cProfile summary, top cumulative
+    "html": "text/html; charset=utf-8",  # pyinstrument call tree
+    "alloc.txt": "text/plain; charset=utf-8",  # tracemalloc top lines
+    "tracemalloc": "application/octet-stream",  # tracemalloc.Snapshot.load()
+}
+PROFILE_ID = re.compile(r"^\d{10}-[0-9a-f]{8}$")
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _wants_profile(scope) -> bool:
+    if scope["path"].startswith("/api/admin/"):
+        return False
+    if _header(scope, b"x-profile") == "1":
+        claims = decode_bearer(_header(scope, b"authorization"))
+        if claims and is_admin_email(claims.get("email")):
+            return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+class _Capture:
+    """One request's profilers, started and stopped around it."""
+
+    def __init__(self):
+        if PROFILER == "pyinstrument":
+            from pyinstrument import Profiler
+
+            self.cpu = Profiler(async_mode="enabled")
+        else:
+            import cProfile
+
+            self.cpu = cProfile.Profile()
+
+    def start(self) -> None:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        if PROFILER == "pyinstrument":
+            self.cpu.start()
+        else:
+            self.cpu.enable()
+
+    def stop(self) -> Dict:
+        if PROFILER == "pyinstrument":
+            self.cpu.stop()
+        else:
+            self.cpu.disable()
+        self.snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"peak_alloc_bytes": peak}
+
+    def write(self, profile_id: str) -> None:
+        if PROFILER == "pyinstrument":
+            _path(profile_id, "html").write_text(self.cpu.output_html())
+        else:
+            import pstats
+
+            self.cpu.dump_stats(str(_path(profile_id, "prof")))
+            text = io.StringIO()
+            pstats.Stats(self.cpu, stream=text).sort_stats("cumulative").print_stats(60)
+            _path(profile_id, "txt").write_text(text.getvalue())
+        snapshot = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        snapshot.dump(str(_path(profile_id, "tracemalloc")))
+        lines = [str(stat) for stat in snapshot.statistics("lineno")[:40]]
+        _path(profile_id, "alloc.txt").write_text("\n".join(lines) + "\n")
+
+
+def _path(profile_id: str, kind: str) -> Path:
+    return PROFILE_DIR / f"{profile_id}.{kind}"
+
+
+def _save(capture: _Capture, meta: Dict) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    capture.write(meta["id"])
+    meta["artifacts"] = [kind for kind in ARTIFACTS if _path(meta["id"], kind).is_file()]
+    _path(meta["id"], "json").write_text(json.dumps(meta))
+    for old in list_profiles()[KEEP:]:
+        for path in PROFILE_DIR.glob(f"{old['id']}.*"):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict]:
+    """Stored profiles' metadata, newest first."""
+    if not PROFILE_DIR.is_dir():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def artifact_path(profile_id: str, kind: str) -> Optional[Path]:
+    """The file for one artifact of a profile, if the id is well-formed and it exists."""
+    if not PROFILE_ID.match(profile_id) or kind not in ARTIFACTS:
+        return None
+    path = _path(profile_id, kind)
+    return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling selected requests; see the module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        self._busy = True
+        capture = _Capture()
+        started = time.perf_counter()
+        capture.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            meta = capture.stop()
+            self._busy = False
+            meta.update(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                query=scope.get("query_string", b"").decode("latin-1"),
+                status=status_code,
+                duration_ms=round((time.perf_counter() - started) * 1000, 2),
+                profiler=PROFILER,
+                pid=os.getpid(),
+            )
+            try:
+                # After the response went out; keep file I/O off the loop.
+                await asyncio.to_thread(_save, capture, meta)
+            except OSError:
+                logger.warning("could not store profile %s", profile_id, exc_info=True)
@@ -0,0 +1,270 @@
+"""Per-client rate limits and admission control, applied before any handler runs.
+
+Each request is classed as a ``read`` (GET/HEAD), a ``vote`` (``POST`` or
+``DELETE`` on ``.../vote``) or a ``write`` (anything else). Each client has a
+token bucket per class. The client is the ``sub`` of a valid bearer token if
+there is one, otherwise the peer IP. Behind a reverse proxy the peer is the
+proxy, so every anonymous client would share its bucket; uvicorn replaces it
+with the ``X-Forwarded-For`` address only for peers listed in
+``FORWARDED_ALLOW_IPS`` (see gunicorn.conf.py; docker-compose passes
+``--proxy-headers --forwarded-allow-ips``). Limits are ``RATE_LIMIT_READS``,
+``RATE_LIMIT_VOTES`` and ``RATE_LIMIT_WRITES`` as ``"<per second>:<burst>"``.
+A client over its limit gets ``429`` with ``Retry-After``: the seconds until
+its next token.
+
+Buckets live in process memory by default, so each worker enforces the limit
+separately. Set ``RATE_LIMIT_STORE=redis`` (with ``RATE_LIMIT_REDIS_URL`` and
+the ``redis`` package) to share them across workers and hosts, or pass any
+:class:`BucketStore` to :func:`set_store`. If the shared store fails,
+requests are let through.
+
+Separately, each worker admits at most ``MAX_CONCURRENT_REQUESTS`` requests
+at once. Up to ``ADMISSION_QUEUE`` more wait ``ADMISSION_QUEUE_TIMEOUT``
+seconds for a slot. Anything beyond that gets ``503`` with ``Retry-After``
+straight away, instead of piling up behind the database pool. Both checks
+run before routing, so a rejection costs no session or connection.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from . import metrics
+from .routers.auth import decode_bearer
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_limit(spec: str) -> Tuple[float, float]:
+    rate, _, burst = spec.partition(":")
+    return float(rate), float(burst or rate)
+
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+LIMITS: Dict[str, Tuple[float, float]] = {
+    # Map panning fires a listing per moveend; allow bursts of those.
+    "read": _parse_limit(os.getenv("RATE_LIMIT_READS", "10:60")),
+    "vote": _parse_limit(os.getenv("RATE_LIMIT_VOTES", "1:20")),
+    "write": _parse_limit(os.getenv("RATE_LIMIT_WRITES", "0.5:20")),
+}
+STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# A little above what the DB pool (5 + 10 overflow) can serve at once;
+# requests that do not touch the database are quick to get out of the way.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "128"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+OVERLOAD_RETRY_AFTER = 1
+
+EXEMPT_PREFIXES = ("/health", "/metrics", "/media", "/docs", "/redoc", "/openapi.json")
+
+REJECTED = metrics.Counter(
+    "skatespot_requests_rejected_total",
+    "Requests turned away before routing, by route class and reason (rate_limited/overloaded).",
+    ("route_class", "reason"),
+)
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """The limit class of a request, or None if it is not limited."""
+    if method == "OPTIONS" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method in ("GET", "HEAD"):
+        return "read"
+    if path.rstrip("/").endswith("/vote"):
+        return "vote"
+    return "write"
+
+
+def header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_key(scope) -> str:
+    """``user:<id>`` for a valid bearer token, else ``ip:<address>``."""
+    claims = decode_bearer(header(scope, b"authorization"))
+    subject = claims and claims.get("sub")
+    if subject:
+        return f"user:{subject}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+# -- bucket stores --------------------------------------------------------------
+
+
+class BucketStore:
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Take a token from ``key``'s bucket.
+
+        Returns 0 if one was available, else the seconds until one will be.
+        """
+        raise NotImplementedError
+
+
+class MemoryStore(BucketStore):
+    """Buckets in a bounded LRU; an evicted bucket just starts full again."""
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = self.clock()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Atomic refill-and-take using the server's clock, so app hosts need not agree.
+_TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisStore(BucketStore):
+    """Buckets shared through Redis, one hash per client and class."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+
+_store: Optional[BucketStore] = None
+
+
+def get_store() -> BucketStore:
+    """The process-wide bucket store configured by RATE_LIMIT_STORE."""
+    global _store
+    if _store is None:
+        _store = RedisStore(REDIS_URL) if STORE == "redis" else MemoryStore()
+    return _store
+
+
+def set_store(store: Optional[BucketStore]) -> None:
+    """Use ``store`` for all buckets (None: back to the configured default)."""
+    global _store
+    _store = store
+
+
+# -- middleware -------------------------------------------------------------------
+
+
+class Admission:
+    """At most ``limit`` requests in flight; ``queue`` more may wait ``timeout`` seconds."""
+
+    def __init__(self, limit: int, queue: int, timeout: float):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self.waiting:
+            await self._slots.acquire()  # does not block: a slot is free
+        elif self.waiting >= self.queue or self.timeout <= 0:
+            return False
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying the per-client limits, then admission control."""
+
+    def __init__(self, app, limits: Dict[str, Tuple[float, float]] = LIMITS, admission: Optional[Admission] = None):
+        self.app = app
+        self.limits = limits
+        self.admission = admission or Admission(MAX_CONCURRENT_REQUESTS, ADMISSION_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        kind = route_class(scope["method"], scope["path"])
+        if kind is None:
+            await self.app(scope, receive, send)
+            return
+
+        rate, burst = self.limits[kind]
+        try:
+            wait = await get_store().take(f"{kind}:{client_key(scope)}", rate, burst)
+        except Exception:
+            logger.warning("rate limit store failed; letting the request through", exc_info=True)
+            wait = 0.0
+        if wait > 0:
+            REJECTED.inc((kind, "rate_limited"))
+            await _reject(send, 429, "Too many requests", wait)
+            return
+
+        if not await self.admission.acquire():
+            REJECTED.inc((kind, "overloaded"))
+            await _reject(send, 503, "Server busy, try again shortly", OVERLOAD_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release()
@@ -0,0 +1,341 @@
+"""Optional in-memory spatial read model for spot lookups.
+
+Every spot's id, position and vote score is held in compact parallel arrays
+with a uniform lon/lat grid on top, so bounding-box and nearby queries pick
+their spots without touching PostGIS. Enable it with ``SPOT_READ_MODEL=1``.
+
+Each worker bootstraps its own copy at startup by streaming the ``spots``
+table, then stays current through Postgres ``LISTEN/NOTIFY``: write paths
+call :func:`notify_spot_changed` inside their transaction and every worker
+(including the writer) reloads that one spot when the commit lands. If the
+listener connection drops or the table outgrows ``SPOT_READ_MODEL_MAX_MB``,
+the index marks itself not ready and callers fall back to PostGIS.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import uuid
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import Spot, Vote
+
+logger = logging.getLogger("skatespot.read_model")
+
+ENABLED = os.getenv("SPOT_READ_MODEL", "0") == "1"
+MAX_MB = float(os.getenv("SPOT_READ_MODEL_MAX_MB", "256"))
+NOTIFY_CHANNEL = "spot_changes"
+
+# Rough resident cost of one spot: three 8-byte columns, a 16-byte id, a
+# 4-byte grid slot, plus the id->slot dict entry and its bytes key.
+BYTES_PER_SPOT = 160
+
+EARTH_RADIUS_M = 6_371_000.0
+
+Cell = Tuple[int, int]
+
+
+class SpotIndex:
+    """Columnar spot positions/scores with a uniform grid index.
+
+    Slots freed by deletes are reused, so arrays never shrink; ``len()`` is
+    the number of live spots.
+    """
+
+    __slots__ = (
+        "cell_deg", "max_spots", "ready",
+        "_ids", "_lon", "_lat", "_score",
+        "_slot_of", "_free", "_grid",
+    )
+
+    def __init__(self, cell_deg: float = 0.02, max_bytes: float = MAX_MB * 1024 * 1024):
+        self.cell_deg = cell_deg
+        self.max_spots = int(max_bytes // BYTES_PER_SPOT)
+        self.ready = False
+        self._ids = bytearray()
+        self._lon = array("d")
+        self._lat = array("d")
+        self._score = array("q")
+        self._slot_of: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._grid: Dict[Cell, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def _cell(self, lon: float, lat: float) -> Cell:
+        return (math.floor(lon / self.cell_deg), math.floor(lat / self.cell_deg))
+
+    def memory_bytes(self) -> int:
+        return len(self._lon) * BYTES_PER_SPOT
+
+    # -- writes ---------------------------------------------------------------
+
+    def upsert(self, spot_id: uuid.UUID, lon: float, lat: float, score: int) -> None:
+        key = spot_id.bytes
+        slot = self._slot_of.get(key)
+        if slot is not None:
+            old_cell = self._cell(self._lon[slot], self._lat[slot])
+            new_cell = self._cell(lon, lat)
+            if old_cell != new_cell:
+                self._grid[old_cell].remove(slot)
+                self._grid.setdefault(new_cell, array("I")).append(slot)
+            self._lon[slot], self._lat[slot], self._score[slot] = lon, lat, score
+            return
+
+        if len(self._slot_of) >= self.max_spots:
+            raise MemoryError(f"spot read model over budget ({self.max_spots} spots)")
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot * 16:slot * 16 + 16] = key
+            self._lon[slot], self._lat[slot], self._score[slot] = lon, lat, score
+        else:
+            slot = len(self._lon)
+            self._ids += key
+            self._lon.append(lon)
+            self._lat.append(lat)
+            self._score.append(score)
+        self._slot_of[key] = slot
+        self._grid.setdefault(self._cell(lon, lat), array("I")).append(slot)
+
+    def remove(self, spot_id: uuid.UUID) -> None:
+        slot = self._slot_of.pop(spot_id.bytes, None)
+        if slot is None:
+            return
+        cell = self._cell(self._lon[slot], self._lat[slot])
+        self._grid[cell].remove(slot)
+        if not self._grid[cell]:
+            del self._grid[cell]
+        self._free.append(slot)
+
+    def clear(self) -> None:
+        self.ready = False
+        self._ids = bytearray()
+        self._lon, self._lat, self._score = array("d"), array("d"), array("q")
+        self._slot_of.clear()
+        self._free.clear()
+        self._grid.clear()
+
+    # -- reads ----------------------------------------------------------------
+
+    def _id(self, slot: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(self._ids[slot * 16:slot * 16 + 16]))
+
+    def score(self, spot_id: uuid.UUID) -> Optional[int]:
+        slot = self._slot_of.get(spot_id.bytes)
+        return None if slot is None else self._score[slot]
+
+    def _cells_in(self, west: float, south: float, east: float, north: float) -> Iterable[Cell]:
+        x0, y0 = self._cell(west, south)
+        x1, y1 = self._cell(east, north)
+        # Zoomed far out, walking every cell in the box costs more than
+        # walking the occupied ones.
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._grid):
+            return [c for c in self._grid if x0 <= c[0] <= x1 and y0 <= c[1] <= y1]
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def bbox(
+        self,
+        west: float,
+        south: float,
+        east: float,
+        north: float,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[uuid.UUID, int]]:
+        """``(id, score)`` for spots inside the box.
+
+        Like the unordered PostGIS query, results come in index order (cell by
+        cell), which is stable between calls; scanning stops as soon as
+        ``skip + limit`` matches are found.
+        """
+        lon, lat, grid = self._lon, self._lat, self._grid
+        wanted = None if limit is None else skip + limit
+        slots = []
+        for cell in sorted(self._cells_in(west, south, east, north)):
+            for slot in grid.get(cell, ()):
+                if west <= lon[slot] <= east and south <= lat[slot] <= north:
+                    slots.append(slot)
+            if wanted is not None and len(slots) >= wanted:
+                break
+        return [(self._id(slot), self._score[slot]) for slot in slots[skip:wanted]]
+
+    def nearby(
+        self, lon: float, lat: float, radius_m: float, limit: int = 50
+    ) -> List[Tuple[uuid.UUID, float]]:
+        """``(id, distance_m)`` for spots within ``radius_m``, closest first."""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        lat_r = math.radians(lat)
+        cos_lat = math.cos(lat_r)
+        lons, lats, grid = self._lon, self._lat, self._grid
+        hits = []
+        west, east = lon - dlon, lon + dlon
+        if east - west >= 360:
+            spans = [(-180.0, 180.0)]
+        elif west < -180:
+            # The circle crosses the antimeridian: search both sides of it.
+            spans = [(west + 360, 180.0), (-180.0, east)]
+        elif east > 180:
+            spans = [(west, 180.0), (-180.0, east - 360)]
+        else:
+            spans = [(west, east)]
+        cells = set()
+        for span_west, span_east in spans:
+            cells.update(self._cells_in(span_west, lat - dlat, span_east, lat + dlat))
+        for cell in cells:
+            for slot in grid.get(cell, ()):
+                # Haversine distance
+                p_lat = math.radians(lats[slot])
+                a = (
+                    math.sin((p_lat - lat_r) / 2) ** 2
+                    + cos_lat * math.cos(p_lat) * math.sin(math.radians(lons[slot] - lon) / 2) ** 2
+                )
+                dist = 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+                if dist <= radius_m:
+                    hits.append((dist, slot))
+        hits.sort()
+        return [(self._id(slot), dist) for dist, slot in hits[:limit]]
+
+
+spot_index = SpotIndex()
+
+
+def _spot_rows_query(spot_ids: Optional[List[uuid.UUID]] = None):
+    scores = (
+        select(Vote.spot_id, func.sum(Vote.value).label("score"))
+        .group_by(Vote.spot_id)
+        .subquery()
+    )
+    query = select(
+        Spot.id,
+        func.ST_X(Spot.location),
+        func.ST_Y(Spot.location),
+        func.coalesce(scores.c.score, 0),
+    ).outerjoin(scores, scores.c.spot_id == Spot.id)
+    if spot_ids is not None:
+        query = query.where(Spot.id.in_(spot_ids))
+    return query
+
+
+async def bootstrap(sessionmaker: async_sessionmaker[AsyncSession], index: SpotIndex = spot_index) -> None:
+    """Stream the spots table into ``index``; leaves it not ready if over budget."""
+    index.clear()
+    async with sessionmaker() as session:
+        result = await session.stream(_spot_rows_query().execution_options(yield_per=10_000))
+        try:
+            async for spot_id, lon, lat, score in result:
+                index.upsert(spot_id, lon, lat, int(score))
+        except MemoryError:
+            logger.warning("spot read model disabled: table exceeds %.0f MB budget", MAX_MB)
+            index.clear()
+            return
+    index.ready = True
+    logger.info("spot read model loaded %d spots (~%.0f MB)", len(index), index.memory_bytes() / 2 ** 20)
+
+
+async def refresh_spots(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    spot_ids: List[uuid.UUID],
+    index: SpotIndex = spot_index,
+) -> None:
+    """Reload specific spots from the database (deleted ones are dropped)."""
+    async with sessionmaker() as session:
+        rows = (await session.execute(_spot_rows_query(spot_ids))).all()
+    seen = set()
+    try:
+        for spot_id, lon, lat, score in rows:
+            index.upsert(spot_id, lon, lat, int(score))
+            seen.add(spot_id)
+    except MemoryError:
+        logger.warning("spot read model disabled: grew past %.0f MB budget", MAX_MB)
+        index.clear()
+        return
+    for spot_id in spot_ids:
+        if spot_id not in seen:
+            index.remove(spot_id)
+
+
+async def notify_spot_changed(db: AsyncSession, spot_id: uuid.UUID) -> None:
+    """Queue a change notification; Postgres delivers it when ``db`` commits."""
+    if ENABLED:
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": str(spot_id)},
+        )
+
+
+class ChangeListener:
+    """Dedicated asyncpg connection LISTENing for spot changes.
+
+    ``sessionmaker`` should point at the primary: notifications fire on
+    commit there, before replicas necessarily have the row.
+
+    Notified ids collect in a set that a single consumer task drains, one
+    batched refresh at a time. A refresh reads the spot's state as of when it
+    runs, so a later refresh never races an earlier one and the last one
+    applied always follows the last change.
+    """
+
+    def __init__(self, dsn: str, sessionmaker: async_sessionmaker[AsyncSession], index: SpotIndex = spot_index):
+        # SQLAlchemy URL -> plain libpq DSN for asyncpg
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.sessionmaker = sessionmaker
+        self.index = index
+        self._conn = None
+        self._pending: set = set()
+        self._wakeup = asyncio.Event()
+        self._consumer: Optional[asyncio.Task] = None
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        try:
+            spot_id = uuid.UUID(payload)
+        except ValueError:
+            return
+        self._pending.add(spot_id)
+        self._wakeup.set()
+
+    async def _consume(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            spot_ids, self._pending = list(self._pending), set()
+            try:
+                await refresh_spots(self.sessionmaker, spot_ids, self.index)
+            except Exception:
+                logger.warning("could not refresh %d spots; retrying", len(spot_ids), exc_info=True)
+                self._pending.update(spot_ids)
+                self._wakeup.set()
+                await asyncio.sleep(1)
+
+    def _on_terminate(self, conn) -> None:
+        # We can no longer see changes; fall back to PostGIS until restart.
+        logger.warning("spot read model listener lost its connection; disabling")
+        self.index.ready = False
+
+    async def start(self) -> None:
+        import asyncpg
+
+        # Listen before bootstrapping so no change slips between the two.
+        self._conn = await asyncpg.connect(self.dsn)
+        self._conn.add_termination_listener(self._on_terminate)
+        await self._conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        await bootstrap(self.sessionmaker, self.index)
+        # Changes notified during the bootstrap are refreshed after it.
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self) -> None:
+        if self._consumer is not None:
+            self._consumer.cancel()
+            self._consumer = None
+        if self._conn is not None:
+            self._conn.remove_termination_listener(self._on_terminate)
+            await self._conn.close()
+            self._conn = None
+        self.index.ready = False
@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import exports, profiling
+from ..database import get_db, get_read_db
+from ..routers.auth import require_admin
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles():
+    """
+    Stored request profiles, newest first (see app/profiling.py).
+    """
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}/{kind}")
+async def download_profile(profile_id: str, kind: str):
+    """
+    Download one artifact of a profile: ``prof``, ``txt``, ``html``,
+    ``alloc.txt`` or ``tracemalloc``.
+    """
+    path = profiling.artifact_path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=profiling.ARTIFACTS[kind], filename=path.name)
+
+
+@router.post("/exports", status_code=202)
+async def create_export(
+    north: Optional[float] = Query(None, ge=-90, le=90),
+    south: Optional[float] = Query(None, ge=-90, le=90),
+    east: Optional[float] = Query(None, ge=-180, le=180),
+    west: Optional[float] = Query(None, ge=-180, le=180),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queue a GeoJSON export of all spots, or of those in a bounding box
+    (see app/exports.py). Poll ``GET /admin/exports/{id}`` for the file.
+    """
+    bbox = None
+    if all(coord is not None for coord in (north, south, east, west)):
+        if west > east or south > north:
+            raise HTTPException(status_code=400, detail="Invalid bounding box coordinates")
+        bbox = (west, south, east, north)
+    export_id = await exports.enqueue_export(db, bbox)
+    await db.commit()
+    return {"id": export_id}
+
+
+@router.get("/exports/{export_id}")
+async def get_export(export_id: str, db: AsyncSession = Depends(get_read_db)):
+    """
+    Status of an export: ``queued``, ``done`` (with ``url``) or ``failed``.
+    """
+    status = await exports.export_status(db, export_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return status
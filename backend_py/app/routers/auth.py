@@ -10,8 +10,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 
+from .. import tracing
 from ..config import get_settings
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models.user import User
 
 router = APIRouter(prefix="/auth/google", tags=["auth"])
@@ -33,6 +34,29 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/google/login")
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# Comma-separated emails allowed to use the admin endpoints and request profiles.
+ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+)
+
+
+def decode_bearer(authorization: str | None) -> dict | None:
+    """Claims of a valid JWT in an ``Authorization: Bearer`` header value, else None.
+
+    For middleware that runs before dependencies; no database lookup.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    except JWTError:
+        return None
+
+
+def is_admin_email(email: str | None) -> bool:
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
 
 @router.get("/login")
 async def login_via_google(request: Request):
@@ -115,13 +139,21 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user: User | None = result.scalars().first()
+    with tracing.span("auth.current_user"):
+        result = await db.execute(select(User).where(User.id == user_uuid))
+        user: User | None = result.scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
 
+async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dependency for admin-only endpoints (ADMIN_EMAILS)."""
+    if not is_admin_email(current_user.email):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
+
+
 @router.get("/me", response_model=dict)
 async def get_me(current_user: User = Depends(get_current_user)):
     """Return the currently authenticated user."""
@@ -137,7 +169,7 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     if credentials is None:
         return None
@@ -151,6 +183,7 @@ async def get_current_user_optional(
     except (JWTError, ValueError):
         return None
 
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user: User | None = result.scalars().first()
+    with tracing.span("auth.current_user"):
+        result = await db.execute(select(User).where(User.id == user_uuid))
+        user: User | None = result.scalars().first()
     return user 
\ No newline at end of file
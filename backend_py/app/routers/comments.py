@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import Dict, List, Optional
 from uuid import UUID
 
-from .. import schemas
-from ..database import get_db
+from .. import heatmap, loaders, schemas, trending
+from ..database import get_db, get_read_db
+from ..dataloader import Loaders, get_loaders
 from ..models import Comment, Spot, User
 from .auth import get_current_user
+from .spots import parse_id_list, spot_detail_cache
 
 router = APIRouter(
     tags=["comments"],
@@ -34,15 +38,23 @@ async def create_comment_for_spot(
         spot_id=spot_id
     )
     db.add(db_comment)
+    await heatmap.add_activity(db, spot_id, comments=1)
+    await trending.bump(db, spot_id, trending.COMMENT_WEIGHT)
     await db.commit()
-    await db.refresh(db_comment)
-    return db_comment
+    spot_detail_cache.invalidate(db_spot.short_id)
+    # created_at is the partition key: only the current month is searched.
+    result = await db.execute(
+        select(Comment)
+        .options(*loaders.COMMENT)
+        .where(Comment.id == db_comment.id, Comment.created_at == db_comment.created_at)
+    )
+    return result.scalar_one()
 
 
 @router.get("/spots/{spot_id}/comments", response_model=List[schemas.Comment])
 async def get_comments_for_spot(
     spot_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
 ):
@@ -51,10 +63,27 @@ async def get_comments_for_spot(
     """
     result = await db.execute(
         select(Comment)
+        .options(*loaders.COMMENT)
         .where(Comment.spot_id == spot_id)
         .order_by(Comment.created_at.desc())
         .offset(skip)
         .limit(limit)
     )
     comments = result.scalars().all()
-    return comments 
\ No newline at end of file
+    return comments 
+
+
+@router.get("/comments/batch", response_model=Dict[UUID, List[schemas.Comment]])
+async def get_comments_batch(
+    spot_ids: Optional[str] = Query(None, description="Comma-separated spot ids"),
+    limit: int = Query(100, ge=1, le=500, description="Newest comments per spot"),
+    dataloaders: Loaders = Depends(get_loaders),
+):
+    """
+    Retrieve the comments of several spots at once, newest first, keyed by spot id.
+    """
+    ids = parse_id_list(spot_ids, "spot_ids", UUID)
+    per_spot = await dataloaders.recent_comments(limit).load_many(ids)
+    # Concurrent, so every spot's comment authors come from one users query.
+    models = await asyncio.gather(*(dataloaders.comment_models(comments) for comments in per_spot))
+    return dict(zip(ids, models))
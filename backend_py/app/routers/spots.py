@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, Query
+import asyncio
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, select
-from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.future import select
+from geoalchemy2 import Geography
 from geoalchemy2.functions import ST_MakeEnvelope, ST_Contains
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
-from app.config import get_r2_client, R2_BUCKET, R2_ENDPOINT
 from fastapi.responses import JSONResponse
 
-from .. import schemas
-from ..database import get_db
-from ..models import Spot, User, Comment, Vote
+from .. import duplicates, geohash, heatmap, loaders, photos, pins, schemas, trending, viewport
+from ..cache import SWRCache
+from ..database import _is_pinned, get_db, get_read_db, read_sessionmaker
+from ..dataloader import Loaders, get_loaders
+from ..models import Photo, Spot, SpotGridCell, User, Vote
+from ..models.photo import original_key
+from ..read_model import notify_spot_changed, spot_index
+from ..singleflight import SingleFlight
+from ..storage import LocalStorage, get_storage
 from ..routers.auth import get_current_user, get_current_user_optional
 
 router = APIRouter(
@@ -20,20 +28,36 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=schemas.Spot, status_code=201)
+@router.post(
+    "/",
+    response_model=schemas.Spot,
+    status_code=201,
+    responses={409: {"model": schemas.DuplicateSpots, "description": "Probably already mapped"}},
+)
 async def create_spot(
     spot: schemas.SpotCreate,
+    force: bool = Query(False, description="Create even if it looks like an existing spot"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Create a new skate spot.
+    Refused with 409 and the likely duplicates if a similar spot is close by, unless ``force``.
     """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     # Convert GeoJSON to WKT format for PostGIS
     point = spot.location["coordinates"]
+    if not force:
+        candidates = await duplicates.find_candidates(db, point[0], point[1], spot.name)
+        if candidates:
+            body = schemas.DuplicateSpots(
+                detail="A similar spot already exists nearby",
+                candidates=[schemas.DuplicateCandidate(**candidate) for candidate in candidates],
+            )
+            return JSONResponse(body.model_dump(mode="json"), status_code=409)
+
     wkt_location = f"POINT({point[0]} {point[1]})"
 
     db_spot = Spot(
@@ -43,24 +67,189 @@ async def create_spot(
         user_id=current_user.id,
     )
     db.add(db_spot)
+    await db.flush()
+    await heatmap.add_spot(db, db_spot.id)
+    await trending.bump(db, db_spot.id, trending.NEW_SPOT_WEIGHT)
+    await notify_spot_changed(db, db_spot.id)
     await db.commit()
-    await db.refresh(db_spot)
-    # Eagerly load comments and user for serialization
+    return await _spot_response(db, db_spot.id, None)
+
+
+async def _spot_scores(db: AsyncSession, spot_ids: List[UUID]) -> Dict[UUID, int]:
+    """Vote totals for many spots in a single grouped query."""
+    if not spot_ids:
+        return {}
+    result = await db.execute(
+        select(Vote.spot_id, func.sum(Vote.value))
+        .where(Vote.spot_id.in_(spot_ids))
+        .group_by(Vote.spot_id)
+    )
+    return {spot_id: total or 0 for spot_id, total in result.all()}
+
+
+async def _my_votes(db: AsyncSession, user_id: UUID, spot_ids: List[UUID]) -> Dict[UUID, int]:
+    """The given user's vote on each of ``spot_ids`` (missing means no vote)."""
+    if not spot_ids:
+        return {}
+    result = await db.execute(
+        select(Vote.spot_id, Vote.value).where(Vote.user_id == user_id, Vote.spot_id.in_(spot_ids))
+    )
+    return dict(result.all())
+
+
+async def _my_vote(db: AsyncSession, user_id: UUID, spot_id: UUID) -> Optional[int]:
+    return (await _my_votes(db, user_id, [spot_id])).get(spot_id)
+
+
+async def _load_spots_by_ids(
+    db: AsyncSession,
+    spot_ids: List[UUID],
+    scores: Optional[Dict[UUID, int]] = None,
+) -> List[schemas.Spot]:
+    """Hydrate spots by id, preserving the order of ``spot_ids``."""
+    if not spot_ids:
+        return []
     result = await db.execute(
         select(Spot)
-        .options(
-            joinedload(Spot.user),
-            joinedload(Spot.comments).joinedload(Comment.user)
-        )
-        .where(Spot.id == db_spot.id)
+        .options(*loaders.SPOT)
+        .where(Spot.id.in_(spot_ids))
+        # Write paths reload spots they just changed; refresh what the
+        # session already holds instead of trusting it.
+        .execution_options(populate_existing=True)
     )
-    spot_with_comments = result.unique().scalar_one()
-    return spot_with_comments
+    by_id = {spot.id: spot for spot in result.scalars()}
+    if scores is None:
+        scores = await _spot_scores(db, list(by_id))
+    spots = []
+    for spot_id in spot_ids:
+        spot = by_id.get(spot_id)
+        if spot is None:
+            continue
+        spot.score = scores.get(spot_id, 0)
+        spot.my_vote = None
+        spots.append(schemas.Spot.model_validate(spot))
+    return spots
+
+
+async def _spot_response(db: AsyncSession, spot_id: UUID, my_vote: Optional[int]) -> schemas.Spot:
+    """The full response for one spot after a write, with the caller's vote."""
+    spots = await _load_spots_by_ids(db, [spot_id])
+    if not spots:
+        raise HTTPException(status_code=404, detail="Spot not found")
+    return spots[0].model_copy(update={"my_vote": my_vote})
+
+
+def _index_hits(
+    skip: int,
+    limit: int,
+    bbox: Optional[Tuple[float, float, float, float]],
+    geohash_prefix: Optional[str],
+    area: Optional[viewport.Area],
+) -> Optional[List[Tuple[UUID, int]]]:
+    """``(id, score)`` from the read model, or None if the listing needs SQL.
+
+    The read model has no geohashes, so tile and prefix filters go to Postgres.
+    """
+    if geohash_prefix is not None or not spot_index.ready:
+        return None
+    if area is None:
+        return None if bbox is None else spot_index.bbox(*bbox, skip=skip, limit=limit)
+    if area.tiles:
+        return None
+    # Pieces of a viewport difference share edges; keep each spot once.
+    hits = {}
+    for box in area.boxes:
+        for spot_id, score in spot_index.bbox(*box, limit=skip + limit):
+            hits.setdefault(spot_id, score)
+    return list(hits.items())[skip:skip + limit]
+
+
+async def _load_spots(
+    db: AsyncSession,
+    skip: int,
+    limit: int,
+    bbox: Optional[Tuple[float, float, float, float]],
+    geohash_prefix: Optional[str] = None,
+    area: Optional[viewport.Area] = None,
+) -> List[schemas.Spot]:
+    """Run the spot listing query and build user-independent response models.
+
+    ``area``, if given, replaces ``bbox`` with the part of the viewport the
+    client does not have yet (see app/viewport.py).
+    """
+    if area is not None and area.is_empty():
+        return []
+    hits = _index_hits(skip, limit, bbox, geohash_prefix, area)
+    if hits is not None:
+        # Pick ids and scores from the in-memory read model, then hydrate by
+        # primary key; no spatial query or vote aggregation in Postgres.
+        return await _load_spots_by_ids(db, [spot_id for spot_id, _ in hits], dict(hits))
+
+    query = select(Spot).options(*loaders.SPOT)
+
+    if area is not None:
+        query = query.where(viewport.clause(area))
+    elif bbox is not None:
+        # Create a bounding box polygon from the coordinates
+        # Note: PostGIS uses (longitude, latitude) order
+        west, south, east, north = bbox
+        bounding_box = ST_MakeEnvelope(west, south, east, north, 4326)
+
+        # Filter spots that are contained within the bounding box
+        query = query.where(ST_Contains(bounding_box, Spot.location))
+
+    if geohash_prefix is not None:
+        # Range scan on ix_spots_geohash.
+        lo, hi = geohash.prefix_range(geohash_prefix)
+        query = query.where(Spot.geohash >= lo, Spot.geohash < hi)
+
+    result = await db.execute(query.offset(skip).limit(limit))
+    spots = result.scalars().all()
+
+    scores = await _spot_scores(db, [spot.id for spot in spots])
+    for spot in spots:
+        spot.score = scores.get(spot.id, 0)
+        spot.my_vote = None
+    return [schemas.Spot.model_validate(spot) for spot in spots]
+
+
+async def _load_pins(
+    db: AsyncSession,
+    skip: int,
+    limit: int,
+    bbox: Optional[Tuple[float, float, float, float]],
+    geohash_prefix: Optional[str] = None,
+    area: Optional[viewport.Area] = None,
+) -> List[pins.PinRow]:
+    if area is not None and area.is_empty():
+        return []
+    hits = _index_hits(skip, limit, bbox, geohash_prefix, area)
+    if hits is not None:
+        return await pins.load_pins_by_ids(db, [spot_id for spot_id, _ in hits], dict(hits))
+    return await pins.load_pins(db, skip, limit, bbox, geohash_prefix, area)
+
+
+def _parse_bbox(
+    north: Optional[float], south: Optional[float], east: Optional[float], west: Optional[float]
+) -> Optional[Tuple[float, float, float, float]]:
+    if not all(coord is not None for coord in [north, south, east, west]):
+        return None
+    # Ensure coordinates are valid
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="Invalid bounding box coordinates")
+    # Normalise so viewports differing only in float noise share a flight.
+    return tuple(round(coord, 6) for coord in (west, south, east, north))
+
+
+# Identical concurrent listings (e.g. everyone opening the same shared link)
+# share one DB execution; see app/singleflight.py.
+_spot_listing_flight = SingleFlight("spots_listing_singleflight")
 
 
 @router.get("/", response_model=List[schemas.Spot])
 async def get_spots(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User | None = Depends(get_current_user_optional),
     skip: int = 0,
     limit: int = 100,
@@ -68,50 +257,272 @@ async def get_spots(
     south: Optional[float] = None,
     east: Optional[float] = None,
     west: Optional[float] = None,
+    geohash_prefix: Optional[str] = Query(
+        None,
+        pattern="^[0-9b-hjkmnp-z]{1,9}$",
+        description="Only spots whose geohash starts with this, e.g. a map tile key",
+    ),
+    prev_north: Optional[float] = None,
+    prev_south: Optional[float] = None,
+    prev_east: Optional[float] = None,
+    prev_west: Optional[float] = None,
+    tile_precision: Optional[int] = Query(
+        None, ge=1, le=geohash.SPOT_PRECISION, description="Return whole geohash tiles of this precision"
+    ),
+    have_tiles: Optional[str] = Query(None, description="Comma-separated tiles the client already holds"),
+    format: str = Query("json", pattern="^(json|columnar|msgpack)$"),
 ):
     """
     Retrieve a list of skate spots.
-    Can be filtered by a bounding box.
+    Can be filtered by a bounding box and/or a geohash prefix.
+    ``format=columnar|msgpack`` returns compact map pins instead (see app/pins.py).
+
+    While panning, send what the client already holds to get only the rest
+    (see app/viewport.py): either the previous bounding box (``prev_*``; only
+    if that response was not cut off by ``limit``), or ``tile_precision``
+    and ``have_tiles``, which return every spot of each missing tile that
+    overlaps the bounding box.
+    """
+    bbox = _parse_bbox(north, south, east, west)
+    prev = _parse_bbox(prev_north, prev_south, prev_east, prev_west)
+
+    area = None
+    if tile_precision is not None:
+        if bbox is None:
+            raise HTTPException(status_code=400, detail="tile_precision needs a bounding box")
+        have = parse_id_list(have_tiles, "have_tiles", max_items=viewport.MAX_TILES)
+        if any(len(tile) != tile_precision or not geohash.is_valid(tile) for tile in have):
+            raise HTTPException(status_code=400, detail="Invalid have_tiles")
+        try:
+            area = viewport.Area(tiles=tuple(viewport.missing_tiles(bbox, tile_precision, have)))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    elif prev is not None and bbox is not None:
+        area = viewport.Area(boxes=tuple(viewport.difference(bbox, prev)))
+
+    # Callers pinned to the primary (they just wrote) must not join a flight
+    # reading a lagging replica, so they only coalesce with each other.
+    pinned = _is_pinned(request)
+    if format != "json":
+        rows = await _spot_listing_flight.do(
+            ("pins", pinned, skip, limit, bbox, geohash_prefix, area),
+            lambda: _load_pins(db, skip, limit, bbox, geohash_prefix, area),
+        )
+        if format == "msgpack":
+            return Response(pins.pack(rows), media_type=pins.MSGPACK_MEDIA_TYPE)
+        return JSONResponse(pins.columnar(rows))
+
+    # The shared result never contains per-user data, so anonymous and
+    # authenticated callers coalesce onto the same flight; ``my_vote`` is
+    # overlaid per caller below.
+    spots = await _spot_listing_flight.do(
+        (pinned, skip, limit, bbox, geohash_prefix, area),
+        lambda: _load_spots(db, skip, limit, bbox, geohash_prefix, area),
+    )
+
+    if current_user:
+        my_votes = await _my_votes(db, current_user.id, [spot.id for spot in spots])
+        spots = [spot.model_copy(update={"my_vote": my_votes.get(spot.id)}) for spot in spots]
+    return spots
+
+
+@router.get("/heatmap", response_model=schemas.Heatmap)
+async def get_heatmap(
+    north: float = Query(..., ge=-90, le=90),
+    south: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    west: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=22),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Spot density and activity for a viewport, from pre-aggregated grid cells.
     """
-    query = select(Spot).options(
-        joinedload(Spot.user),
-        joinedload(Spot.comments).joinedload(Comment.user)
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="Invalid bounding box coordinates")
+
+    precision = heatmap.precision_for_zoom(zoom)
+    # Every cell overlapping the viewport, including those centred outside it.
+    min_lon, min_lat, max_lon, max_lat = heatmap.center_bounds(west, south, east, north, precision)
+    result = await db.execute(
+        select(SpotGridCell)
+        .where(
+            SpotGridCell.precision == precision,
+            SpotGridCell.center_lat.between(min_lat, max_lat),
+            SpotGridCell.center_lon.between(min_lon, max_lon),
+            SpotGridCell.spot_count > 0,
+        )
     )
+    cells = [
+        schemas.HeatmapCell(
+            geohash=cell.geohash,
+            lon=cell.center_lon,
+            lat=cell.center_lat,
+            spots=cell.spot_count,
+            votes=cell.vote_count,
+            comments=cell.comment_count,
+            activity=cell.vote_count + cell.comment_count,
+        )
+        for cell in result.scalars()
+    ]
+    return schemas.Heatmap(precision=precision, cells=cells)
+
 
+@router.get("/trending", response_model=List[schemas.Spot])
+async def get_trending_spots(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User | None = Depends(get_current_user_optional),
+    limit: int = Query(20, ge=1, le=100),
+    north: Optional[float] = None,
+    south: Optional[float] = None,
+    east: Optional[float] = None,
+    west: Optional[float] = None,
+):
+    """
+    Retrieve the hottest spots by time-decayed votes and comments.
+    Can be filtered by a bounding box.
+    """
+    query = select(Spot.id).order_by(Spot.trending_score.desc()).limit(limit)
     if all(coord is not None for coord in [north, south, east, west]):
-        # Ensure coordinates are valid
         if west > east or south > north:
             raise HTTPException(status_code=400, detail="Invalid bounding box coordinates")
-
-        # Create a bounding box polygon from the coordinates
-        # Note: PostGIS uses (longitude, latitude) order
         bounding_box = ST_MakeEnvelope(west, south, east, north, 4326)
-
-        # Filter spots that are contained within the bounding box
         query = query.where(ST_Contains(bounding_box, Spot.location))
 
-    result = await db.execute(query.offset(skip).limit(limit))
-    spots = result.scalars().unique().all()
+    spot_ids = list((await db.execute(query)).scalars())
+    spots = await _load_spots_by_ids(db, spot_ids)
+    if current_user:
+        my_votes = await _my_votes(db, current_user.id, spot_ids)
+        spots = [spot.model_copy(update={"my_vote": my_votes.get(spot.id)}) for spot in spots]
+    return spots
 
-    # Attach vote info
-    user_id = current_user.id if current_user else None
 
-    for spot in spots:
-        vote_result = await db.execute(
-            select(func.coalesce(func.sum(Vote.value), 0)).where(Vote.spot_id == spot.id)
+@router.get("/nearby", response_model=List[schemas.Spot])
+async def get_nearby_spots(
+    lon: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    radius_m: float = Query(1000, gt=0, le=50_000, description="Search radius in metres"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User | None = Depends(get_current_user_optional),
+):
+    """
+    Retrieve the spots closest to a point, nearest first.
+    """
+    if spot_index.ready:
+        spot_ids = [spot_id for spot_id, _ in spot_index.nearby(lon, lat, radius_m, limit)]
+    else:
+        point = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326).cast(Geography)
+        location = Spot.location.cast(Geography)
+        result = await db.execute(
+            select(Spot.id)
+            .where(func.ST_DWithin(location, point, radius_m))
+            .order_by(func.ST_Distance(location, point))
+            .limit(limit)
         )
-        spot.score = vote_result.scalar() or 0
+        spot_ids = list(result.scalars())
 
-        if user_id:
-            my_vote_result = await db.execute(
-                select(Vote.value).where(Vote.spot_id == spot.id, Vote.user_id == user_id)
-            )
-            spot.my_vote = my_vote_result.scalar()
-        else:
-            spot.my_vote = None
+    spots = await _load_spots_by_ids(db, spot_ids)
+    if current_user:
+        my_votes = await _my_votes(db, current_user.id, spot_ids)
+        spots = [spot.model_copy(update={"my_vote": my_votes.get(spot.id)}) for spot in spots]
     return spots
 
 
+# Most ids one batch request may ask for; keeps the IN lists and response bounded.
+MAX_BATCH_IDS = 100
+
+
+def parse_id_list(value: Optional[str], name: str, parse=str, max_items: int = MAX_BATCH_IDS) -> List:
+    """Split a comma-separated query parameter, de-duplicated in order."""
+    items = list(dict.fromkeys(part.strip() for part in (value or "").split(",") if part.strip()))
+    if len(items) > max_items:
+        raise HTTPException(status_code=400, detail=f"At most {max_items} {name} per request")
+    try:
+        return [parse(item) for item in items]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+
+
+@router.get("/batch", response_model=List[schemas.Spot])
+async def get_spots_batch(
+    ids: Optional[str] = Query(None, description="Comma-separated spot ids"),
+    short_ids: Optional[str] = Query(None, description="Comma-separated short ids"),
+    dataloaders: Loaders = Depends(get_loaders),
+    current_user: User | None = Depends(get_current_user_optional),
+):
+    """
+    Retrieve several spots at once, in the order asked for; unknown ids are skipped.
+    """
+    if (ids is None) == (short_ids is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of ids or short_ids")
+    if ids is not None:
+        found = await dataloaders.spots.load_many(parse_id_list(ids, "ids", UUID))
+    else:
+        found = await dataloaders.spots_by_short_id.load_many(parse_id_list(short_ids, "short_ids"))
+    spots = await dataloaders.spot_models([spot for spot in found if spot is not None])
+
+    if current_user:
+        my_votes = await _my_votes(dataloaders.db, current_user.id, [spot.id for spot in spots])
+        spots = [spot.model_copy(update={"my_vote": my_votes.get(spot.id)}) for spot in spots]
+    return spots
+
+
+async def _load_spot_by_short_id(db: AsyncSession, short_id: str) -> Optional[schemas.Spot]:
+    result = await db.execute(select(Spot).options(*loaders.SPOT).where(Spot.short_id == short_id))
+    spot = result.scalar_one_or_none()
+    if spot is None:
+        return None
+    spot.score = (await _spot_scores(db, [spot.id])).get(spot.id, 0)
+    spot.my_vote = None
+    return schemas.Spot.model_validate(spot)
+
+
+async def _refresh_spot_by_short_id(short_id: str) -> Optional[schemas.Spot]:
+    # Runs in the background after the response, so it needs its own session.
+    async with read_sessionmaker()() as session:
+        return await _load_spot_by_short_id(session, short_id)
+
+
+# Shared links and QR codes hammer a handful of spots; keep them in memory.
+SPOT_DETAIL_TTL = 30
+SPOT_DETAIL_STALE_TTL = 300
+spot_detail_cache: SWRCache[schemas.Spot] = SWRCache(
+    "spot_by_short_id", ttl=SPOT_DETAIL_TTL, stale_ttl=SPOT_DETAIL_STALE_TTL
+)
+
+
+@router.get("/by-short-id/{short_id}", response_model=schemas.Spot)
+async def get_spot_by_short_id(
+    short_id: str,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User | None = Depends(get_current_user_optional),
+):
+    """
+    Retrieve a single skate spot by short_id (shared links and QR codes).
+    """
+    spot = await spot_detail_cache.get(
+        short_id,
+        lambda: _load_spot_by_short_id(db, short_id),
+        lambda: _refresh_spot_by_short_id(short_id),
+    )
+    if spot is None:
+        raise HTTPException(status_code=404, detail="Spot not found")
+
+    if current_user:
+        my_votes = await _my_votes(db, current_user.id, [spot.id])
+        response.headers["Cache-Control"] = "private, no-cache"
+        return spot.model_copy(update={"my_vote": my_votes.get(spot.id)})
+
+    # Anonymous responses are identical for everyone, so let a CDN hold them.
+    response.headers["Cache-Control"] = (
+        f"public, max-age={SPOT_DETAIL_TTL}, stale-while-revalidate={SPOT_DETAIL_STALE_TTL}"
+    )
+    response.headers["Vary"] = "Authorization"
+    return spot
+
+
 @router.put("/{spot_id}", response_model=schemas.Spot)
 async def update_spot(
     spot_id: UUID,
@@ -133,6 +544,9 @@ async def update_spot(
         )
 
     update_data = spot_update.model_dump(exclude_unset=True)
+    moved = bool(update_data.get("location"))
+    if moved:
+        await heatmap.remove_spot(db, db_spot.id)
 
     for key, value in update_data.items():
         if key == "location" and value:
@@ -142,9 +556,13 @@ async def update_spot(
         else:
             setattr(db_spot, key, value)
 
+    if moved:
+        await db.flush()
+        await heatmap.add_spot(db, db_spot.id)
+    await notify_spot_changed(db, db_spot.id)
     await db.commit()
-    await db.refresh(db_spot)
-    return db_spot
+    spot_detail_cache.invalidate(db_spot.short_id)
+    return await _spot_response(db, spot_id, await _my_vote(db, current_user.id, spot_id))
 
 
 @router.put("/by-short-id/{short_id}", response_model=schemas.Spot)
@@ -170,6 +588,9 @@ async def update_spot_by_short_id(
         )
 
     update_data = spot_update.model_dump(exclude_unset=True)
+    moved = bool(update_data.get("location"))
+    if moved:
+        await heatmap.remove_spot(db, db_spot.id)
 
     for key, value in update_data.items():
         if key == "location" and value:
@@ -179,31 +600,13 @@ async def update_spot_by_short_id(
         else:
             setattr(db_spot, key, value)
 
+    if moved:
+        await db.flush()
+        await heatmap.add_spot(db, db_spot.id)
+    await notify_spot_changed(db, db_spot.id)
     await db.commit()
-    
-    # Reload the spot with all relationships to avoid serialization issues
-    result = await db.execute(
-        select(Spot)
-        .options(
-            joinedload(Spot.user),
-            joinedload(Spot.comments).joinedload(Comment.user)
-        )
-        .where(Spot.short_id == short_id)
-    )
-    updated_spot = result.unique().scalar_one()
-    
-    # Add vote info
-    vote_result = await db.execute(
-        select(func.coalesce(func.sum(Vote.value), 0)).where(Vote.spot_id == updated_spot.id)
-    )
-    updated_spot.score = vote_result.scalar() or 0
-
-    my_vote_result = await db.execute(
-        select(Vote.value).where(Vote.spot_id == updated_spot.id, Vote.user_id == current_user.id)
-    )
-    updated_spot.my_vote = my_vote_result.scalar()
-    
-    return updated_spot
+    spot_detail_cache.invalidate(short_id)
+    return await _spot_response(db, db_spot.id, await _my_vote(db, current_user.id, db_spot.id))
 
 
 @router.delete("/{spot_id}", status_code=204)
@@ -225,28 +628,108 @@ async def delete_spot(
             status_code=403, detail="Not authorized to delete this spot"
         )
 
+    await heatmap.remove_spot(db, spot_id)
+    await photos.detach(db, spot_id)
     await db.delete(db_spot)
+    await notify_spot_changed(db, spot_id)
     await db.commit()
+    spot_detail_cache.invalidate(db_spot.short_id)
     return Response(status_code=204)
 
 
 @router.post("/image-upload-url")
-def create_presigned_url(
-    filename: str = Query(..., description="The name of the file to upload"),
-    content_type: str = Query(..., description="The MIME type of the file")
+async def create_presigned_url(
+    sha256: str = Query(..., pattern="^[0-9a-f]{64}$", description="Hex SHA-256 of the file to upload"),
+    content_type: str = Query(..., description="The MIME type of the file"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    s3 = get_r2_client()
-    url = s3.generate_presigned_url(
-        ClientMethod="put_object",
-        Params={
-            "Bucket": R2_BUCKET,
-            "Key": filename,
-            "ContentType": content_type,
-        },
-        ExpiresIn=600,  # 10 minutes
-    )
-    public_url = f"https://{R2_BUCKET}.{R2_ENDPOINT.replace('https://', '')}/{filename}"
-    return JSONResponse({"url": url, "public_url": public_url})
+    """
+    Get an upload URL for a photo, unless its content is already stored.
+    """
+    storage = get_storage()
+    key = original_key(sha256)
+    known = await db.get(Photo, sha256)
+    response = {"sha256": sha256, "key": key, "public_url": storage.url(key)}
+    # Ready photos are trusted from the table; otherwise ask the store, so an
+    # upload that has not been attached yet is not repeated.
+    if (known is not None and known.status == "ready") or (
+        (known is None or known.status == "pending") and await asyncio.to_thread(storage.exists, key)
+    ):
+        return JSONResponse({**response, "exists": True})
+
+    try:
+        upload = await asyncio.to_thread(storage.presign_put, key, content_type, sha256)
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    return JSONResponse({**response, **upload, "exists": False})
+
+
+@router.put("/local-uploads/{sha256}", status_code=204, include_in_schema=False)
+async def local_upload(request: Request, sha256: str = Path(..., pattern="^[0-9a-f]{64}$")):
+    """
+    Development stand-in for a presigned R2 upload when photos are stored locally.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not Found")
+    data = await request.body()
+    # Like R2's signed checksum: a key only ever holds its own content.
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise HTTPException(status_code=400, detail="Body does not match sha256")
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    await asyncio.to_thread(storage.put, original_key(sha256), data, content_type)
+    return Response(status_code=204)
+
+
+@router.post("/{spot_id}/photos", response_model=schemas.Photo, status_code=202)
+async def add_spot_photo(
+    spot_id: UUID,
+    photo: schemas.PhotoCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Attach an uploaded photo to a spot; thumbnails are generated in the background.
+    """
+    if not await asyncio.to_thread(get_storage().exists, original_key(photo.sha256)):
+        raise HTTPException(status_code=400, detail="Photo has not been uploaded")
+
+    result = await db.execute(select(Spot).where(Spot.id == spot_id).with_for_update())
+    db_spot = result.scalar_one_or_none()
+    if not db_spot:
+        raise HTTPException(status_code=404, detail="Spot not found")
+    if db_spot.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this spot")
+
+    db_photo = await photos.attach(db, spot_id, photo.sha256, current_user.id)
+    if db_photo is None:
+        raise HTTPException(status_code=409, detail="Photo already attached")
+    await db.commit()
+    spot_detail_cache.invalidate(db_spot.short_id)
+    return db_photo
+
+
+@router.delete("/{spot_id}/photos/{sha256}", status_code=204)
+async def remove_spot_photo(
+    spot_id: UUID,
+    sha256: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Detach a photo from a spot.
+    """
+    db_spot = await db.get(Spot, spot_id)
+    if not db_spot:
+        raise HTTPException(status_code=404, detail="Spot not found")
+    if db_spot.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this spot")
+
+    if not await photos.detach(db, spot_id, sha256):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    await db.commit()
+    spot_detail_cache.invalidate(db_spot.short_id)
+    return Response(status_code=204)
 
 
 # ----------------- Voting --------------------
@@ -269,28 +752,22 @@ async def vote_spot(
     db_vote = db_vote.scalars().first()
 
     if db_vote:
+        # A vote counts at its created_at with its current value (as in
+        # reconcile), so a flip re-weights it there, not now.
+        await trending.bump(db, spot_id, (vote.value - db_vote.value) * trending.VOTE_WEIGHT, db_vote.created_at)
         db_vote.value = vote.value
     else:
         db_vote = Vote(spot_id=spot_id, user_id=current_user.id, value=vote.value)
         db.add(db_vote)
+        await heatmap.add_activity(db, spot_id, votes=1)
+        await trending.bump(db, spot_id, vote.value * trending.VOTE_WEIGHT)
 
+    await notify_spot_changed(db, spot_id)
     await db.commit()
 
-    # return updated spot with score - eagerly load relationships to avoid serialization issues
-    result = await db.execute(
-        select(Spot)
-        .options(
-            joinedload(Spot.user),
-            joinedload(Spot.comments).joinedload(Comment.user)
-        )
-        .where(Spot.id == spot_id)
-    )
-    updated_spot = result.unique().scalar_one()
-    
-    score_result = await db.execute(select(func.coalesce(func.sum(Vote.value), 0)).where(Vote.spot_id == spot_id))
-    updated_spot.score = score_result.scalar() or 0
-    updated_spot.my_vote = vote.value
-    return updated_spot
+    response = await _spot_response(db, spot_id, vote.value)
+    spot_detail_cache.invalidate(response.short_id)
+    return response
 
 
 @router.delete("/{spot_id}/vote", response_model=schemas.Spot)
@@ -303,20 +780,11 @@ async def remove_vote(
     vote = res.scalars().first()
     if vote:
         await db.delete(vote)
+        await heatmap.add_activity(db, spot_id, votes=-1)
+        await trending.bump(db, spot_id, -vote.value * trending.VOTE_WEIGHT, vote.created_at)
+        await notify_spot_changed(db, spot_id)
         await db.commit()
 
-    # return updated spot with score - eagerly load relationships to avoid serialization issues
-    result = await db.execute(
-        select(Spot)
-        .options(
-            joinedload(Spot.user),
-            joinedload(Spot.comments).joinedload(Comment.user)
-        )
-        .where(Spot.id == spot_id)
-    )
-    updated_spot = result.unique().scalar_one()
-    
-    score_result = await db.execute(select(func.coalesce(func.sum(Vote.value), 0)).where(Vote.spot_id == spot_id))
-    updated_spot.score = score_result.scalar() or 0
-    updated_spot.my_vote = None
-    return updated_spot 
\ No newline at end of file
+    response = await _spot_response(db, spot_id, None)
+    spot_detail_cache.invalidate(response.short_id)
+    return response
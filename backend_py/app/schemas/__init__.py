@@ -1,7 +1,9 @@
-from .spot import Spot, SpotCreate, SpotUpdate, SpotBase
+from .spot import Spot, SpotCreate, SpotUpdate, SpotBase, DuplicateCandidate, DuplicateSpots
 from .comment import Comment, CommentCreate
 from .user import UserCreate, UserUpdate, UserBase, UserPublic
 from .vote import Vote, VoteCreate
+from .heatmap import Heatmap, HeatmapCell
+from .photo import Photo, PhotoCreate, PhotoVariant
 
 __all__ = [
     "UserCreate",
@@ -12,10 +14,17 @@ __all__ = [
     "SpotCreate",
     "SpotUpdate",
     "SpotBase",
+    "DuplicateCandidate",
+    "DuplicateSpots",
     "Comment",
     "CommentCreate",
     "Vote",
     "VoteCreate",
+    "Heatmap",
+    "HeatmapCell",
+    "Photo",
+    "PhotoCreate",
+    "PhotoVariant",
 ]
 
 UserPublic.model_rebuild()
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class HeatmapCell(BaseModel):
+    geohash: str
+    lon: float
+    lat: float
+    spots: int
+    votes: int
+    comments: int
+    # votes + comments, the activity signal used for heat intensity
+    activity: int
+
+
+class Heatmap(BaseModel):
+    precision: int
+    cells: List[HeatmapCell]
@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+
+class PhotoCreate(BaseModel):
+    # Hex SHA-256 of the uploaded original (see /spots/image-upload-url)
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$")
+
+
+class PhotoVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    bytes: int
+
+
+class Photo(BaseModel):
+    sha256: str
+    url: str
+    # pending -> ready | failed
+    status: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes: Optional[int] = None
+    # {"thumb": {"webp": ..., "avif": ...}, "medium": {...}}
+    variants: Dict[str, Dict[str, PhotoVariant]] = {}
+
+    class Config:
+        from_attributes = True
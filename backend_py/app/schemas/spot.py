@@ -8,6 +8,7 @@ from shapely.wkb import loads as wkb_loads
 import json
 
 from .comment import Comment
+from .photo import Photo
 
 if TYPE_CHECKING:
     from .user import UserPublic
@@ -29,17 +30,32 @@ class SpotUpdate(BaseModel):
     description: Optional[str] = None
     location: Optional[dict] = None
 
+# Existing spot that a new one probably duplicates
+class DuplicateCandidate(BaseModel):
+    id: UUID
+    short_id: str
+    name: str
+    distance_m: float
+    name_similarity: float
+
+# 409 body when creating a spot that probably already exists
+class DuplicateSpots(BaseModel):
+    detail: str
+    candidates: List[DuplicateCandidate]
+
 # Schema for reading a spot from the database
 class Spot(SpotBase):
     id: UUID
     short_id: str
     user: UserPublic
     location: dict # The location will always be a GeoJSON dict in the response
+    geohash: Optional[str] = None # Precision-9 cell of location; prefixes are coarser cells
     created_at: datetime
     updated_at: Optional[datetime] = None
     comments: List[Comment] = []
     score: int = 0
     my_vote: int | None = None
+    photos: List[Photo] = []
 
     @field_validator("location", mode="before")
     def validate_location(cls, v: Any) -> Any:
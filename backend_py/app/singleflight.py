@@ -0,0 +1,47 @@
+"""In-process request coalescing ("single flight").
+
+When several coroutines ask for the same key at once, only the first one runs
+the loader; the others await its result.  Nothing is cached: once the flight
+lands the key is forgotten and the next call runs the loader again.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+        """Run ``loader`` for ``key`` unless an identical call is already in flight.
+
+        The leader awaits its own task directly, so if the leader's request is
+        cancelled the loader (which uses the leader's DB session) is cancelled
+        with it. Followers then retry, and one of them becomes the new leader.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            metrics.record_cache(self.name, hit=False)
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            try:
+                return await task
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+        metrics.record_cache(self.name, hit=True)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if task.cancelled() and current is not None and not current.cancelling():
+                return await self.do(key, loader)
+            raise
@@ -0,0 +1,167 @@
+"""Object storage for photos: R2/S3 in production, a local directory in dev and tests.
+
+The interface is synchronous (boto3 is); call it through ``asyncio.to_thread``
+from async code. Missing objects raise ``FileNotFoundError`` on every backend.
+Local storage stands in for presigned uploads with an API route that checks
+the hash the way R2 does (``PUT /api/spots/local-uploads/<sha256>``).
+"""
+from __future__ import annotations
+
+import base64
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .config import R2_BUCKET, R2_ENDPOINT, get_r2_client
+
+# "s3" or "local"; defaults to s3 when R2 is configured.
+STORAGE_BACKEND = os.getenv("PHOTO_STORAGE", "s3" if R2_ENDPOINT else "local")
+LOCAL_DIR = os.getenv("PHOTO_LOCAL_DIR", "media")
+PUBLIC_BASE_URL = os.getenv("PHOTO_PUBLIC_BASE_URL", "")
+LOCAL_UPLOAD_URL = "/api/spots/local-uploads"
+
+
+class Storage:
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def presign_put(self, key: str, content_type: str, sha256: str, expires: int = 600) -> dict:
+        """URL and headers for a direct client upload that must hash to ``sha256``."""
+        raise NotImplementedError(f"{type(self).__name__} does not support direct uploads")
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str | Path, base_url: str = "/media", upload_url: str = LOCAL_UPLOAD_URL):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.upload_url = upload_url.rstrip("/")
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"invalid storage key {key!r}")
+        return path
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file.
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def presign_put(self, key: str, content_type: str, sha256: str, expires: int = 600) -> dict:
+        # Only originals are uploaded directly; the route derives the key from the hash.
+        return {"url": f"{self.upload_url}/{sha256}", "headers": {"Content-Type": content_type}}
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class S3Storage(Storage):
+    def __init__(self, client, bucket: str, base_url: str):
+        self.client = client
+        self.bucket = bucket
+        self.base_url = base_url.rstrip("/")
+
+    def get(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as exc:
+            if _is_missing(exc):
+                raise FileNotFoundError(key) from exc
+            raise
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            # Keys are content hashes, so an object never changes.
+            CacheControl="public, max-age=31536000, immutable",
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as exc:
+            if _is_missing(exc):
+                return False
+            raise
+        return True
+
+    def presign_put(self, key: str, content_type: str, sha256: str, expires: int = 600) -> dict:
+        # The checksum is a signed header: the store rejects bytes that do
+        # not hash to it, so a key can only ever hold its own content.
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            ClientMethod="put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ChecksumSHA256": checksum,
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+            ExpiresIn=expires,
+        )
+        return {
+            "url": url,
+            "headers": {
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+                "Cache-Control": "public, max-age=31536000, immutable",
+            },
+        }
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+def _is_missing(exc) -> bool:
+    return exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """The process-wide photo storage configured by PHOTO_STORAGE."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            base_url = PUBLIC_BASE_URL or f"https://{R2_BUCKET}.{(R2_ENDPOINT or '').replace('https://', '')}"
+            _storage = S3Storage(get_r2_client(), R2_BUCKET, base_url)
+        else:
+            _storage = LocalStorage(LOCAL_DIR, PUBLIC_BASE_URL or "/media")
+    return _storage
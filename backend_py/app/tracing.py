@@ -0,0 +1,430 @@
+"""Request tracing: OpenTelemetry-compatible spans without the SDK.
+
+A sampled request gets a root span covering the whole request. Its children
+come from several places:
+
+- every SQL statement, through engine events (:func:`instrument_engine`);
+- every S3/R2 API call, through botocore events
+  (:func:`instrument_boto_client`);
+- FastAPI's response-model validation and encoding, and JSON rendering;
+- explicit ``with tracing.span("name"):`` blocks around other interesting
+  work, such as the current-user lookup.
+
+Like app/metrics.py this avoids the OpenTelemetry SDK. An unsampled request
+costs one contextvar lookup per would-be span. Finished spans are exported
+in batches from a background thread, so exporting never blocks the event
+loop.
+
+Settings:
+
+- ``TRACING_EXPORTER``: ``otlp`` posts OTLP/HTTP JSON to
+  ``TRACING_OTLP_ENDPOINT`` (default ``http://localhost:4318/v1/traces``,
+  a local collector). ``file`` appends one JSON span per line to
+  ``TRACING_FILE``. Unset means tracing is off.
+- ``TRACING_SAMPLE_RATE``: the fraction of requests traced (default 0.01).
+  A request with a W3C ``traceparent`` header joins the caller's trace. An
+  unsampled caller is never traced. A sampled one is still subject to the
+  local rate, since any client can send the header.
+- ``TRACING_TRUST_TRACEPARENT=1``: follow a sampled ``traceparent`` without
+  the local rate. Use it only when every caller is trusted, e.g. when a
+  gateway strips the header from outside requests.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+EXPORTER = os.getenv("TRACING_EXPORTER", "")
+OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRUST_TRACEPARENT = os.getenv("TRACING_TRUST_TRACEPARENT", "0") == "1"
+SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "skatespot-api")
+
+# Span kinds as in OTLP.
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+MAX_STATEMENT_LENGTH = 2000
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = INTERNAL, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = attributes
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: int = INTERNAL, **attributes) -> "Span":
+        return Span(name, self.trace_id, self.span_id, kind, **attributes)
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        if _processor is not None:
+            _processor.on_end(self)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("tracing_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """A child of the current span; does nothing (yields None) outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+# -- export ----------------------------------------------------------------------
+
+
+class Exporter:
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+
+class FileExporter(Exporter):
+    """One JSON object per span per line; easy to load into pandas or jq."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as f:
+            for finished in spans:
+                f.write(json.dumps(finished.to_json(), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter(Exporter):
+    """OTLP/HTTP with the JSON encoding, which every collector accepts on :4318."""
+
+    def __init__(self, endpoint: str, service_name: str = SERVICE_NAME, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{
+                "scope": {"name": "skatespot"},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                        "name": s.name,
+                        "kind": s.kind,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                        "status": {"code": 2, "message": s.error} if s.error else {},
+                    }
+                    for s in spans
+                ],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self.payload(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class SyncProcessor:
+    """Exports each span as it ends; for tests."""
+
+    def __init__(self, exporter: Exporter):
+        self.exporter = exporter
+
+    def on_end(self, finished: Span) -> None:
+        self.exporter.export([finished])
+
+
+class BatchProcessor:
+    """Queues finished spans for a background thread that exports them in batches.
+
+    The thread starts on first use in each process (gunicorn workers fork
+    after import). When the queue is full, spans are dropped rather than
+    slowing requests down.
+    """
+
+    def __init__(self, exporter: Exporter, max_queue: int = 10_000, batch_size: int = 512, interval: float = 5.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(max_queue)
+        self._pid: Optional[int] = None
+        self.dropped = 0
+
+    def on_end(self, finished: Span) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="tracing-export", daemon=True).start()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.warning("could not export %d spans", len(batch), exc_info=True)
+
+
+_processor: Optional[Any] = None
+_sample_rate = SAMPLE_RATE
+_trust_traceparent = TRUST_TRACEPARENT
+
+
+def configure(
+    exporter: Optional[Exporter],
+    sample_rate: float = SAMPLE_RATE,
+    synchronous: bool = False,
+    trust_traceparent: bool = TRUST_TRACEPARENT,
+) -> None:
+    """Install ``exporter`` (None turns tracing off)."""
+    global _processor, _sample_rate, _trust_traceparent
+    _sample_rate = sample_rate
+    _trust_traceparent = trust_traceparent
+    if exporter is None:
+        _processor = None
+    else:
+        _processor = SyncProcessor(exporter) if synchronous else BatchProcessor(exporter)
+
+
+def enabled() -> bool:
+    return _processor is not None
+
+
+if EXPORTER == "otlp":
+    configure(OtlpHttpExporter(OTLP_ENDPOINT))
+elif EXPORTER == "file":
+    configure(FileExporter(TRACE_FILE))
+
+
+# -- instrumentation ------------------------------------------------------------
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Optional[Span]:
+    """A root span for a new or incoming trace, or None if it is not sampled."""
+    if _processor is None:
+        return None
+    match = _TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return None
+        if not _trust_traceparent and random.random() >= _sample_rate:
+            return None
+        return Span(name, trace_id, parent_id, SERVER, **attributes)
+    if random.random() >= _sample_rate:
+        return None
+    return Span(name, f"{random.getrandbits(128):032x}", None, SERVER, **attributes)
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening the root span of sampled requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _processor is None:
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+        root = start_trace(
+            f"{scope['method']} {scope['path']}", traceparent,
+            **{"http.method": scope["method"], "url.path": scope["path"]},
+        )
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", root.trace_id.encode())]
+            await send(message)
+
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            root.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                # Name by template so traces group like the latency metrics.
+                root.name = f"{scope['method']} {route}"
+                root.attributes["http.route"] = route
+            root.end()
+
+
+def instrument_engine(engine, role: str = "primary") -> None:
+    """Add a client span per SQL statement on an async engine.
+
+    SQLAlchemy runs these hooks in a greenlet that shares the calling task's
+    context, so the span's parent is the span that awaited the query.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = _current.get()
+        if parent is not None:
+            conn.info.setdefault("_tracing_spans", []).append(parent.child(
+                "db.query", CLIENT,
+                **{"db.system": "postgresql", "db.role": role, "db.statement": statement[:MAX_STATEMENT_LENGTH]},
+            ))
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("_tracing_spans")
+        if spans:
+            finished = spans.pop()
+            rowcount = getattr(cursor, "rowcount", -1)
+            if rowcount is not None and rowcount >= 0:
+                finished.attributes["db.rows"] = rowcount
+            finished.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("_tracing_spans") if conn is not None else None
+        if spans:
+            failed = spans.pop()
+            failed.error = repr(exception_context.original_exception)
+            failed.end()
+
+
+def instrument_boto_client(client) -> None:
+    """Add a client span per API call made with a boto3 client.
+
+    Storage calls run in worker threads via ``asyncio.to_thread``, which
+    copies the caller's context, so spans nest under the request.
+    """
+    def before_call(model, context, **kwargs):
+        parent = _current.get()
+        if parent is not None:
+            context["_tracing_span"] = parent.child(
+                f"s3.{model.name}", CLIENT, **{"rpc.system": "aws-api", "rpc.method": model.name}
+            )
+
+    def after_call(context, http_response=None, **kwargs):
+        finished = context.pop("_tracing_span", None)
+        if finished is not None:
+            if http_response is not None:
+                finished.attributes["http.status_code"] = http_response.status_code
+            finished.end()
+
+    def after_call_error(context, exception=None, **kwargs):
+        failed = context.pop("_tracing_span", None)
+        if failed is not None:
+            failed.error = repr(exception)
+            failed.end()
+
+    events = client.meta.events
+    events.register("before-call.*.*", before_call)
+    events.register("after-call.*.*", after_call)
+    events.register("after-call-error.*.*", after_call_error)
+
+
+def instrument_fastapi_serialization() -> None:
+    """Span FastAPI's response-model validation and encoding (``serialize_response``).
+
+    FastAPI looks the function up on its module at call time, so wrapping it
+    there covers every route.
+    """
+    from fastapi import routing
+
+    original = routing.serialize_response
+    if getattr(original, "_traced", False):
+        return
+
+    async def serialize_response(*args, **kwargs):
+        with span("fastapi.serialize_response"):
+            return await original(*args, **kwargs)
+
+    serialize_response._traced = True
+    routing.serialize_response = serialize_response
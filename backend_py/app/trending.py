@@ -0,0 +1,228 @@
+"""Time-decayed "trending" ranking for spots.
+
+A spot's trending value at time ``t`` is the sum of its events' weights, each
+decayed as ``exp(-λ (t - t_event))``. Storing that directly would mean
+rewriting every row as time passes, so instead we store
+
+    trending_score = Σ weight · exp(λ (t_event - epoch))
+
+which only changes when an event arrives (one ``UPDATE`` per vote/comment)
+and orders spots exactly like the decayed value, since every row shares the
+same ``exp(-λ (t - epoch))`` factor. That lets ``ORDER BY trending_score
+DESC`` walk the ``ix_spots_trending_score`` index.
+
+The stored numbers grow as ``t - epoch`` grows, so the ``trending.rescale``
+job periodically multiplies all scores down and moves the epoch forward, and
+``trending.reconcile`` recomputes them from the votes and comments tables to
+undo drift (e.g. votes removed by cascading deletes).
+
+Rescaling works through the table in id-range batches, each committed on its
+own, so it never holds more than one batch of row locks. While it runs,
+``trending_epoch.rescaled_below`` marks how far it got. Spots below that id
+are already relative to ``pending_epoch`` and the rest still to ``epoch``;
+bumps and reconciliation pick each row's epoch accordingly. An interrupted
+rescale resumes from there on its next run. Until it finishes, rows on the
+two epochs differ by the rescale factor (a few percent at the default
+interval), so the ranking can be slightly off for that long.
+
+Every writer takes the ``trending_epoch`` row lock before any ``spots`` row
+lock: FOR SHARE for bumps and reconciliation, FOR UPDATE for a rescale batch.
+A single lock order is what keeps them from deadlocking.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import jobs
+
+logger = logging.getLogger("skatespot.trending")
+
+HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "72"))
+DECAY_PER_SECOND = math.log(2) / (HALF_LIFE_HOURS * 3600)
+RESCALE_INTERVAL_SECONDS = float(os.getenv("TRENDING_RESCALE_INTERVAL_SECONDS", str(6 * 3600)))
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("TRENDING_RECONCILE_INTERVAL_SECONDS", str(24 * 3600)))
+
+VOTE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+NEW_SPOT_WEIGHT = 1.0
+
+# The epoch row, locked as the first step of every writer (see above).
+_EPOCH_ROW = "(SELECT epoch, pending_epoch, rescaled_below FROM trending_epoch WHERE id = 1 FOR SHARE) AS e"
+
+
+def _row_epoch(alias: str) -> str:
+    """SQL for the epoch the score of spot ``alias`` is currently relative to."""
+    return (
+        f"CASE WHEN e.pending_epoch IS NOT NULL AND {alias}.id < e.rescaled_below "
+        "THEN e.pending_epoch ELSE e.epoch END"
+    )
+
+
+# FOR SHARE on the epoch row makes a bump wait for an in-progress rescale
+# batch (which holds FOR UPDATE) and then see where it got to.
+_BUMP = text(f"""
+UPDATE spots
+SET trending_score = trending_score
+    + CAST(:weight AS double precision)
+      * exp(CAST(:decay AS double precision)
+            * extract(epoch FROM COALESCE(CAST(:at AS timestamp), timezone('utc', now()))
+                                 - {_row_epoch("spots")}))
+FROM {_EPOCH_ROW}
+WHERE spots.id = :spot_id
+""")
+
+
+async def bump(db: AsyncSession, spot_id: UUID, weight: float, at: Optional[datetime] = None) -> None:
+    """Add an event of ``weight`` at ``at`` (UTC, default now) to the spot's trending score.
+
+    Undoing or changing an earlier event must pass that event's time, so the
+    score moves by exactly what the event contributed.
+    """
+    if weight:
+        await db.execute(_BUMP, {"spot_id": spot_id, "weight": weight, "at": at, "decay": DECAY_PER_SECOND})
+
+
+# Rescale and reconciliation both split the table by the first byte of the
+# spot id, into chunks small enough that holding their row locks briefly
+# delays only a few bumps.
+_CHUNKS = 256
+
+
+def chunk_prefixes() -> List[str]:
+    """The ``trending.reconcile_chunk`` prefixes (first id byte, in hex) covering every spot."""
+    return [f"{chunk:02x}" for chunk in range(_CHUNKS)]
+
+
+def _chunk_bounds(chunk: int) -> Dict[str, Optional[str]]:
+    return {
+        "lo": str(UUID(int=chunk << 120)),
+        "hi": str(UUID(int=(chunk + 1) << 120)) if chunk + 1 < _CHUNKS else None,
+    }
+
+
+_RESCALE_START = text("""
+UPDATE trending_epoch
+SET pending_epoch = timezone('utc', now()), rescaled_below = CAST(:lo AS uuid)
+WHERE id = 1 AND pending_epoch IS NULL
+""")
+
+_RESCALE_STATE = text("""
+SELECT extract(epoch FROM pending_epoch - epoch) AS elapsed, rescaled_below
+FROM trending_epoch WHERE id = 1 AND pending_epoch IS NOT NULL
+FOR UPDATE
+""")
+
+_RESCALE_CHUNK = text("""
+UPDATE spots SET trending_score = trending_score * :factor
+WHERE id >= CAST(:lo AS uuid) AND (CAST(:hi AS uuid) IS NULL OR id < CAST(:hi AS uuid))
+  AND trending_score <> 0
+""")
+
+_RESCALE_ADVANCE = text("UPDATE trending_epoch SET rescaled_below = CAST(:hi AS uuid) WHERE id = 1")
+
+_RESCALE_FINISH = text("""
+UPDATE trending_epoch SET epoch = pending_epoch, pending_epoch = NULL, rescaled_below = NULL WHERE id = 1
+""")
+
+
+@jobs.handler("trending.rescale", every=RESCALE_INTERVAL_SECONDS)
+async def rescale(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Rebase all scores onto ``now`` as the new epoch, one committed chunk at a time.
+
+    Resumes an unfinished rescale instead of starting a new one. Concurrent
+    runs take turns on the epoch row and never rescale a chunk twice.
+    """
+    await db.execute(_RESCALE_START, {"lo": str(UUID(int=0))})
+    await db.commit()
+    factor = 1.0
+    while True:
+        state = (await db.execute(_RESCALE_STATE)).first()
+        if state is None:
+            await db.rollback()  # finished, here or by another worker
+            break
+        factor = math.exp(-DECAY_PER_SECOND * float(state.elapsed))
+        bounds = _chunk_bounds(UUID(str(state.rescaled_below)).int >> 120)
+        await db.execute(_RESCALE_CHUNK, {**bounds, "factor": factor})
+        if bounds["hi"] is None:
+            await db.execute(_RESCALE_FINISH)
+        else:
+            await db.execute(_RESCALE_ADVANCE, bounds)
+        await db.commit()
+    logger.info("rescaled trending scores by %.6f", factor)
+
+
+_LOCK_EPOCH = text("SELECT epoch FROM trending_epoch WHERE id = 1 FOR SHARE")
+
+_LOCK_CHUNK = text("""
+SELECT id FROM spots
+WHERE id >= CAST(:lo AS uuid) AND (CAST(:hi AS uuid) IS NULL OR id < CAST(:hi AS uuid))
+FOR UPDATE
+""")
+
+# Canonical score: the spot's creation plus every current vote (at its
+# current value) and comment, each at its created_at. Rows within rounding
+# of the canonical value are left alone.
+_RECONCILE_CHUNK = text(f"""
+UPDATE spots s
+SET trending_score = t.score
+FROM (
+    SELECT s2.id,
+        CAST(:new_spot_weight AS double precision)
+            * exp(CAST(:decay AS double precision) * extract(epoch FROM s2.created_at - {_row_epoch("s2")}))
+        + CAST(:vote_weight AS double precision) * COALESCE((
+            SELECT sum(v.value * exp(CAST(:decay AS double precision)
+                                     * extract(epoch FROM v.created_at - {_row_epoch("s2")})))
+            FROM votes v WHERE v.spot_id = s2.id), 0)
+        + CAST(:comment_weight AS double precision) * COALESCE((
+            SELECT sum(exp(CAST(:decay AS double precision)
+                           * extract(epoch FROM c.created_at - {_row_epoch("s2")})))
+            FROM comments c WHERE c.spot_id = s2.id), 0) AS score
+    FROM spots s2, {_EPOCH_ROW}
+    WHERE s2.id >= CAST(:lo AS uuid) AND (CAST(:hi AS uuid) IS NULL OR s2.id < CAST(:hi AS uuid))
+) AS t
+WHERE s.id = t.id
+  AND abs(s.trending_score - t.score) > 1e-6 * greatest(abs(t.score), 1e-3)
+""")
+
+
+@jobs.handler("trending.reconcile", every=RECONCILE_INTERVAL_SECONDS)
+async def reconcile(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Fan out one ``trending.reconcile_chunk`` job per id range so workers share the table scan."""
+    for prefix in chunk_prefixes():
+        await jobs.enqueue(
+            db,
+            "trending.reconcile_chunk",
+            {"prefix": prefix},
+            dedupe_key=f"trending.reconcile_chunk:{prefix}",
+        )
+
+
+@jobs.handler("trending.reconcile_chunk")
+async def reconcile_chunk(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    """Recompute trending scores for spots whose id starts with ``payload["prefix"]``."""
+    bounds = _chunk_bounds(int(payload["prefix"], 16))
+    # Epoch row first, like every other writer. Then the chunk's rows: a
+    # concurrent vote either bumped (and committed) before we read the votes
+    # table, or bumps after we are done.
+    await db.execute(_LOCK_EPOCH)
+    await db.execute(_LOCK_CHUNK, bounds)
+    result = await db.execute(
+        _RECONCILE_CHUNK,
+        {
+            **bounds,
+            "decay": DECAY_PER_SECOND,
+            "new_spot_weight": NEW_SPOT_WEIGHT,
+            "vote_weight": VOTE_WEIGHT,
+            "comment_weight": COMMENT_WEIGHT,
+        },
+    )
+    if result.rowcount:
+        logger.info("reconciled %d trending scores in chunk %s", result.rowcount, payload["prefix"])
@@ -0,0 +1,90 @@
+"""Viewport diffing: which part of a map view the client does not have yet.
+
+When the map pans, most of the new viewport overlaps the old one. The spot
+listing accepts one of two descriptions of what the client already holds,
+and loads only the rest:
+
+- the previous viewport (``prev_north`` … ``prev_west``). The new box minus
+  the old one is at most four rectangles (:func:`difference`). Each is a
+  small bbox scan, or a small read-model lookup.
+- a tile precision plus the geohash tiles already loaded (``tile_precision``,
+  ``have_tiles``). The listing returns every spot in each tile that overlaps
+  the viewport and is not held, including the parts of those tiles outside
+  the viewport, so the client can cache spots by tile (``spot.geohash[:p]``).
+  Each tile is a range scan on ``ix_spots_geohash``.
+
+Either way the result is an :class:`Area`, turned into a WHERE clause by
+:func:`clause`.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, NamedTuple, Tuple
+
+from geoalchemy2.functions import ST_Intersects, ST_MakeEnvelope
+from sqlalchemy import and_, or_
+
+from . import geohash
+from .models import Spot
+
+BBox = Tuple[float, float, float, float]  # west, south, east, north
+
+# Most tiles one viewport may span in tile mode; more means the client
+# picked too fine a precision for its zoom.
+MAX_TILES = 64
+
+
+class Area(NamedTuple):
+    """Closed rectangles and geohash tiles; a spot in any of them is in the area."""
+
+    boxes: Tuple[BBox, ...] = ()
+    tiles: Tuple[str, ...] = ()
+
+    def is_empty(self) -> bool:
+        return not self.boxes and not self.tiles
+
+
+def difference(box: BBox, prev: BBox) -> List[BBox]:
+    """``box`` minus ``prev``, as up to four rectangles.
+
+    The pieces are a full-width strip below and above ``prev`` plus the
+    parts left and right of it in between. They overlap ``prev`` and each
+    other only along their edges.
+    """
+    west, south, east, north = box
+    p_west, p_south, p_east, p_north = prev
+    if p_west >= east or p_east <= west or p_south >= north or p_north <= south:
+        return [box]
+    pieces = []
+    if p_south > south:
+        pieces.append((west, south, east, p_south))
+    if p_north < north:
+        pieces.append((west, p_north, east, north))
+    middle_south, middle_north = max(south, p_south), min(north, p_north)
+    if p_west > west:
+        pieces.append((west, middle_south, p_west, middle_north))
+    if p_east < east:
+        pieces.append((p_east, middle_south, east, middle_north))
+    return pieces
+
+
+def missing_tiles(box: BBox, precision: int, have: Iterable[str]) -> List[str]:
+    """The tiles of ``precision`` overlapping ``box`` that are not in ``have``.
+
+    Raises ValueError if the box spans more than MAX_TILES of them.
+    """
+    tiles = geohash.cover(*box, precision)
+    if len(tiles) > MAX_TILES:
+        raise ValueError(f"viewport spans {len(tiles)} tiles of precision {precision}; at most {MAX_TILES}")
+    held = set(have)
+    return [tile for tile in tiles if tile not in held]
+
+
+def clause(area: Area):
+    """SQL condition for spots in ``area``."""
+    conditions = [
+        ST_Intersects(ST_MakeEnvelope(*box, 4326), Spot.location) for box in area.boxes
+    ]
+    for tile in area.tiles:
+        lo, hi = geohash.prefix_range(tile)
+        conditions.append(and_(Spot.geohash >= lo, Spot.geohash < hi))
+    return or_(*conditions)
@@ -0,0 +1,207 @@
+"""Background job worker: ``python -m app.worker [run|stats|enqueue]``.
+
+``run`` (the default) starts a supervisor that keeps ``--processes`` worker
+processes alive (one per core by default), so CPU-heavy jobs spread across
+cores and never share an event loop with API requests. Each process runs
+``--concurrency`` job slots claiming from the ``jobs`` table (app/jobs.py);
+idle slots are woken by ``NOTIFY`` when work is enqueued and otherwise poll
+every JOB_POLL_SECONDS. Process 0 also enqueues the periodic job kinds.
+
+On SIGTERM/SIGINT workers stop claiming and finish the jobs they hold.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import List, Optional, Sequence
+
+from . import exports, heatmap, jobs, partitions, photos, trending  # noqa: F401  (registers job handlers)
+from .database import AsyncSessionLocal, DATABASE_LISTEN_URL, engine
+
+logger = logging.getLogger("skatespot.worker")
+
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+SCHEDULE_SECONDS = 30
+GRACEFUL_TIMEOUT = float(os.getenv("JOB_GRACEFUL_TIMEOUT", "60"))
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class Worker:
+    """One worker process: ``concurrency`` job slots on a single event loop."""
+
+    def __init__(self, kinds: Sequence[str], concurrency: int, scheduler: bool):
+        self.kinds = list(kinds)
+        self.concurrency = concurrency
+        self.scheduler = scheduler
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        if payload in self.kinds:
+            self._wakeup.set()
+
+    async def _idle(self) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _slot(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = await jobs.run_one(AsyncSessionLocal, self.kinds)
+            except Exception:
+                # Database unavailable or similar; the job (if any) is retried.
+                logger.exception("job slot error")
+                ran = False
+            if not ran:
+                await self._idle()
+
+    async def _schedule(self) -> None:
+        while not self._stop.is_set():
+            try:
+                async with AsyncSessionLocal() as db:
+                    await jobs.schedule_periodic(db)
+            except Exception:
+                logger.exception("scheduling periodic jobs failed")
+            try:
+                await asyncio.wait_for(self._stop.wait(), SCHEDULE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _request_stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        import asyncpg
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._request_stop)
+
+        listener = None
+        try:
+            listener = await asyncpg.connect(DATABASE_LISTEN_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+            await listener.add_listener(jobs.NOTIFY_CHANNEL, self._on_notify)
+        except Exception:
+            logger.warning("job wakeups unavailable, polling every %.1fs", POLL_SECONDS, exc_info=True)
+
+        tasks = [asyncio.create_task(self._slot()) for _ in range(self.concurrency)]
+        if self.scheduler:
+            tasks.append(asyncio.create_task(self._schedule()))
+        logger.info("worker %s running %d slots for %s", os.getpid(), self.concurrency, ", ".join(self.kinds))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if listener is not None:
+                await listener.close()
+            await engine.dispose()
+
+
+def _worker_main(index: int, kinds: List[str], concurrency: int) -> None:
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "info").upper())
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
+    asyncio.run(Worker(kinds, concurrency, scheduler=index == 0).run())
+
+
+def supervise(processes: int, kinds: List[str], concurrency: int) -> None:
+    """Keep ``processes`` workers running until SIGTERM/SIGINT, then stop them gracefully."""
+    # spawn, not fork: each worker builds its own engine and event loop.
+    ctx = multiprocessing.get_context("spawn")
+    workers: List[Optional[multiprocessing.process.BaseProcess]] = [None] * processes
+    stopping = False
+
+    def _stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while not stopping:
+        for index, proc in enumerate(workers):
+            if proc is None or not proc.is_alive():
+                if proc is not None:
+                    logger.warning("worker %d exited with %s, restarting", index, proc.exitcode)
+                proc = ctx.Process(target=_worker_main, args=(index, kinds, concurrency), daemon=False)
+                proc.start()
+                workers[index] = proc
+        time.sleep(1)
+
+    for proc in workers:
+        if proc is not None and proc.is_alive():
+            proc.terminate()
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT
+    for proc in workers:
+        if proc is not None:
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.kill()
+
+
+async def _stats() -> None:
+    async with AsyncSessionLocal() as db:
+        print(json.dumps(await jobs.stats(db), indent=2))
+    await engine.dispose()
+
+
+async def _enqueue(kind: str, payload: dict) -> None:
+    async with AsyncSessionLocal() as db:
+        await jobs.enqueue(db, kind, payload)
+        await db.commit()
+    await engine.dispose()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run SkateSpot background jobs.")
+    sub = parser.add_subparsers(dest="command")
+    defaults = {
+        "processes": int(os.getenv("JOB_WORKER_PROCESSES", "0")),
+        "concurrency": int(os.getenv("JOB_WORKER_CONCURRENCY", "4")),
+        "kinds": "",
+    }
+    parser.set_defaults(**defaults)
+
+    run = sub.add_parser("run", help="Run worker processes (default)")
+    run.add_argument("--processes", type=int, help="Worker processes (default: CPU count)")
+    run.add_argument("--concurrency", type=int, help="Concurrent jobs per process")
+    run.add_argument("--kinds", help="Comma-separated job kinds to run (default: all)")
+    run.set_defaults(**defaults)
+
+    sub.add_parser("stats", help="Print queue depth and recent latency as JSON")
+
+    enqueue = sub.add_parser("enqueue", help="Enqueue a job by hand, e.g. heatmap.rebuild")
+    enqueue.add_argument("kind", choices=sorted(jobs.HANDLERS))
+    enqueue.add_argument("--payload", type=json.loads, default={}, help="JSON object")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "info").upper())
+    if args.command == "stats":
+        asyncio.run(_stats())
+    elif args.command == "enqueue":
+        asyncio.run(_enqueue(args.kind, args.payload))
+    else:
+        kinds = [k for k in args.kinds.split(",") if k] or sorted(jobs.HANDLERS)
+        supervise(args.processes or _cpu_count(), kinds, args.concurrency)
@@ -0,0 +1,17 @@
+from uvicorn.workers import UvicornWorker as _UvicornWorker
+
+
+class UvicornWorker(_UvicornWorker):
+    """Gunicorn worker running uvicorn with uvloop and httptools pinned.
+
+    Keep-alive and graceful-shutdown timeouts are taken from the gunicorn
+    config (``keepalive`` / ``graceful_timeout``) by the base class.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "proxy_headers": True,
+        "server_header": False,
+    }
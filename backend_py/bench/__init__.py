@@ -0,0 +1 @@
+# This file makes the `bench` directory a Python package.
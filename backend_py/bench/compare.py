@@ -0,0 +1,37 @@
+"""Diff two benchmark result files produced by ``bench.run``.
+
+Usage::
+
+    python -m bench.compare bench/results/old.json bench/results/new.json
+"""
+from __future__ import annotations
+
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+
+def main(old_path: str, new_path: str) -> None:
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+
+    print(f"{old['git_revision']} -> {new['git_revision']}")
+    for name in sorted(set(old["scenarios"]) | set(new["scenarios"])):
+        before, after = old["scenarios"].get(name), new["scenarios"].get(name)
+        if before is None or after is None:
+            print(f"{name}: only in {'new' if before is None else 'old'} run")
+            continue
+        print(name)
+        for metric in METRICS:
+            a, b = before[metric], after[metric]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"  {metric:>15}: {a:>10} -> {b:>10} ({change})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2])
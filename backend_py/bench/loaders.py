@@ -0,0 +1,105 @@
+"""Compare joined and select-in eager loading for full spot responses.
+
+Usage (from ``backend_py/``, against a seeded database)::
+
+    python seed.py synthetic --spots 10000 --comments-per-spot 20
+    python -m bench.loaders --spots 100 --repeat 10
+
+Loads the ``--spots`` most-commented spots the way ``_load_spots_by_ids``
+does. ``joined`` is the old strategy: comments and their authors joined
+onto the spot query and de-duplicated with ``.unique()``. ``loaders`` is
+``app.loaders.SPOT``. For each strategy it reports statements issued, rows
+the driver returned and wall time (best of ``--repeat``), including building
+``schemas.Spot``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import loaders, schemas
+from app.database import DATABASE_URL
+from app.models import Comment, Spot
+
+JOINED = (
+    joinedload(Spot.user),
+    joinedload(Spot.comments).joinedload(Comment.user),
+    selectinload(Spot.photos),
+)
+STRATEGIES = {"joined": JOINED, "loaders": loaders.SPOT}
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.statements = 0
+        self.rows = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements += 1
+        # The asyncpg adapter buffers the whole result before this hook runs.
+        self.rows += len(getattr(cursor, "_rows", ()) or ())
+
+
+async def load(sessionmaker, options, spot_ids: List[UUID]) -> int:
+    async with sessionmaker() as db:
+        result = await db.execute(select(Spot).options(*options).where(Spot.id.in_(spot_ids)))
+        spots = result.unique().scalars().all()
+        for spot in spots:
+            spot.score = 0
+            spot.my_vote = None
+        return len([schemas.Spot.model_validate(spot) for spot in spots])
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with sessionmaker() as db:
+        rows = await db.execute(
+            select(Comment.spot_id, func.count())
+            .group_by(Comment.spot_id)
+            .order_by(func.count().desc())
+            .limit(args.spots)
+        )
+        picked = rows.all()
+    spot_ids = [spot_id for spot_id, _ in picked]
+    report = {
+        "spots": len(spot_ids),
+        "comments": sum(count for _, count in picked),
+        "strategies": {},
+    }
+
+    for name, options in STRATEGIES.items():
+        counter = Counter()
+        await load(sessionmaker, options, spot_ids)  # warm up
+        event.listen(engine.sync_engine, "after_cursor_execute", counter)
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await load(sessionmaker, options, spot_ids)
+            best = min(best, time.perf_counter() - started)
+        event.remove(engine.sync_engine, "after_cursor_execute", counter)
+        report["strategies"][name] = {
+            "statements": counter.statements // args.repeat,
+            "rows": counter.rows // args.repeat,
+            "best_ms": round(best * 1000, 2),
+        }
+
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spots", type=int, default=100, help="How many of the most-commented spots to load")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,181 @@
+"""Insert throughput and index size of vote table layouts.
+
+Usage (from ``backend_py/``, against a scratch database)::
+
+    python -m bench.partitions --rows 50000000
+    python -m bench.partitions --rows 5000000 --layouts flat_v4,partitioned_v7
+
+Each layout is a copy of ``votes`` in the ``bench_partitions`` schema, which
+is dropped afterwards:
+
+- ``flat_v4``: the old table, with UUIDv4 ids, a primary key on ``id``, the
+  old ``ix_votes_id`` and ``uq_user_spot_vote``.
+- ``flat_v7``: the same table with UUIDv7 ids, to separate the effect of the
+  key from that of partitioning.
+- ``partitioned_v7``: the current layout. It is hash-partitioned by
+  ``spot_id`` into ``app.partitions.VOTE_PARTITIONS`` tables, with primary
+  key ``(id, spot_id)``, ``uq_user_spot_vote`` and ``ix_votes_spot_id``.
+
+Rows are COPYed in ``--batch`` sized batches into tables that already have
+their indexes, as the API would insert them. Votes are spread over
+``--spots`` spots and ``--users`` users. For each layout the report gives
+overall rows/s, rows/s over the last tenth (once the indexes no longer fit
+in cache), and the on-disk size of every index summed over partitions.
+50M rows takes a while and needs tens of GB of disk per layout.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import ids, partitions
+from app.database import DATABASE_URL
+
+SCHEMA = "bench_partitions"
+COLUMNS = ["id", "user_id", "spot_id", "value", "created_at"]
+
+_TABLE = """
+CREATE TABLE {schema}.{name} (
+    id uuid NOT NULL,
+    user_id uuid NOT NULL,
+    spot_id uuid NOT NULL,
+    value integer NOT NULL,
+    created_at timestamp without time zone NOT NULL
+) {partition_by}
+"""
+
+
+def _flat(name: str) -> List[str]:
+    return [
+        _TABLE.format(schema=SCHEMA, name=name, partition_by=""),
+        f"ALTER TABLE {SCHEMA}.{name} ADD PRIMARY KEY (id)",
+        f"CREATE INDEX ON {SCHEMA}.{name} (id)",
+        f"ALTER TABLE {SCHEMA}.{name} ADD UNIQUE (user_id, spot_id)",
+    ]
+
+
+def _partitioned(name: str) -> List[str]:
+    statements = [_TABLE.format(schema=SCHEMA, name=name, partition_by="PARTITION BY HASH (spot_id)")]
+    for remainder in range(partitions.VOTE_PARTITIONS):
+        statements.append(
+            f"CREATE TABLE {SCHEMA}.{name}_p{remainder:02d} PARTITION OF {SCHEMA}.{name} "
+            f"FOR VALUES WITH (MODULUS {partitions.VOTE_PARTITIONS}, REMAINDER {remainder})"
+        )
+    statements += [
+        f"ALTER TABLE {SCHEMA}.{name} ADD PRIMARY KEY (id, spot_id)",
+        f"ALTER TABLE {SCHEMA}.{name} ADD UNIQUE (user_id, spot_id)",
+        f"CREATE INDEX ON {SCHEMA}.{name} (spot_id)",
+    ]
+    return statements
+
+
+LAYOUTS: Dict[str, tuple] = {
+    "flat_v4": (_flat, uuid.uuid4),
+    "flat_v7": (_flat, ids.uuid7),
+    "partitioned_v7": (_partitioned, ids.uuid7),
+}
+
+_INDEX_SIZES = text("""
+SELECT i.indexrelid::regclass::text AS name,
+       COALESCE((SELECT sum(pg_relation_size(relid)) FROM pg_partition_tree(i.indexrelid)),
+                pg_relation_size(i.indexrelid)) AS bytes
+FROM pg_index i
+WHERE i.indrelid = CAST(:table AS regclass)
+ORDER BY 1
+""")
+
+
+def _batch(new_id: Callable[[], uuid.UUID], start: int, size: int, users: int, spots: int) -> List[tuple]:
+    now = datetime.utcnow()
+    rows = []
+    for n in range(start, start + size):
+        # Each (user, spot) pair appears once while rows <= users * spots.
+        rows.append((
+            new_id(),
+            uuid.UUID(int=n % users + 1),
+            uuid.UUID(int=(n // users) % spots + (1 << 64)),
+            1 if n % 7 else -1,
+            now,
+        ))
+    return rows
+
+
+async def run_layout(engine, name: str, args: argparse.Namespace) -> Dict:
+    create, new_id = LAYOUTS[name]
+    async with engine.begin() as conn:
+        for statement in create(name):
+            await conn.execute(text(statement))
+
+    timings = []
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+        for start in range(0, args.rows, args.batch):
+            records = _batch(new_id, start, min(args.batch, args.rows - start), args.users, args.spots)
+            started = time.perf_counter()
+            await raw.copy_records_to_table(name, records=records, columns=COLUMNS, schema_name=SCHEMA)
+            timings.append((len(records), time.perf_counter() - started))
+
+    async with engine.connect() as conn:
+        sizes = (await conn.execute(_INDEX_SIZES, {"table": f"{SCHEMA}.{name}"})).all()
+        table_bytes = (await conn.execute(
+            text(
+                "SELECT COALESCE((SELECT sum(pg_table_size(relid)) FROM pg_partition_tree(CAST(:table AS regclass))),"
+                " pg_table_size(CAST(:table AS regclass)))"
+            ),
+            {"table": f"{SCHEMA}.{name}"},
+        )).scalar()
+
+    tail = timings[-max(1, len(timings) // 10):]
+    total_rows = sum(rows for rows, _ in timings)
+    total_seconds = sum(seconds for _, seconds in timings)
+    return {
+        "rows": total_rows,
+        "rows_per_s": round(total_rows / total_seconds),
+        "last_tenth_rows_per_s": round(sum(r for r, _ in tail) / sum(s for _, s in tail)),
+        "table_mb": round((table_bytes or 0) / 2**20, 1),
+        "index_mb": {index.split(".")[-1]: round(size / 2**20, 1) for index, size in sizes},
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    report = {
+        "rows": args.rows,
+        "users": args.users,
+        "spots": args.spots,
+        "partitions": partitions.VOTE_PARTITIONS,
+        "layouts": {},
+    }
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        for name in args.layouts.split(","):
+            report["layouts"][name] = await run_layout(engine, name, args)
+            print(f"{name}: {report['layouts'][name]['rows_per_s']:,} rows/s", flush=True)
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--batch", type=int, default=50_000, help="Rows per COPY")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--spots", type=int, default=1_000_000)
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    parser.add_argument("--keep", action="store_true", help="Leave the bench_partitions schema in place")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,155 @@
+"""Benchmark the columnar/MessagePack pin formats against the full spot listing.
+
+Usage (from ``backend_py/``)::
+
+    python -m bench.pins
+    python -m bench.pins --sizes 100,1000,10000 --repeat 20 --comments 2
+
+No database is needed: spots come from the same clustered distribution as
+``seed.py synthetic``. The ``json`` path mirrors ``get_spots``. It builds
+``schemas.Spot`` from ORM-shaped rows (WKB locations, nested user, comments,
+no photos) and renders the list with FastAPI's ``JSONResponse``. The pin
+paths start from the tuples ``app.pins`` reads from SQL. Encode time is the
+best of ``--repeat`` runs. Sizes are reported raw and gzipped.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from geoalchemy2.elements import WKBElement
+from pydantic import TypeAdapter
+from shapely.geometry import Point
+from shapely.wkb import loads as wkb_loads
+
+from app import pins, schemas
+from bench.read_model import synthetic_points
+
+SpotList = TypeAdapter(List[schemas.Spot])
+
+
+def orm_rows(n: int, comments: int, seed: int) -> List[SimpleNamespace]:
+    rng = random.Random(seed)
+    now = datetime(2024, 6, 1)
+    users = [
+        SimpleNamespace(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            email=f"user{i}@example.com",
+            name=f"Skater {i}",
+            avatar_url=None,
+            created_at=now,
+            last_login=now,
+        )
+        for i in range(max(1, n // 20))
+    ]
+    spots = []
+    for i, (lon, lat) in enumerate(synthetic_points(n, seed)):
+        spot_id = uuid.UUID(int=rng.getrandbits(128))
+        created = now - timedelta(minutes=rng.randrange(500_000))
+        spots.append(
+            SimpleNamespace(
+                id=spot_id,
+                short_id=f"{i:04x}"[-6:],
+                name=f"Spot {i}",
+                description="Ledges and a rail by the fountain.",
+                location=WKBElement(Point(lon, lat).wkb, srid=4326),
+                user=rng.choice(users),
+                created_at=created,
+                updated_at=created,
+                comments=[
+                    SimpleNamespace(
+                        id=uuid.UUID(int=rng.getrandbits(128)),
+                        content="Security kicks you out after 6pm.",
+                        spot_id=spot_id,
+                        user_id=(user := rng.choice(users)).id,
+                        user=user,
+                        created_at=created,
+                    )
+                    for _ in range(comments)
+                ],
+                photos=[],
+                score=rng.randrange(-3, 50),
+                my_vote=None,
+            )
+        )
+    return spots
+
+
+def pin_rows(spots: List[SimpleNamespace]) -> List[pins.PinRow]:
+    rows = []
+    for spot in spots:
+        point = wkb_loads(bytes(spot.location.data))
+        rows.append(
+            (spot.id, spot.short_id, round(point.x * pins.SCALE), round(point.y * pins.SCALE), spot.score)
+        )
+    return rows
+
+
+def encode_full(spots: List[SimpleNamespace]) -> bytes:
+    models = [schemas.Spot.model_validate(spot) for spot in spots]
+    # What FastAPI does with response_model=List[schemas.Spot].
+    content = jsonable_encoder(SpotList.dump_python(SpotList.validate_python(models), mode="json"))
+    return JSONResponse(content).body
+
+
+def encode_columnar(rows: List[pins.PinRow]) -> bytes:
+    return JSONResponse(pins.columnar(rows)).body
+
+
+def best_of(repeat: int, fn: Callable[[], bytes]) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def measure(n: int, args: argparse.Namespace) -> dict:
+    spots = orm_rows(n, args.comments, args.seed)
+    rows = pin_rows(spots)
+    encoders = {
+        "json": lambda: encode_full(spots),
+        "columnar": lambda: encode_columnar(rows),
+    }
+    try:
+        import msgpack  # noqa: F401
+
+        encoders["msgpack"] = lambda: pins.pack(rows)
+    except ImportError:
+        pass
+
+    report = {}
+    for name, fn in encoders.items():
+        seconds, body = best_of(args.repeat, fn)
+        report[name] = {
+            "encode_ms": round(seconds * 1000, 3),
+            "bytes": len(body),
+            "gzip_bytes": len(gzip.compress(body, 6)),
+        }
+    return report
+
+
+def main(args: argparse.Namespace) -> None:
+    results = {}
+    for n in (int(size) for size in args.sizes.split(",")):
+        results[n] = measure(n, args)
+    print(json.dumps({"comments_per_spot": args.comments, "pins": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated pin counts")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--comments", type=int, default=0, help="Comments per spot in the full response")
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+"""Benchmark the in-memory spot read model against the PostGIS bbox query.
+
+Usage (from ``backend_py/``)::
+
+    python -m bench.read_model --spots 1000000
+    python -m bench.read_model --spots 1000000 --database-url $DATABASE_URL
+
+Without ``--database-url`` only the in-memory side runs, on points drawn from
+the same clustered distribution as ``seed.py synthetic``. With it, the index
+is bootstrapped from the database (seed it first) and identical viewports are
+timed against ``ST_Contains(ST_MakeEnvelope(...), location)``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from typing import List, Tuple
+
+from app.read_model import SpotIndex, bootstrap
+from seed import CITIES, SyntheticConfig, _cluster_centres, _km_to_deg
+
+Viewport = Tuple[float, float, float, float]
+
+
+def synthetic_points(n: int, seed: int) -> List[Tuple[float, float]]:
+    cfg = SyntheticConfig(users=1, spots=n, cities=tuple(CITIES.values()), seed=seed)
+    centres = _cluster_centres(cfg)
+    rng = random.Random(seed)
+    points = []
+    for _ in range(n):
+        lon, lat = rng.choice(centres)
+        dlon, dlat = _km_to_deg(cfg.cluster_sigma_km, lat)
+        points.append((lon + rng.gauss(0, dlon), lat + rng.gauss(0, dlat)))
+    return points
+
+
+def viewports(n: int, seed: int) -> List[Viewport]:
+    rng = random.Random(seed + 1)
+    boxes = []
+    for _ in range(n):
+        lon, lat = rng.choice(list(CITIES.values()))
+        half = rng.choice((0.005, 0.02, 0.05, 0.1))
+        lon += rng.gauss(0, 0.03)
+        lat += rng.gauss(0, 0.03)
+        boxes.append((lon - half, lat - half, lon + half, lat + half))
+    return boxes
+
+
+def time_index(index: SpotIndex, boxes: List[Viewport], limit: int) -> dict:
+    started = time.perf_counter()
+    returned = 0
+    for box in boxes:
+        returned += len(index.bbox(*box, limit=limit))
+    elapsed = time.perf_counter() - started
+    return {"queries": len(boxes), "mean_ms": round(elapsed / len(boxes) * 1000, 4), "rows": returned}
+
+
+async def time_postgis(database_url: str, boxes: List[Viewport], limit: int) -> dict:
+    import asyncpg
+
+    conn = await asyncpg.connect(database_url.replace("postgresql+asyncpg://", "postgresql://", 1))
+    sql = (
+        "SELECT id FROM spots WHERE ST_Contains(ST_MakeEnvelope($1, $2, $3, $4, 4326), location) "
+        "LIMIT $5"
+    )
+    try:
+        stmt = await conn.prepare(sql)
+        started = time.perf_counter()
+        returned = 0
+        for box in boxes:
+            returned += len(await stmt.fetch(*box, limit))
+        elapsed = time.perf_counter() - started
+    finally:
+        await conn.close()
+    return {"queries": len(boxes), "mean_ms": round(elapsed / len(boxes) * 1000, 4), "rows": returned}
+
+
+async def main(args: argparse.Namespace) -> None:
+    index = SpotIndex(max_bytes=2 ** 40)  # no budget for the benchmark
+    tracemalloc.start()
+    started = time.perf_counter()
+    if args.database_url:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        engine = create_async_engine(args.database_url)
+        await bootstrap(async_sessionmaker(engine), index)
+        await engine.dispose()
+    else:
+        rng = random.Random(args.seed)
+        for lon, lat in synthetic_points(args.spots, args.seed):
+            index.upsert(uuid.UUID(int=rng.getrandbits(128)), lon, lat, 0)
+    build_s = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    boxes = viewports(args.queries, args.seed)
+    report = {
+        "spots": len(index),
+        "build_s": round(build_s, 2),
+        "traced_peak_mb": round(peak / 2 ** 20, 1),
+        "estimated_mb": round(index.memory_bytes() / 2 ** 20, 1),
+        "limit": args.limit,
+        "read_model": time_index(index, boxes, args.limit),
+    }
+    if args.database_url:
+        report["postgis"] = await time_postgis(args.database_url, boxes, args.limit)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spots", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Bootstrap from and compare against this database")
+    asyncio.run(main(parser.parse_args()))
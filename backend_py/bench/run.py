@@ -0,0 +1,247 @@
+"""Load-test the API hot paths and record latency percentiles as JSON.
+
+Usage (from ``backend_py/``, with DATABASE_URL pointing at a local PostGIS)::
+
+    python -m bench.run --spots 100000 --concurrency 32 --duration 30
+    python -m bench.run --url http://localhost:3000 --scenarios bbox,vote
+
+Each scenario is driven by ``--concurrency`` workers for ``--duration``
+seconds.  Results are written to ``bench/results/<timestamp>-<git sha>.json``;
+use ``python -m bench.compare old.json new.json`` to diff two runs.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+from jose import jwt
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import DATABASE_URL
+from app.models import Spot, User
+from seed import CITIES, SYNTHETIC_EMAIL_DOMAIN, SyntheticConfig, count_spots, seed_synthetic
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return sorted_values[int(k)]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+
+class Workload:
+    """Request generators for each scenario, sharing ids sampled from the database."""
+
+    def __init__(self, spot_ids: List[str], tokens: List[str], zipf_s: float):
+        self.spot_ids = spot_ids
+        self.tokens = tokens
+        # Popularity is Zipf over a fixed ordering so hot spots stay hot.
+        weights = [1.0 / (rank ** zipf_s) for rank in range(1, len(spot_ids) + 1)]
+        self.cum_weights = []
+        total = 0.0
+        for w in weights:
+            total += w
+            self.cum_weights.append(total)
+
+    def pick_spot(self, rng: random.Random) -> str:
+        return rng.choices(self.spot_ids, cum_weights=self.cum_weights)[0]
+
+    def auth(self, rng: random.Random) -> dict:
+        return {"Authorization": f"Bearer {rng.choice(self.tokens)}"}
+
+    async def bbox(self, client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        lon, lat = rng.choice(list(CITIES.values()))
+        # Viewports from neighbourhood (~1km) to whole-city (~20km) zoom levels.
+        half = rng.choice((0.005, 0.02, 0.05, 0.1))
+        lat += rng.gauss(0, 0.03)
+        lon += rng.gauss(0, 0.03)
+        params = {"north": lat + half, "south": lat - half, "east": lon + half, "west": lon - half}
+        return await client.get("/api/spots/", params=params)
+
+    async def vote(self, client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        spot_id = self.pick_spot(rng)
+        value = 1 if rng.random() < 0.85 else -1
+        return await client.post(
+            f"/api/spots/{spot_id}/vote", json={"value": value}, headers=self.auth(rng)
+        )
+
+    async def comments_list(self, client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        return await client.get(f"/api/spots/{self.pick_spot(rng)}/comments")
+
+    async def comment_create(self, client: httpx.AsyncClient, rng: random.Random) -> httpx.Response:
+        return await client.post(
+            f"/api/spots/{self.pick_spot(rng)}/comments",
+            json={"content": "Benchmark comment"},
+            headers=self.auth(rng),
+        )
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, rng)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(args: argparse.Namespace) -> None:
+    dataset = {"spots": args.spots, "users": args.users, "seed": args.seed, "seeded": False}
+    if await count_spots(args.database_url) < args.spots:
+        cfg = SyntheticConfig(
+            users=args.users,
+            spots=args.spots,
+            cities=tuple(CITIES.values()),
+            seed=args.seed,
+        )
+        # seed_synthetic runs its own process pool and event loops.
+        dataset.update(await asyncio.to_thread(seed_synthetic, cfg, args.database_url))
+        dataset["seeded"] = True
+
+    engine = create_async_engine(args.database_url)
+
+    async with engine.connect() as conn:
+        spot_ids = [str(row) for row in (await conn.execute(select(Spot.id).order_by(Spot.id))).scalars()]
+        user_ids = [
+            str(row)
+            for row in (
+                await conn.execute(
+                    select(User.id).where(User.email.like(f"%@{SYNTHETIC_EMAIL_DOMAIN}")).limit(1000)
+                )
+            ).scalars()
+        ]
+        dataset["spots_in_db"] = (await conn.execute(select(func.count()).select_from(Spot))).scalar_one()
+    await engine.dispose()
+
+    secret = os.environ["JWT_SECRET"]
+    expires = datetime.utcnow() + timedelta(hours=1)
+    tokens = [jwt.encode({"sub": uid, "exp": expires}, secret, algorithm="HS256") for uid in user_ids]
+    workload = Workload(spot_ids, tokens, args.zipf_s)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30
+        )
+
+    results: Dict[str, dict] = {}
+    async with client:
+        for name in args.scenarios.split(","):
+            scenario = getattr(workload, name)
+            print(f"-> {name}: {args.concurrency} workers for {args.duration}s")
+            results[name] = await drive(client, scenario, args.concurrency, args.duration, args.seed)
+            r = results[name]
+            print(
+                f"   {r['requests']} req, {r['throughput_rps']} req/s, "
+                f"p50 {r['p50_ms']}ms p95 {r['p95_ms']}ms p99 {r['p99_ms']}ms, {r['errors']} errors"
+            )
+
+    report = {
+        "git_revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "target": args.url or "in-process",
+        "params": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "zipf_s": args.zipf_s,
+        },
+        "dataset": dataset,
+        "scenarios": results,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        f"{datetime.utcnow():%Y%m%dT%H%M%S}-{report['git_revision']}.json"
+    )
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {out}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process ASGI app)")
+    parser.add_argument("--spots", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument(
+        "--scenarios",
+        default="bbox,comments_list,vote,comment_create",
+        help="Comma-separated subset of: bbox, vote, comments_list, comment_create",
+    )
+    parser.add_argument("--out", help="Write results to this path instead of bench/results/")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,116 @@
+"""Parse and planning overhead of the hot queries per statement mode.
+
+Usage (from ``backend_py/``, against a seeded database)::
+
+    python seed.py synthetic --spots 100000
+    python -m bench.statements --repeat 2000
+
+Runs the hot queries sequentially on one connection, once per
+``DB_STATEMENT_MODE`` (see app/database.py):
+
+- ``bbox``: the spot listing for a city-sized viewport.
+- ``user``: ``get_current_user``'s lookup by id.
+- ``vote``: a vote upsert, rolled back.
+
+``prepared`` reuses each statement's server-side prepared statement.
+``pgbouncer`` prepares it again on every execution, as it must behind a
+transaction-mode PgBouncer. The report gives the mean latency per query in
+each mode, the difference, and the server's own planning time for one
+execution from ``EXPLAIN (ANALYZE, SUMMARY)``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import DATABASE_URL, engine_options
+
+QUERIES = {
+    "bbox": text("""
+        SELECT spots.id, spots.short_id, spots.name, spots.location
+        FROM spots
+        WHERE ST_Contains(ST_MakeEnvelope(:west, :south, :east, :north, 4326), spots.location)
+        LIMIT 100
+    """),
+    "user": text("SELECT users.id, users.email, users.name FROM users WHERE users.id = :user_id"),
+    "vote": text("""
+        INSERT INTO votes (id, user_id, spot_id, value, created_at)
+        VALUES (gen_random_uuid(), :user_id, :spot_id, 1, timezone('utc', now()))
+        ON CONFLICT ON CONSTRAINT uq_user_spot_vote DO UPDATE SET value = EXCLUDED.value
+    """),
+}
+
+_SAMPLE = text("""
+SELECT s.id AS spot_id, ST_X(s.location) AS lon, ST_Y(s.location) AS lat, u.id AS user_id
+FROM spots s, (SELECT id FROM users LIMIT 1) u
+LIMIT 1
+""")
+
+
+async def _params(database_url: str) -> Dict:
+    sample_engine = create_async_engine(database_url)
+    async with sample_engine.connect() as conn:
+        row = (await conn.execute(_SAMPLE)).mappings().one()
+    await sample_engine.dispose()
+    # About 20km around a spot.
+    return {
+        "west": row["lon"] - 0.15, "south": row["lat"] - 0.1,
+        "east": row["lon"] + 0.15, "north": row["lat"] + 0.1,
+        "user_id": row["user_id"], "spot_id": row["spot_id"],
+    }
+
+
+async def run_mode(database_url: str, mode: str, params: Dict, repeat: int) -> Dict[str, float]:
+    db_engine = create_async_engine(database_url, **engine_options(mode))
+    means = {}
+    async with db_engine.connect() as conn:
+        for name, query in QUERIES.items():
+            await conn.execute(query, params)  # warm up: connect, prepare, type introspection
+            await conn.rollback()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                await conn.execute(query, params)
+            means[name] = (time.perf_counter() - started) / repeat * 1e6
+            await conn.rollback()
+    await db_engine.dispose()
+    return means
+
+
+async def planning_ms(database_url: str, params: Dict) -> Dict[str, float]:
+    db_engine = create_async_engine(database_url)
+    planning = {}
+    async with db_engine.connect() as conn:
+        for name, query in QUERIES.items():
+            explain = text("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + query.text)
+            plan = (await conn.execute(explain, params)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            planning[name] = plan[0]["Planning Time"]
+            await conn.rollback()
+    await db_engine.dispose()
+    return planning
+
+
+async def main(args: argparse.Namespace) -> None:
+    params = await _params(args.database_url)
+    modes = {mode: await run_mode(args.database_url, mode, params, args.repeat) for mode in ("prepared", "pgbouncer")}
+    report = {
+        "repeat": args.repeat,
+        "mean_us": {mode: {q: round(us, 1) for q, us in means.items()} for mode, means in modes.items()},
+        "saved_us": {q: round(modes["pgbouncer"][q] - modes["prepared"][q], 1) for q in QUERIES},
+        "server_planning_ms": await planning_ms(args.database_url, params),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,45 @@
+"""Production gunicorn settings: ``gunicorn app.main:app -c gunicorn.conf.py``.
+
+Every value can be overridden through the environment variables below.
+"""
+import os
+
+
+def _cpu_count() -> int:
+    # Respect container CPU affinity rather than the host's core count.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+
+# Async workers each multiplex many connections, so one per core keeps every
+# core busy without oversubscribing the database pool (pool_size x workers).
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+worker_class = "app.workers.UvicornWorker"
+
+# Import the app (FastAPI, SQLAlchemy, shapely, authlib...) once in the master
+# and fork; workers boot in milliseconds and share the imported code pages.
+# Sockets are opened per worker in the app's lifespan handler.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Slightly longer than typical load balancer idle timeouts (60s) so the
+# proxy, not us, closes idle connections.
+keepalive = int(os.getenv("KEEPALIVE", "65"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at once.
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# The UvicornWorker honours X-Forwarded-For/-Proto, but only from these peers
+# (comma-separated IPs or "*"). Set it to the load balancer's address, or the
+# rate limiter sees one client: the proxy.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+loglevel = os.getenv("LOG_LEVEL", "info")
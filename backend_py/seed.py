@@ -1,11 +1,49 @@
+"""Seed the database.
+
+Two modes:
+
+    python seed.py demo
+        Two demo users and a few well-known Calgary spots (the default).
+
+    python seed.py synthetic --users 50000 --spots 1000000 --workers 8
+        A large, deterministic synthetic dataset for profiling and benchmarks:
+        spots clustered around configurable cities, power-law distributed
+        votes and comments, inserted in parallel batches.
+
+Synthetic rows get ids derived from ``--seed``, so re-running with the same
+arguments is idempotent and two databases seeded alike contain the same spots,
+votes and comments (timestamps are relative to the time of the run).  The
+synthetic mode expects an already-migrated schema (``alembic upgrade head``).
+
+Rows are inserted directly, bypassing the write paths that keep the heatmap
+cells and trending scores current, so both modes finish by rebuilding those
+aggregates (the ``heatmap.rebuild`` and ``trending.reconcile`` jobs' work).
+"""
+import argparse
 import asyncio
+import math
+import os
+import random
+import string
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Sequence, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
 
-from app.database import AsyncSessionLocal, engine, Base
+from app import heatmap, partitions, trending
+from app.database import AsyncSessionLocal, DATABASE_URL, engine, Base
 from app.models.user import User
 from app.models.spot import Spot
+from app.models.comment import Comment
+from app.models.vote import Vote
 
 
 async def seed_data():
@@ -77,7 +115,6 @@ async def seed_data():
                 description=sdata["description"],
                 location=f"SRID=4326;POINT({sdata['lon']} {sdata['lat']})",
                 user_id=sdata["user"].id,
-                photos=[],
             )
             session.add(spot)
 
@@ -85,9 +122,309 @@ async def seed_data():
         print("Seed spots inserted (if they didn't already exist).")
 
 
+async def rebuild_aggregates(database_url: str = DATABASE_URL) -> None:
+    """Recount heatmap cells and recompute trending scores from the seeded rows."""
+    aggregates_engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with AsyncSession(aggregates_engine) as session:
+            await heatmap.rebuild(session, {})
+            await session.commit()
+            # One transaction per chunk, like the trending.reconcile_chunk jobs.
+            for prefix in trending.chunk_prefixes():
+                await trending.reconcile_chunk(session, {"prefix": prefix})
+                await session.commit()
+    finally:
+        await aggregates_engine.dispose()
+
+
+# ------------------ Synthetic dataset -----------------------
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.skatespot.local"
+SYNTHETIC_NAMESPACE = uuid.UUID("5d1f3c3e-8f0a-4c1b-9a57-0c6f1d2b7e11")
+
+# name -> (lon, lat)
+CITIES: Dict[str, Tuple[float, float]] = {
+    "calgary": (-114.0719, 51.0447),
+    "vancouver": (-123.1207, 49.2827),
+    "toronto": (-79.3832, 43.6532),
+    "montreal": (-73.5673, 45.5017),
+    "los-angeles": (-118.2437, 34.0522),
+    "new-york": (-74.0060, 40.7128),
+    "barcelona": (2.1734, 41.3851),
+    "berlin": (13.4050, 52.5200),
+    "tokyo": (139.6917, 35.6895),
+    "melbourne": (144.9631, -37.8136),
+}
+
+_BASE62 = string.digits + string.ascii_letters
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    users: int
+    spots: int
+    cities: Tuple[Tuple[float, float], ...]
+    seed: int = 42
+    batch_size: int = 10_000
+    votes_per_spot: float = 3.0
+    comments_per_spot: float = 0.5
+    # Pareto shape: smaller means a heavier tail (more "famous" spots).
+    alpha: float = 1.5
+    clusters_per_city: int = 40
+    # Standard deviation of a city cluster / of spots around a cluster, in km.
+    city_sigma_km: float = 8.0
+    cluster_sigma_km: float = 0.6
+
+
+def synthetic_id(seed: int, kind: str, index: int) -> uuid.UUID:
+    return uuid.uuid5(SYNTHETIC_NAMESPACE, f"{seed}:{kind}:{index}")
+
+
+def synthetic_short_id(index: int) -> str:
+    """Collision-free 6-character short id (offset past the 4-char space used by the app)."""
+    n = index + 62 ** 5
+    chars = []
+    for _ in range(6):
+        n, rem = divmod(n, 62)
+        chars.append(_BASE62[rem])
+    return "".join(reversed(chars))
+
+
+def _km_to_deg(km: float, lat: float) -> Tuple[float, float]:
+    dlat = km / 111.32
+    dlon = km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    return dlon, dlat
+
+
+def _cluster_centres(cfg: SyntheticConfig) -> List[Tuple[float, float]]:
+    """Deterministic neighbourhood centres; every batch recomputes the same list."""
+    rng = random.Random(f"{cfg.seed}:clusters")
+    centres = []
+    for lon, lat in cfg.cities:
+        dlon, dlat = _km_to_deg(cfg.city_sigma_km, lat)
+        for _ in range(cfg.clusters_per_city):
+            centres.append((lon + rng.gauss(0, dlon), lat + rng.gauss(0, dlat)))
+    return centres
+
+
+def _power_law_count(rng: random.Random, mean: float, alpha: float, cap: int) -> int:
+    # Pareto(alpha) with x_m = 1 has mean alpha / (alpha - 1); rescale to ``mean``.
+    scale = mean * (alpha - 1) / alpha
+    return min(cap, int(scale * rng.paretovariate(alpha)))
+
+
+def generate_spot_batch(cfg: SyntheticConfig, batch_no: int):
+    """Build the spot, vote and comment rows for one batch of spot indices."""
+    rng = random.Random(f"{cfg.seed}:batch:{batch_no}")
+    centres = _cluster_centres(cfg)
+    # Cluster popularity is itself skewed: downtown plazas get far more spots.
+    centre_cum_weights = list(accumulate(1.0 / (rank ** 0.8) for rank in range(1, len(centres) + 1)))
+    now = datetime.utcnow()
+    year_minutes = 60 * 24 * 365
+
+    start = batch_no * cfg.batch_size
+    stop = min(start + cfg.batch_size, cfg.spots)
+    spots, votes, comments = [], [], []
+    for i in range(start, stop):
+        c_lon, c_lat = rng.choices(centres, cum_weights=centre_cum_weights)[0]
+        dlon, dlat = _km_to_deg(cfg.cluster_sigma_km, c_lat)
+        lon = max(-180.0, min(180.0, c_lon + rng.gauss(0, dlon)))
+        lat = max(-90.0, min(90.0, c_lat + rng.gauss(0, dlat)))
+        spot_id = synthetic_id(cfg.seed, "spot", i)
+        age_minutes = rng.randrange(1, year_minutes)
+        created = now - timedelta(minutes=age_minutes)
+        spots.append(
+            {
+                "id": spot_id,
+                "short_id": synthetic_short_id(i),
+                "name": f"Synthetic Spot {i}",
+                "description": None,
+                "location": f"SRID=4326;POINT({lon:.6f} {lat:.6f})",
+                "user_id": synthetic_id(cfg.seed, "user", rng.randrange(cfg.users)),
+                "created_at": created,
+                "updated_at": created,
+            }
+        )
+
+        n_votes = _power_law_count(rng, cfg.votes_per_spot, cfg.alpha, cfg.users)
+        for voter in rng.sample(range(cfg.users), n_votes):
+            votes.append(
+                {
+                    "id": synthetic_id(cfg.seed, "vote", i * cfg.users + voter),
+                    "user_id": synthetic_id(cfg.seed, "user", voter),
+                    "spot_id": spot_id,
+                    "value": 1 if rng.random() < 0.85 else -1,
+                    "created_at": created + timedelta(minutes=rng.randrange(age_minutes)),
+                }
+            )
+
+        n_comments = _power_law_count(rng, cfg.comments_per_spot, cfg.alpha, 10_000)
+        for j in range(n_comments):
+            ts = created + timedelta(minutes=rng.randrange(age_minutes))
+            comments.append(
+                {
+                    "id": synthetic_id(cfg.seed, f"comment:{i}", j),
+                    "content": "Synthetic comment.",
+                    "spot_id": spot_id,
+                    "user_id": synthetic_id(cfg.seed, "user", rng.randrange(cfg.users)),
+                    "created_at": ts,
+                    "updated_at": ts,
+                }
+            )
+    return spots, votes, comments
+
+
+async def _bulk_insert(session: AsyncSession, model, rows: Sequence[dict], chunk: int = 5_000) -> None:
+    for offset in range(0, len(rows), chunk):
+        stmt = pg_insert(model.__table__).on_conflict_do_nothing()
+        await session.execute(stmt, list(rows[offset:offset + chunk]))
+
+
+async def _insert_spot_batch(database_url: str, cfg: SyntheticConfig, batch_no: int) -> Tuple[int, int, int]:
+    spots, votes, comments = generate_spot_batch(cfg, batch_no)
+    batch_engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with AsyncSession(batch_engine) as session:
+            await _bulk_insert(session, Spot, spots)
+            await _bulk_insert(session, Vote, votes)
+            await _bulk_insert(session, Comment, comments)
+            await session.commit()
+    finally:
+        await batch_engine.dispose()
+    return len(spots), len(votes), len(comments)
+
+
+def _run_batch(database_url: str, cfg: SyntheticConfig, batch_no: int) -> Tuple[int, int, int]:
+    """Process-pool entry point: each worker process drives its own event loop."""
+    return asyncio.run(_insert_spot_batch(database_url, cfg, batch_no))
+
+
+async def _insert_users(database_url: str, cfg: SyntheticConfig) -> None:
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": synthetic_id(cfg.seed, "user", i),
+            "email": f"user{i}.{cfg.seed}@{SYNTHETIC_EMAIL_DOMAIN}",
+            "name": f"Synthetic Skater {i}",
+            "created_at": now,
+            "last_login": now,
+        }
+        for i in range(cfg.users)
+    ]
+    users_engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with AsyncSession(users_engine) as session:
+            await _bulk_insert(session, User, rows)
+            await session.commit()
+    finally:
+        await users_engine.dispose()
+
+
+async def _ensure_comment_partitions(database_url: str) -> None:
+    # Synthetic comments go back up to a year; give each month its own
+    # partition rather than filling comments_default.
+    this_month = datetime.utcnow().date().replace(day=1)
+    partitions_engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with AsyncSession(partitions_engine) as session:
+            if (await session.execute(select(func.to_regclass("comments_default")))).scalar() is None:
+                return  # comments is not partitioned
+            for back in range(13):
+                await partitions.ensure_comment_partition(session, partitions.add_months(this_month, -back))
+            await session.commit()
+    finally:
+        await partitions_engine.dispose()
+
+
+def seed_synthetic(cfg: SyntheticConfig, database_url: str = DATABASE_URL, workers: int = 0) -> Dict[str, int]:
+    """Insert the synthetic dataset described by ``cfg``; returns row counts."""
+    workers = workers or os.cpu_count() or 1
+    asyncio.run(_insert_users(database_url, cfg))
+    asyncio.run(_ensure_comment_partitions(database_url))
+
+    n_batches = math.ceil(cfg.spots / cfg.batch_size)
+    totals = {"users": cfg.users, "spots": 0, "votes": 0, "comments": 0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_batch, database_url, cfg, b) for b in range(n_batches)]
+        for done, future in enumerate(futures, start=1):
+            spots, votes, comments = future.result()
+            totals["spots"] += spots
+            totals["votes"] += votes
+            totals["comments"] += comments
+            rate = totals["spots"] / (time.perf_counter() - started)
+            print(f"  batch {done}/{n_batches}: {totals['spots']} spots ({rate:,.0f}/s)")
+    return totals
+
+
+async def count_spots(database_url: str = DATABASE_URL) -> int:
+    count_engine = create_async_engine(database_url, poolclass=NullPool)
+    try:
+        async with count_engine.connect() as conn:
+            return (await conn.execute(select(func.count()).select_from(Spot))).scalar_one()
+    finally:
+        await count_engine.dispose()
+
+
+def parse_cities(value: str) -> Tuple[Tuple[float, float], ...]:
+    """``calgary,toronto`` or custom ``name:lon:lat`` entries."""
+    cities = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if ":" in item:
+            _, lon, lat = item.split(":")
+            cities.append((float(lon), float(lat)))
+        elif item in CITIES:
+            cities.append(CITIES[item])
+        else:
+            raise argparse.ArgumentTypeError(
+                f"unknown city {item!r}; use one of {', '.join(CITIES)} or name:lon:lat"
+            )
+    return tuple(cities)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed the SkateSpot database.")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("demo", help="Demo users and Calgary spots (default)")
+
+    synth = sub.add_parser("synthetic", help="Large deterministic synthetic dataset")
+    synth.add_argument("--users", type=int, default=10_000)
+    synth.add_argument("--spots", type=int, default=100_000)
+    synth.add_argument("--cities", type=parse_cities, default=parse_cities(",".join(CITIES)))
+    synth.add_argument("--seed", type=int, default=42)
+    synth.add_argument("--workers", type=int, default=0, help="Insert processes (default: CPU count)")
+    synth.add_argument("--batch-size", type=int, default=10_000, help="Spots per batch")
+    synth.add_argument("--votes-per-spot", type=float, default=3.0)
+    synth.add_argument("--comments-per-spot", type=float, default=0.5)
+    synth.add_argument("--alpha", type=float, default=1.5, help="Pareto shape for vote/comment counts")
+    synth.add_argument("--database-url", default=DATABASE_URL)
+    return parser.parse_args(argv)
+
+
 # ------------------ Entrypoint -----------------------
 
 if __name__ == "__main__":
-    print("Seeding database with demo users and Calgary spots…")
-    asyncio.run(seed_data())
-    print("Seeding complete.") 
\ No newline at end of file
+    args = parse_args()
+    if args.command == "synthetic":
+        cfg = SyntheticConfig(
+            users=args.users,
+            spots=args.spots,
+            cities=args.cities,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            votes_per_spot=args.votes_per_spot,
+            comments_per_spot=args.comments_per_spot,
+            alpha=args.alpha,
+        )
+        print(f"Seeding {cfg.spots} synthetic spots for {cfg.users} users…")
+        started = time.perf_counter()
+        totals = seed_synthetic(cfg, args.database_url, args.workers)
+        print("Rebuilding heatmap cells and trending scores…")
+        asyncio.run(rebuild_aggregates(args.database_url))
+        print(f"Seeding complete in {time.perf_counter() - started:.1f}s: {totals}")
+    else:
+        print("Seeding database with demo users and Calgary spots…")
+        asyncio.run(seed_data())
+        asyncio.run(rebuild_aggregates())
+        print("Seeding complete.")
@@ -0,0 +1,72 @@
+import asyncio
+
+from app.cache import SWRCache
+
+
+async def test_fresh_entries_are_served_from_memory():
+    cache = SWRCache("test", ttl=60, stale_ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return "value"
+
+    assert await cache.get("k", loader, loader) == "value"
+    assert await cache.get("k", loader, loader) == "value"
+    assert len(calls) == 1
+
+
+async def test_invalidate_forces_reload():
+    cache = SWRCache("test", ttl=60, stale_ttl=60)
+    values = iter(["old", "new"])
+
+    async def loader():
+        return next(values)
+
+    assert await cache.get("k", loader, loader) == "old"
+    cache.invalidate("k")
+    assert await cache.get("k", loader, loader) == "new"
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = SWRCache("test", ttl=60, stale_ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get("k", loader, loader) for _ in range(5)))
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+async def test_stale_entries_are_served_while_revalidating():
+    cache = SWRCache("test", ttl=0, stale_ttl=60)
+
+    async def loader():
+        return "old"
+
+    async def refresher():
+        return "new"
+
+    assert await cache.get("k", loader, refresher) == "old"
+    # Stale: returns the old value immediately and refreshes in the background.
+    assert await cache.get("k", loader, refresher) == "old"
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache._entries["k"][0] == "new"
+
+
+async def test_none_is_not_cached():
+    cache = SWRCache("test", ttl=60, stale_ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return None
+
+    assert await cache.get("k", loader, loader) is None
+    assert await cache.get("k", loader, loader) is None
+    assert len(calls) == 2
@@ -0,0 +1,66 @@
+import pytest
+from fastapi import Depends, FastAPI, Request, Response
+from httpx import AsyncClient
+from starlette.middleware.sessions import SessionMiddleware
+
+from app import database
+from app.database import STICKY_SESSION_KEY, _is_pinned, _pin_to_primary, engine_options, get_db
+
+
+def test_prepared_mode_sets_cache_size():
+    assert engine_options("prepared", 250)["connect_args"] == {"prepared_statement_cache_size": 250}
+
+
+def test_pgbouncer_mode_disables_caches_and_names_statements_uniquely():
+    connect_args = engine_options("pgbouncer")["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name = connect_args["prepared_statement_name_func"]
+    assert name() != name()
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        engine_options("session")
+
+
+def _request(session=None):
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [], "query_string": b""}
+    if session is not None:
+        scope["session"] = session
+    return Request(scope)
+
+
+def test_pin_lasts_for_the_stickiness_window(monkeypatch):
+    request = _request({})
+    assert not _is_pinned(request)
+    _pin_to_primary(request)
+    assert _is_pinned(request)
+    until = request.session[STICKY_SESSION_KEY]
+    monkeypatch.setattr(database.time, "time", lambda: until + 1)
+    assert not _is_pinned(request)
+
+
+def test_no_session_or_junk_is_not_pinned():
+    assert not _is_pinned(_request())
+    _pin_to_primary(_request())  # no SessionMiddleware: nothing to do
+    assert not _is_pinned(_request({STICKY_SESSION_KEY: "9999999999"}))
+
+
+async def test_pin_survives_a_handler_returning_its_own_response(monkeypatch):
+    monkeypatch.setattr(database, "replica_engines", [object()])
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="test")
+
+    @app.delete("/thing", status_code=204)
+    async def delete_thing(db=Depends(get_db)):
+        return Response(status_code=204)
+
+    @app.get("/pinned")
+    async def pinned(request: Request):
+        return {"pinned": _is_pinned(request)}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/pinned")).json() == {"pinned": False}
+        assert (await client.delete("/thing")).status_code == 204
+        assert (await client.get("/pinned")).json() == {"pinned": True}
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.dataloader import DataLoader, Loaders
+from app.models import Comment, Spot, User
+
+
+async def test_loads_in_the_same_turn_share_one_batch():
+    batches = []
+
+    async def batch(keys):
+        batches.append(list(keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    loader = DataLoader(batch)
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+    assert results == [10, 20, 10, None]
+    assert batches == [[1, 2, 3]]
+
+    assert await loader.load_many([2, 4]) == [20, 40]
+    assert batches == [[1, 2, 3], [4]]
+
+
+async def test_defaults_and_failures():
+    calls = []
+
+    async def batch(keys):
+        calls.append(keys)
+        if len(calls) == 1:
+            raise RuntimeError("db down")
+        return {}
+
+    loader = DataLoader(batch, default=list)
+    with pytest.raises(RuntimeError):
+        await loader.load("a")
+    # Failures are not cached.
+    assert await loader.load("a") == []
+    assert len(calls) == 2
+
+
+async def test_recent_comments_are_cut_per_spot(pg):
+    async with pg() as db:
+        user = User(email="commenter@example.com")
+        db.add(user)
+        await db.flush()
+        spots = [Spot(name=f"Spot {i}", location="POINT(-114.07 51.05)", user_id=user.id) for i in range(2)]
+        db.add_all(spots)
+        await db.flush()
+        now = datetime.utcnow()
+        for spot in spots:
+            for age in range(3):
+                db.add(Comment(spot_id=spot.id, user_id=user.id, content=f"{age}", created_at=now - timedelta(seconds=age)))
+        await db.flush()
+
+        loaders = Loaders(db)
+        recent = await loaders.recent_comments(2).load_many([spot.id for spot in spots])
+        assert [[comment.content for comment in comments] for comments in recent] == [["0", "1"], ["0", "1"]]
+        assert len(await loaders.comments.load(spots[0].id)) == 3
@@ -0,0 +1,119 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+
+from app import duplicates, heatmap, photos
+from app.database import get_db
+from app.main import app
+from app.models import Comment, Photo, Spot, SpotPhoto, User, Vote
+from app.routers.auth import get_current_user
+
+LEDGE = {"name": "Bow River Ledges", "location": {"type": "Point", "coordinates": [-114.0700, 51.0500]}}
+# About 5m east, with a slightly different name.
+SAME_LEDGE = {"name": "Bow River Ledge", "location": {"type": "Point", "coordinates": [-114.06993, 51.0500]}}
+
+
+@pytest.fixture
+async def api(pg):
+    async with pg() as db:
+        user = User(email="mapper@example.com")
+        db.add(user)
+        await db.commit()
+
+    async def pg_db():
+        async with pg() as db:
+            yield db
+
+    overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = pg_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(overrides)
+
+
+async def test_create_refuses_a_likely_duplicate_with_the_candidates(api):
+    first = await api.post("/api/spots/", json=LEDGE)
+    assert first.status_code == 201
+
+    refused = await api.post("/api/spots/", json=SAME_LEDGE)
+    assert refused.status_code == 409
+    body = refused.json()
+    assert body["detail"] == "A similar spot already exists nearby"
+    (candidate,) = body["candidates"]
+    assert (candidate["id"], candidate["short_id"], candidate["name"]) == (
+        first.json()["id"], first.json()["short_id"], LEDGE["name"],
+    )
+    assert candidate["distance_m"] < duplicates.SAME_PLACE_M
+    assert candidate["name_similarity"] >= duplicates.NAME_SIMILARITY
+
+
+async def test_force_creates_the_spot_anyway(api):
+    assert (await api.post("/api/spots/", json=LEDGE)).status_code == 201
+    forced = await api.post("/api/spots/", params={"force": "true"}, json=SAME_LEDGE)
+    assert forced.status_code == 201
+    assert forced.json()["name"] == SAME_LEDGE["name"]
+
+
+async def _cells(db):
+    rows = await db.execute(text(
+        "SELECT geohash, spot_count, vote_count, comment_count FROM spot_grid_cells WHERE spot_count <> 0 ORDER BY geohash"
+    ))
+    return [tuple(row) for row in rows]
+
+
+async def test_merge_folds_activity_and_photos_into_the_canonical_spot(pg):
+    async with pg() as db:
+        alice, bob, carol = (User(email=f"{name}@example.com") for name in ("alice", "bob", "carol"))
+        db.add_all([alice, bob, carol])
+        await db.flush()
+        canonical = Spot(name="Ledges", location="POINT(-114.07 51.05)", user_id=alice.id)
+        duplicate = Spot(name="Ledge", location="POINT(-114.0701 51.05)", user_id=bob.id)
+        db.add_all([canonical, duplicate])
+        await db.flush()
+        for spot in (canonical, duplicate):
+            await heatmap.add_spot(db, spot.id)
+
+        db.add_all([
+            Vote(spot_id=canonical.id, user_id=alice.id, value=1),
+            # alice voted on both: only her canonical vote survives.
+            Vote(spot_id=duplicate.id, user_id=alice.id, value=-1),
+            Vote(spot_id=duplicate.id, user_id=bob.id, value=-1),
+            Comment(spot_id=duplicate.id, user_id=carol.id, content="Waxed"),
+        ])
+        await db.flush()
+        await heatmap.add_activity(db, canonical.id, votes=1)
+        await heatmap.add_activity(db, duplicate.id, votes=2, comments=1)
+        shared, moved = "a" * 64, "b" * 64
+        await photos.attach(db, canonical.id, shared, alice.id)
+        await photos.attach(db, duplicate.id, shared, bob.id)
+        await photos.attach(db, duplicate.id, moved, bob.id)
+        await db.commit()
+
+        await duplicates.merge(db, canonical.id, [duplicate.id])
+        await db.commit()
+
+        assert await db.scalar(select(Spot.id).where(Spot.id == duplicate.id)) is None
+        votes = (await db.execute(select(Vote.user_id, Vote.value).where(Vote.spot_id == canonical.id))).all()
+        assert sorted(votes) == sorted([(alice.id, 1), (bob.id, -1)])
+        assert (await db.scalars(select(Comment.spot_id))).all() == [canonical.id]
+
+        links = (await db.execute(
+            select(SpotPhoto.photo_sha256, SpotPhoto.position).where(SpotPhoto.spot_id == canonical.id)
+            .order_by(SpotPhoto.position)
+        )).all()
+        assert [tuple(link) for link in links] == [(shared, 0), (moved, 1)]
+        refs = dict((await db.execute(select(Photo.sha256, Photo.ref_count))).all())
+        assert refs == {shared: 1, moved: 1}
+
+        # The heatmap counts the merged spot once, as a rebuild would.
+        merged = await _cells(db)
+        assert {(spots, votes, comments) for _, spots, votes, comments in merged} == {(1, 2, 1)}
+        await heatmap.rebuild(db, {})
+        assert await _cells(db) == merged
+
+        reconcile = (await db.execute(text("SELECT payload FROM jobs WHERE kind = 'trending.reconcile_chunk'"))).scalars().all()
+        assert reconcile == [{"prefix": f"{canonical.id.bytes[0]:02x}"}]
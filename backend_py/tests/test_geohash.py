@@ -0,0 +1,48 @@
+import pytest
+
+from app import geohash
+
+
+def test_encode_known_values():
+    assert geohash.encode(-5.6, 42.6, 5) == "ezs42"
+    assert geohash.encode(10.40744, 57.64911, 11) == "u4pruydqqvj"
+
+
+def test_bounds_contain_point_and_decode_round_trips():
+    lon, lat = -114.0307, 51.04107
+    cell = geohash.encode(lon, lat)
+    west, south, east, north = geohash.bounds(cell)
+    assert west <= lon < east and south <= lat < north
+    assert geohash.encode(*geohash.decode(cell), precision=len(cell)) == cell
+
+
+def test_neighbors_surround_cell():
+    cell = "ezs42"
+    around = geohash.neighbors(cell)
+    assert around["n"] == "ezs48"
+    assert around["e"] == "ezs43"
+    assert around["s"] == "ezs40"
+    assert around["w"] == "ezefr"
+    assert len(set(around.values())) == 8 and cell not in around.values()
+
+
+def test_neighbors_wrap_antimeridian_and_stop_at_poles():
+    assert geohash.adjacent("8", 0, 0) == "8"
+    assert geohash.adjacent("8", -1, 0) == "x"
+    assert geohash.adjacent("b", 0, 1) is None
+    assert "n" not in geohash.neighbors("b")
+
+
+def test_cover_bbox():
+    assert geohash.cover(-5.61, 42.59, -5.59, 42.61, 5) == ["ezs42"]
+    west, south, east, north = geohash.bounds("ezs42")
+    cells = geohash.cover(west - 0.01, south, east, north + 0.01, 5)
+    assert sorted(cells) == sorted(["ezefr", "ezefx", "ezs42", "ezs48"])
+
+
+def test_prefix_range():
+    lo, hi = geohash.prefix_range("c2b")
+    assert lo <= "c2b" < "c2bzzzzzz" < hi
+    assert not lo <= "c2c" < hi
+    with pytest.raises(ValueError):
+        geohash.prefix_range("")
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from app import geohash, heatmap
+from app.models import Spot, User, Vote
+
+
+def test_precision_for_zoom_gets_finer_and_stays_in_range():
+    precisions = [heatmap.precision_for_zoom(zoom) for zoom in range(23)]
+    assert precisions == sorted(precisions)
+    assert precisions[0] == heatmap.MIN_PRECISION
+    assert precisions[-1] == heatmap.MAX_PRECISION
+    # About 8 cells across a tile: a precision-p cell is 360 / 2^ceil(5p/2) degrees wide.
+    width, _ = geohash.cell_size(heatmap.precision_for_zoom(10))
+    assert 360 / 2 ** 10 / 16 <= width <= 360 / 2 ** 10 / 4
+
+
+def _inside(point, box):
+    lon, lat = point
+    west, south, east, north = box
+    return west <= lon <= east and south <= lat <= north
+
+
+def test_center_bounds_selects_exactly_the_intersecting_cells():
+    box = (-114.13, 51.01, -113.98, 51.08)
+    precision = 5
+    centers = heatmap.center_bounds(*box, precision)
+    covering = geohash.cover(*box, precision)
+    # Edge cells are centred outside the box but still selected.
+    assert any(not _inside(geohash.decode(cell), box) for cell in covering)
+    assert all(_inside(geohash.decode(cell), centers) for cell in covering)
+
+    ring = {n for cell in covering for n in geohash.neighbors(cell).values()} - set(covering)
+    assert ring and not any(_inside(geohash.decode(cell), centers) for cell in ring)
+
+
+async def _cells(db):
+    rows = await db.execute(text(
+        "SELECT geohash, spot_count, vote_count, comment_count FROM spot_grid_cells WHERE spot_count <> 0 ORDER BY geohash"
+    ))
+    return [tuple(row) for row in rows]
+
+
+async def test_rebuild_matches_the_incremental_counts(pg):
+    async with pg() as db:
+        user = User(email="mapper@example.com")
+        db.add(user)
+        await db.flush()
+        for lon in (-114.07, -114.06):
+            spot = Spot(name="Rail", location=f"POINT({lon} 51.05)", user_id=user.id)
+            db.add(spot)
+            await db.flush()
+            await heatmap.add_spot(db, spot.id)
+        db.add(Vote(spot_id=spot.id, user_id=user.id, value=1))
+        await heatmap.add_activity(db, spot.id, votes=1)
+        await db.commit()
+        incremental = await _cells(db)
+        assert len(incremental) >= heatmap.MAX_PRECISION
+
+        await heatmap.rebuild(db, {})
+        assert await _cells(db) == incremental
@@ -0,0 +1,27 @@
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from app import ids, partitions
+
+
+def test_uuid7_is_version_7_and_increasing():
+    values = [ids.uuid7() for _ in range(5000)]
+    assert all(value.version == 7 for value in values)
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_uuid7_time():
+    before = datetime.now(timezone.utc) - timedelta(milliseconds=1)
+    created = ids.uuid7_time(ids.uuid7())
+    assert before <= created <= datetime.now(timezone.utc) + timedelta(seconds=1)
+    with pytest.raises(ValueError):
+        ids.uuid7_time(uuid4())
+
+
+def test_comment_partition_months():
+    assert partitions.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert partitions.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partitions.comment_partition_name(date(2026, 3, 1)) == "comments_y2026m03"
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import heatmap, jobs, trending  # noqa: F401
+
+calls = []
+sessionmakers = []
+
+
+@jobs.handler("test.ok", timeout=5)
+async def _ok(db, payload):
+    row = (await db.execute(text("SELECT attempts, started_at FROM jobs WHERE kind = 'test.ok'"))).one()
+    calls.append(("ok", row.attempts, row.started_at is not None))
+    # Leased to this run: another slot finds nothing to do.
+    calls.append(("other slot", await jobs.run_one(sessionmakers[-1], ["test.ok"])))
+
+
+@jobs.handler("test.fail", timeout=5)
+async def _fail(db, payload):
+    calls.append(("fail",))
+    raise RuntimeError("boom")
+
+
+async def _enqueue(pg, kind, **columns):
+    async with pg() as db:
+        await jobs.enqueue(db, kind, {})
+        if columns:
+            assignments = ", ".join(f"{name} = :{name}" for name in columns)
+            await db.execute(text(f"UPDATE jobs SET {assignments} WHERE kind = :kind"), {**columns, "kind": kind})
+        await db.commit()
+
+
+async def _job(pg, kind):
+    async with pg() as db:
+        return (await db.execute(text("SELECT * FROM jobs WHERE kind = :kind"), {"kind": kind})).one()
+
+
+def test_periodic_kinds_are_registered():
+    assert jobs.HANDLERS["trending.rescale"].every == trending.RESCALE_INTERVAL_SECONDS
+    assert jobs.HANDLERS["jobs.prune"].every
+    # Fan-out chunks are only ever enqueued by trending.reconcile.
+    assert jobs.HANDLERS["trending.reconcile_chunk"].every is None
+    assert "heatmap.rebuild" in jobs.HANDLERS
+
+
+async def test_claim_commits_the_attempt_before_running(pg):
+    calls.clear()
+    sessionmakers.append(pg)
+    await _enqueue(pg, "test.ok")
+    assert await jobs.run_one(pg, ["test.ok"])
+
+    assert calls == [("ok", 1, True), ("other slot", False)]
+    job = await _job(pg, "test.ok")
+    assert (job.status, job.attempts, job.last_error) == ("done", 1, None)
+    assert not await jobs.run_one(pg, ["test.ok"])
+
+
+async def test_failures_back_off_then_give_up(pg):
+    calls.clear()
+    await _enqueue(pg, "test.fail", max_attempts=2)
+
+    assert await jobs.run_one(pg, ["test.fail"])
+    job = await _job(pg, "test.fail")
+    assert (job.status, job.attempts, job.started_at) == ("queued", 1, None)
+    assert job.run_at > datetime.utcnow() and job.last_error == "RuntimeError: boom"
+    assert not await jobs.run_one(pg, ["test.fail"])  # not due yet
+
+    async with pg() as db:
+        await db.execute(text("UPDATE jobs SET run_at = timezone('utc', now())"))
+        await db.commit()
+    assert await jobs.run_one(pg, ["test.fail"])
+    job = await _job(pg, "test.fail")
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert calls == [("fail",), ("fail",)]
+
+
+async def test_job_of_a_dead_worker_is_retried_after_its_lease(pg):
+    calls.clear()
+    # Claimed (attempt 1 counted) by a worker that never finished it.
+    await _enqueue(pg, "test.fail", attempts=1, max_attempts=3, started_at=datetime.utcnow())
+    assert not await jobs.run_one(pg, ["test.fail"])
+
+    lease = jobs.lease_seconds(["test.fail"])
+    async with pg() as db:
+        await db.execute(text("UPDATE jobs SET started_at = :at"), {"at": datetime.utcnow() - timedelta(seconds=lease + 1)})
+        await db.commit()
+    assert await jobs.run_one(pg, ["test.fail"])
+    assert calls == [("fail",)]
+    assert (await _job(pg, "test.fail")).attempts == 2
+
+
+async def test_job_that_keeps_killing_workers_is_given_up(pg):
+    calls.clear()
+    long_ago = datetime.utcnow() - timedelta(days=1)
+    await _enqueue(pg, "test.fail", attempts=3, max_attempts=3, started_at=long_ago)
+
+    assert await jobs.run_one(pg, ["test.fail"])
+    job = await _job(pg, "test.fail")
+    assert (job.status, job.attempts) == ("failed", 3)
+    assert "worker died" in job.last_error
+    assert calls == []
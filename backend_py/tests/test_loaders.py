@@ -0,0 +1,9 @@
+from app import models  # noqa: F401  (registers the mappers)
+from app.database import Base
+
+
+def test_relationships_never_lazy_load():
+    # Queries must choose a strategy from app/loaders.py.
+    for mapper in Base.registry.mappers:
+        for rel in mapper.relationships:
+            assert rel.lazy == "raise", f"{mapper.class_.__name__}.{rel.key} is lazy={rel.lazy!r}"
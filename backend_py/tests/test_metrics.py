@@ -0,0 +1,91 @@
+import pytest
+
+from app import metrics
+
+
+@pytest.fixture
+def histogram():
+    histogram = metrics.Histogram("test_seconds", "Test latency.", ("route",), buckets=(1.0, 0.1))
+    yield histogram
+    metrics.REGISTRY.remove(histogram)
+
+
+def test_histogram_buckets_are_cumulative_and_upper_bounds_inclusive(histogram):
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, ("/a",))
+    histogram.observe(0.2, ('say "hi"\n',))
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds Test latency.", "# TYPE test_seconds histogram"]
+    assert lines[2:7] == [
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 5.65',
+        'test_seconds_count{route="/a"} 4',
+    ]
+    assert lines[-1] == 'test_seconds_count{route="say \\"hi\\"\\n"} 1'
+
+
+async def test_render_latest_runs_collectors_first(histogram):
+    calls = []
+
+    async def collect():
+        calls.append(1)
+        histogram.observe(0.01, ("/b",))
+
+    metrics.register_collector(collect)
+    try:
+        text = await metrics.render_latest()
+    finally:
+        metrics._COLLECTORS.remove(collect)
+    assert calls == [1]
+    assert 'test_seconds_bucket{route="/b",le="0.1"} 1' in text.splitlines()
+    assert text.endswith("\n")
+
+
+class _Route:
+    path = "/api/spots/{spot_id}"
+
+
+async def _call(app, path):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    await metrics.MetricsMiddleware(app)(scope, receive, send)
+
+
+async def test_middleware_labels_by_route_template():
+    async def routed(scope, receive, send):
+        scope["route"] = _Route()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def unmatched(scope, receive, send):
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def crashed(scope, receive, send):
+        scope["route"] = _Route()
+        raise RuntimeError("boom")
+
+    before = metrics.HTTP_REQUESTS.value(("GET", "/api/spots/{spot_id}", "200"))
+    await _call(routed, "/api/spots/abc")
+    await _call(routed, "/api/spots/def")
+    assert metrics.HTTP_REQUESTS.value(("GET", "/api/spots/{spot_id}", "200")) == before + 2
+    assert not any("/api/spots/abc" in labels for labels in metrics.HTTP_REQUESTS._values)
+
+    before = metrics.HTTP_REQUESTS.value(("GET", "<unmatched>", "404"))
+    await _call(unmatched, "/nope")
+    assert metrics.HTTP_REQUESTS.value(("GET", "<unmatched>", "404")) == before + 1
+
+    before = metrics.HTTP_REQUESTS.value(("GET", "/api/spots/{spot_id}", "500"))
+    with pytest.raises(RuntimeError):
+        await _call(crashed, "/api/spots/abc")
+    assert metrics.HTTP_REQUESTS.value(("GET", "/api/spots/{spot_id}", "500")) == before + 1
+    assert metrics.HTTP_IN_FLIGHT.value(("GET",)) == 0
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from app.models.photo import original_key
+from app.photos import VARIANTS, ChecksumMismatch, build_variants, process_image, variant_key
+from app.storage import LocalStorage, S3Storage
+
+
+def camera_jpeg(width=4000, height=3000, orientation=6) -> bytes:
+    """A noisy camera-sized JPEG with GPS-ish EXIF and a rotation tag."""
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "TestCam"  # Make
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=92, exif=exif)
+    return buf.getvalue()
+
+
+def test_variants_are_rotated_resized_and_stripped():
+    original = camera_jpeg()
+    result = process_image(original)
+
+    # Orientation 6 means the camera was held upright.
+    assert (result["width"], result["height"]) == (3000, 4000)
+    for name, edge in VARIANTS.items():
+        webp = result["variants"][name]["webp"]
+        assert (webp["width"], webp["height"]) == (edge * 3 // 4, edge)
+        with Image.open(io.BytesIO(webp["data"])) as encoded:
+            assert encoded.format == "WEBP"
+            assert not encoded.getexif()
+
+    assert result["variants"]["thumb"]["webp"]["bytes"] * 10 <= len(original)
+
+
+def upload(storage, data: bytes) -> str:
+    sha256 = hashlib.sha256(data).hexdigest()
+    storage.put(original_key(sha256), data, "image/jpeg")
+    return sha256
+
+
+async def test_build_variants_on_local_storage(tmp_path):
+    storage = LocalStorage(tmp_path, "/media")
+    sha256 = upload(storage, camera_jpeg(800, 600, orientation=1))
+
+    with ThreadPoolExecutor(1) as executor:
+        result = await build_variants(storage, sha256, executor)
+
+    thumb = result["variants"]["thumb"]["webp"]
+    assert thumb["url"] == "/media/" + variant_key(sha256, "thumb", "webp")
+    assert "data" not in thumb
+    assert storage.exists(variant_key(sha256, "medium", "webp"))
+
+
+async def test_build_variants_rejects_content_not_matching_its_hash(tmp_path):
+    storage = LocalStorage(tmp_path)
+    sha256 = "0" * 64
+    storage.put(original_key(sha256), camera_jpeg(64, 64), "image/jpeg")
+
+    with pytest.raises(ChecksumMismatch):
+        await build_variants(storage, sha256)
+
+
+def test_local_storage_rejects_keys_outside_root(tmp_path):
+    with pytest.raises(ValueError):
+        LocalStorage(tmp_path).put("../escape.jpg", b"x", "image/jpeg")
+
+
+def test_build_variants_on_s3():
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="photos")
+        storage = S3Storage(client, "photos", "https://cdn.example")
+        sha256 = upload(storage, camera_jpeg(800, 600, orientation=1))
+
+        with ThreadPoolExecutor(1) as executor:
+            result = asyncio.run(build_variants(storage, sha256, executor))
+
+        key = variant_key(sha256, "thumb", "webp")
+        assert result["variants"]["thumb"]["webp"]["url"] == f"https://cdn.example/{key}"
+        head = client.head_object(Bucket="photos", Key=key)
+        assert head["ContentType"] == "image/webp"
+
+        storage.delete(original_key(sha256))
+        assert not storage.exists(original_key(sha256))
+        with pytest.raises(FileNotFoundError):
+            storage.get(original_key(sha256))
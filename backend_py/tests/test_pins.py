@@ -0,0 +1,23 @@
+from uuid import uuid4
+
+from app import pins
+
+
+def test_columnar_transposes_rows():
+    a, b = uuid4(), uuid4()
+    payload = pins.columnar([(a, "aB3x", -11403070, 5104107, 12), (b, "Qz9k", 1, -2, 0)])
+    assert payload == {
+        "count": 2,
+        "scale": pins.SCALE,
+        "ids": [str(a), str(b)],
+        "short_ids": ["aB3x", "Qz9k"],
+        "lon": [-11403070, 1],
+        "lat": [5104107, -2],
+        "score": [12, 0],
+    }
+
+
+def test_columnar_binary_ids_and_empty():
+    spot_id = uuid4()
+    assert pins.columnar([(spot_id, "x", 0, 0, 0)], binary_ids=True)["ids"] == [spot_id.bytes]
+    assert pins.columnar([])["count"] == 0
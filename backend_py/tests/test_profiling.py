@@ -0,0 +1,58 @@
+from app import profiling
+
+
+async def _call(app, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def handler(scope, receive, send):
+    body = b"[" + b",".join(str(i).encode() for i in range(1000)) + b"]"
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _scope(path="/api/spots/", headers=()):
+    return {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": list(headers)}
+
+
+async def test_sampled_request_is_profiled_and_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1.0)
+    sent = await _call(profiling.ProfilingMiddleware(handler), _scope())
+
+    headers = dict(sent[0]["headers"])
+    profile_id = headers[b"x-profile-id"].decode()
+    [meta] = profiling.list_profiles()
+    assert meta["id"] == profile_id
+    assert meta["status"] == 200 and meta["path"] == "/api/spots/"
+    assert set(meta["artifacts"]) == {"prof", "txt", "alloc.txt", "tracemalloc"}
+    assert profiling.artifact_path(profile_id, "txt").read_text()
+
+
+async def test_unsampled_and_admin_requests_are_not_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 0.0)
+    app = profiling.ProfilingMiddleware(handler)
+    # X-Profile without an admin token is ignored.
+    sent = await _call(app, _scope(headers=[(b"x-profile", b"1")]))
+    assert b"x-profile-id" not in dict(sent[0]["headers"])
+
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1.0)
+    await _call(app, _scope(path="/api/admin/profiles"))
+    assert profiling.list_profiles() == []
+
+
+def test_artifact_path_rejects_traversal(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    assert profiling.artifact_path("../../etc/passwd", "txt") is None
+    assert profiling.artifact_path("1700000000-deadbeef", "py") is None
+    assert profiling.artifact_path("1700000000-deadbeef", "txt") is None
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app import ratelimit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "ENABLED", True)
+    ratelimit.set_store(ratelimit.MemoryStore(clock=clock))
+    yield clock
+    ratelimit.set_store(None)
+
+
+def _scope(method="GET", path="/api/spots/", ip="10.0.0.1"):
+    return {"type": "http", "method": method, "path": path, "headers": [], "client": (ip, 1234)}
+
+
+async def _call(app, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start.get("headers", []))
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def test_route_classes():
+    assert ratelimit.route_class("GET", "/api/spots/") == "read"
+    assert ratelimit.route_class("POST", "/api/spots/abc/vote") == "vote"
+    assert ratelimit.route_class("DELETE", "/api/spots/abc/vote") == "vote"
+    assert ratelimit.route_class("POST", "/api/spots/") == "write"
+    assert ratelimit.route_class("GET", "/health") is None
+    assert ratelimit.route_class("OPTIONS", "/api/spots/") is None
+
+
+async def test_memory_bucket_refills_at_rate():
+    clock = Clock()
+    store = ratelimit.MemoryStore(clock=clock)
+    assert [await store.take("k", 2, 3) for _ in range(3)] == [0, 0, 0]
+    assert await store.take("k", 2, 3) == pytest.approx(0.5)
+    clock.now = 0.5
+    assert await store.take("k", 2, 3) == 0
+
+
+async def test_over_limit_gets_429_with_retry_after(clock):
+    app = ratelimit.RateLimitMiddleware(ok_app, limits={"read": (1, 2), "vote": (1, 1), "write": (1, 1)})
+    assert (await _call(app, _scope()))[0] == 200
+    assert (await _call(app, _scope()))[0] == 200
+    status, headers = await _call(app, _scope())
+    assert status == 429
+    assert headers[b"retry-after"] == b"1"
+    # Other clients and other route classes have their own buckets.
+    assert (await _call(app, _scope(ip="10.0.0.2")))[0] == 200
+    assert (await _call(app, _scope("POST", "/api/spots/x/vote")))[0] == 200
+    clock.now = 1.0
+    assert (await _call(app, _scope()))[0] == 200
+
+
+async def test_store_failure_lets_requests_through(clock):
+    class Broken(ratelimit.BucketStore):
+        async def take(self, key, rate, burst):
+            raise ConnectionError("down")
+
+    ratelimit.set_store(Broken())
+    app = ratelimit.RateLimitMiddleware(ok_app, limits={"read": (1, 1)})
+    assert (await _call(app, _scope()))[0] == 200
+
+
+async def test_overload_gets_503_without_reaching_the_app(clock):
+    release = asyncio.Event()
+    calls = []
+
+    async def slow_app(scope, receive, send):
+        calls.append(1)
+        await release.wait()
+        await ok_app(scope, receive, send)
+
+    admission = ratelimit.Admission(limit=1, queue=1, timeout=5)
+    app = ratelimit.RateLimitMiddleware(slow_app, limits={"read": (100, 100)}, admission=admission)
+    running = asyncio.create_task(_call(app, _scope()))
+    queued = asyncio.create_task(_call(app, _scope()))
+    await asyncio.sleep(0)
+    status, headers = await _call(app, _scope())
+    assert status == 503 and headers[b"retry-after"] == b"1"
+    assert len(calls) == 1
+
+    release.set()
+    assert (await running)[0] == 200
+    assert (await queued)[0] == 200
+    assert admission.in_flight == 0
@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app import read_model
+from app.read_model import NOTIFY_CHANNEL, ChangeListener, SpotIndex
+
+
+@pytest.fixture
+def index():
+    idx = SpotIndex(cell_deg=0.01)
+    idx.upsert(uuid.UUID(int=1), -114.07, 51.04, 3)
+    idx.upsert(uuid.UUID(int=2), -114.06, 51.05, -1)
+    idx.upsert(uuid.UUID(int=3), -79.38, 43.65, 10)
+    return idx
+
+
+def test_bbox_returns_only_contained_spots(index):
+    hits = index.bbox(-114.1, 51.0, -114.0, 51.1)
+    assert [spot_id.int for spot_id, _ in hits] == [1, 2]
+    assert dict(hits)[uuid.UUID(int=1)] == 3
+
+
+def test_bbox_skip_and_limit(index):
+    hits = index.bbox(-180, -90, 180, 90, skip=1, limit=1)
+    assert [spot_id.int for spot_id, _ in hits] == [2]
+
+
+def test_upsert_moves_spot_between_cells(index):
+    index.upsert(uuid.UUID(int=1), -79.39, 43.66, 4)
+    assert [s.int for s, _ in index.bbox(-114.1, 51.0, -114.0, 51.1)] == [2]
+    assert index.score(uuid.UUID(int=1)) == 4
+    assert len(index) == 3
+
+
+def test_remove_frees_slot_for_reuse(index):
+    index.remove(uuid.UUID(int=2))
+    assert len(index) == 2
+    assert index.score(uuid.UUID(int=2)) is None
+    index.upsert(uuid.UUID(int=4), -114.065, 51.045, 0)
+    assert [s.int for s, _ in index.bbox(-114.1, 51.0, -114.0, 51.1)] == [1, 4]
+
+
+def test_nearby_orders_by_distance(index):
+    hits = index.nearby(-114.061, 51.049, radius_m=2000)
+    assert [s.int for s, _ in hits] == [2, 1]
+    assert hits[0][1] < hits[1][1] <= 2000
+
+
+def test_nearby_searches_across_the_antimeridian(index):
+    index.upsert(uuid.UUID(int=4), -179.995, 0.0, 0)
+    hits = index.nearby(179.995, 0.0, radius_m=2000)
+    assert [s.int for s, _ in hits] == [4]
+    assert hits[0][1] == pytest.approx(1113, rel=0.01)
+
+
+def test_memory_budget_is_enforced():
+    idx = SpotIndex(max_bytes=2 * 160)
+    idx.upsert(uuid.UUID(int=1), 0, 0, 0)
+    idx.upsert(uuid.UUID(int=2), 0, 0, 0)
+    with pytest.raises(MemoryError):
+        idx.upsert(uuid.UUID(int=3), 0, 0, 0)
+
+
+async def test_listener_refreshes_one_batch_at_a_time(monkeypatch):
+    batches, running = [], []
+
+    async def refresh(sessionmaker, spot_ids, index):
+        assert not running
+        running.append(1)
+        batches.append(sorted(spot_id.int for spot_id in spot_ids))
+        await asyncio.sleep(0.02)
+        running.pop()
+
+    monkeypatch.setattr(read_model, "refresh_spots", refresh)
+    listener = ChangeListener("postgresql+asyncpg://localhost/test", sessionmaker=None, index=SpotIndex())
+    listener._consumer = asyncio.create_task(listener._consume())
+
+    def notify(payload):
+        listener._on_notify(None, 0, NOTIFY_CHANNEL, payload)
+
+    notify(str(uuid.UUID(int=1)))
+    await asyncio.sleep(0.005)
+    # Arrive while spot 1 is being refreshed: queued for the next batch.
+    notify(str(uuid.UUID(int=2)))
+    notify(str(uuid.UUID(int=1)))
+    notify("not-a-uuid")
+    await asyncio.sleep(0.05)
+    await listener.stop()
+    assert batches == [[1], [1, 2]]
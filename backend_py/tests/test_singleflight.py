@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_load():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(flight.do("k", loader) for _ in range(5)))
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    # Nothing is cached once the flight lands.
+    assert await flight.do("k", loader) == "value"
+    assert len(calls) == 2
+
+
+async def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return object()
+
+    a, b = await asyncio.gather(flight.do("a", loader), flight.do("b", loader))
+    assert a is not b
+
+
+async def test_followers_retry_when_the_leader_is_cancelled():
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    leader = asyncio.ensure_future(flight.do("k", loader))
+    await started.wait()
+    follower = asyncio.ensure_future(flight.do("k", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    # The follower becomes the new leader and runs its own load.
+    assert await follower == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_cancelled_follower_does_not_cancel_the_leader():
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+
+    async def loader():
+        started.set()
+        await asyncio.sleep(0.02)
+        return "value"
+
+    leader = asyncio.ensure_future(flight.do("k", loader))
+    await started.wait()
+    follower = asyncio.ensure_future(flight.do("k", loader))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+    assert await leader == "value"
+
+
+async def test_followers_share_the_leaders_failure():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", loader) for _ in range(3)), return_exceptions=True)
+    assert [str(r) for r in results] == ["boom"] * 3
+    assert len(calls) == 1
+    assert "k" not in flight._inflight
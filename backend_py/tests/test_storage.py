@@ -0,0 +1,33 @@
+import hashlib
+
+from httpx import AsyncClient
+
+from app import storage
+from app.main import app
+from app.models.photo import original_key
+
+
+async def test_local_presigned_upload_stores_content_matching_its_hash(tmp_path, monkeypatch):
+    local = storage.LocalStorage(tmp_path)
+    monkeypatch.setattr(storage, "_storage", local)
+    data = b"\xff\xd8 not really a jpeg"
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    upload = local.presign_put(original_key(sha256), "image/jpeg", sha256)
+    assert upload == {"url": f"/api/spots/local-uploads/{sha256}", "headers": {"Content-Type": "image/jpeg"}}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        wrong = await client.put(upload["url"], content=b"something else", headers=upload["headers"])
+        assert wrong.status_code == 400
+        assert not local.exists(original_key(sha256))
+
+        stored = await client.put(upload["url"], content=data, headers=upload["headers"])
+        assert stored.status_code == 204
+    assert local.get(original_key(sha256)) == data
+
+
+async def test_local_upload_route_is_off_for_s3(monkeypatch):
+    monkeypatch.setattr(storage, "_storage", storage.S3Storage(client=None, bucket="photos", base_url="https://cdn"))
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.put(f"/api/spots/local-uploads/{'0' * 64}", content=b"")
+    assert response.status_code == 404
@@ -0,0 +1,97 @@
+import pytest
+
+from app import tracing
+
+
+class MemoryExporter(tracing.Exporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exported():
+    exporter = MemoryExporter()
+    tracing.configure(exporter, sample_rate=1.0, synchronous=True)
+    yield exporter.spans
+    tracing.configure(None)
+
+
+class _Route:
+    path = "/api/spots/{spot_id}"
+
+
+async def handler(scope, receive, send):
+    scope["route"] = _Route()
+    with tracing.span("db.query", tracing.CLIENT, statement="SELECT 1"):
+        pass
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _call(app, headers=()):
+    sent = []
+    scope = {"type": "http", "method": "GET", "path": "/api/spots/abc", "headers": list(headers)}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def test_request_spans_nest_under_the_route_named_root(exported):
+    sent = await _call(tracing.TracingMiddleware(handler))
+
+    child, root = exported
+    assert root.name == "GET /api/spots/{spot_id}" and root.parent_id is None
+    assert root.attributes["http.status_code"] == 200
+    assert child.parent_id == root.span_id and child.trace_id == root.trace_id
+    assert dict(sent[0]["headers"])[b"x-trace-id"] == root.trace_id.encode()
+
+
+async def test_traceparent_joins_the_callers_trace(exported):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    await _call(tracing.TracingMiddleware(handler), [(b"traceparent", f"00-{trace_id}-{parent_id}-01".encode())])
+    root = exported[-1]
+    assert (root.trace_id, root.parent_id) == (trace_id, parent_id)
+
+    exported.clear()
+    await _call(tracing.TracingMiddleware(handler), [(b"traceparent", f"00-{trace_id}-{parent_id}-00".encode())])
+    assert exported == []
+
+
+async def test_untrusted_traceparent_cannot_force_sampling():
+    exporter = MemoryExporter()
+    traceparent = [(b"traceparent", b"00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")]
+    try:
+        tracing.configure(exporter, sample_rate=0.0, synchronous=True)
+        await _call(tracing.TracingMiddleware(handler), traceparent)
+        assert exporter.spans == []
+
+        tracing.configure(exporter, sample_rate=0.0, synchronous=True, trust_traceparent=True)
+        await _call(tracing.TracingMiddleware(handler), traceparent)
+        assert exporter.spans[-1].trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    finally:
+        tracing.configure(None)
+
+
+def test_span_outside_a_trace_does_nothing(exported):
+    with tracing.span("orphan") as orphan:
+        assert orphan is None
+    assert exported == []
+
+
+def test_otlp_payload():
+    root = tracing.Span("GET /api/spots/", "ab" * 16, None, tracing.SERVER, **{"http.status_code": 200})
+    root.end()
+    root.error = "ValueError: bad"
+    [otlp] = tracing.OtlpHttpExporter("http://collector").payload([root])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp["traceId"] == "ab" * 16 and "parentSpanId" not in otlp
+    assert otlp["attributes"] == [{"key": "http.status_code", "value": {"intValue": "200"}}]
+    assert otlp["status"]["code"] == 2
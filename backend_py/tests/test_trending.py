@@ -0,0 +1,107 @@
+import math
+import uuid
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import trending
+from app.models import Spot, User, Vote
+
+
+def test_decay_halves_over_the_half_life():
+    assert math.exp(-trending.DECAY_PER_SECOND * trending.HALF_LIFE_HOURS * 3600) == pytest.approx(0.5)
+
+
+async def _spot(db, spot_id=None, age=timedelta(0)):
+    user = User(email=f"{uuid.uuid4()}@example.com")
+    db.add(user)
+    await db.flush()
+    spot = Spot(id=spot_id or uuid.uuid4(), name="Ledge", location="POINT(-114.07 51.05)", user_id=user.id)
+    db.add(spot)
+    await db.flush()
+    await db.execute(text("UPDATE spots SET created_at = created_at - :age WHERE id = :id"), {"age": age, "id": spot.id})
+    await db.refresh(spot)
+    await trending.bump(db, spot.id, trending.NEW_SPOT_WEIGHT, spot.created_at)
+    return user, spot
+
+
+async def _score(db, spot_id):
+    return (await db.execute(text("SELECT trending_score FROM spots WHERE id = :id"), {"id": spot_id})).scalar_one()
+
+
+async def _epoch(db):
+    return (await db.execute(text("SELECT epoch FROM trending_epoch WHERE id = 1"))).scalar_one()
+
+
+def _weight(at, epoch):
+    return math.exp(trending.DECAY_PER_SECOND * (at - epoch).total_seconds())
+
+
+async def test_bump_weights_the_event_at_its_time(pg):
+    async with pg() as db:
+        _, spot = await _spot(db)
+        epoch = await _epoch(db)
+        before = await _score(db, spot.id)
+        await trending.bump(db, spot.id, 2.0, epoch)
+        await trending.bump(db, spot.id, 4.0, epoch - timedelta(hours=trending.HALF_LIFE_HOURS))
+        assert await _score(db, spot.id) - before == pytest.approx(4.0)
+
+
+async def test_flipping_and_removing_a_vote_undo_exactly_what_it_added(pg):
+    async with pg() as db:
+        user, spot = await _spot(db, age=timedelta(days=3))
+        baseline = await _score(db, spot.id)
+        vote = Vote(spot_id=spot.id, user_id=user.id, value=1)
+        db.add(vote)
+        await db.flush()
+        await db.execute(text("UPDATE votes SET created_at = created_at - interval '2 days'"))
+        await db.refresh(vote)
+        await trending.bump(db, spot.id, trending.VOTE_WEIGHT, vote.created_at)
+        weight = _weight(vote.created_at, await _epoch(db))
+
+        # Flipped a day later, the vote still counts at its created_at.
+        await trending.bump(db, spot.id, -2 * trending.VOTE_WEIGHT, vote.created_at)
+        vote.value = -1
+        await db.flush()
+        assert await _score(db, spot.id) == pytest.approx(baseline - weight)
+
+        # Reconciliation agrees with the incremental score.
+        await trending.reconcile_chunk(db, {"prefix": f"{spot.id.int >> 120:02x}"})
+        assert await _score(db, spot.id) == pytest.approx(baseline - weight)
+
+        await db.delete(vote)
+        await trending.bump(db, spot.id, -vote.value * trending.VOTE_WEIGHT, vote.created_at)
+        assert await _score(db, spot.id) == pytest.approx(baseline)
+
+
+async def test_rescale_rebases_every_chunk_and_bumps_follow_its_progress(pg):
+    low, high = uuid.UUID(int=1 << 120), uuid.UUID(int=200 << 120)
+    async with pg() as db:
+        await db.execute(text("UPDATE trending_epoch SET epoch = epoch - interval '1 day'"))
+        await _spot(db, low)
+        await _spot(db, high)
+        await db.commit()
+        old_epoch = await _epoch(db)
+        low_score, high_score = await _score(db, low), await _score(db, high)
+
+        # Simulate a rescale interrupted after the low chunk.
+        new_epoch = old_epoch + timedelta(days=1)
+        factor = math.exp(-trending.DECAY_PER_SECOND * timedelta(days=1).total_seconds())
+        await db.execute(text("UPDATE spots SET trending_score = trending_score * :f WHERE id = :id"), {"f": factor, "id": low})
+        await db.execute(
+            text("UPDATE trending_epoch SET pending_epoch = :at, rescaled_below = :below"),
+            {"at": new_epoch, "below": uuid.UUID(int=2 << 120)},
+        )
+        # Each bump is relative to its row's epoch.
+        await trending.bump(db, low, 1.0, new_epoch)
+        await trending.bump(db, high, 1.0, old_epoch)
+        await db.commit()
+
+        await trending.rescale(db, {})
+        assert (await _epoch(db)) == new_epoch
+        state = (await db.execute(text("SELECT pending_epoch, rescaled_below FROM trending_epoch"))).one()
+        assert tuple(state) == (None, None)
+        # The low chunk was not rescaled a second time.
+        assert await _score(db, low) == pytest.approx(low_score * factor + 1.0)
+        assert await _score(db, high) == pytest.approx((high_score + 1.0) * factor)
@@ -0,0 +1,39 @@
+import pytest
+
+from app import geohash, viewport
+
+
+def _area(box):
+    west, south, east, north = box
+    return (east - west) * (north - south)
+
+
+def test_difference_of_a_pan_is_the_newly_exposed_strips():
+    # Panned north-east by a tenth of the view.
+    pieces = viewport.difference((0.1, 0.1, 1.1, 1.1), (0.0, 0.0, 1.0, 1.0))
+    assert pieces == [(0.1, 1.0, 1.1, 1.1), (1.0, 0.1, 1.1, 1.0)]
+    assert sum(map(_area, pieces)) == pytest.approx(1 - 0.9 * 0.9)
+
+
+def test_difference_edge_cases():
+    box = (0.0, 0.0, 1.0, 1.0)
+    assert viewport.difference(box, box) == []
+    # Zoomed in: nothing new.
+    assert viewport.difference((0.2, 0.2, 0.8, 0.8), box) == []
+    # Zoomed out: a ring of four pieces around the old view.
+    assert len(viewport.difference((-1.0, -1.0, 2.0, 2.0), box)) == 4
+    # No overlap: the whole new view.
+    assert viewport.difference((5.0, 5.0, 6.0, 6.0), box) == [(5.0, 5.0, 6.0, 6.0)]
+
+
+def test_missing_tiles_skips_held_tiles():
+    box = (-114.2, 51.0, -113.9, 51.1)
+    tiles = geohash.cover(*box, 5)
+    assert viewport.missing_tiles(box, 5, tiles[:2]) == tiles[2:]
+    with pytest.raises(ValueError):
+        viewport.missing_tiles(box, 7, [])
+
+
+def test_empty_area():
+    assert viewport.Area().is_empty()
+    assert not viewport.Area(tiles=("c3nf",)).is_empty()
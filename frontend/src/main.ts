@@ -1,9 +1,10 @@
-import { createApp } from 'vue';
+import { createApp, watch } from 'vue';
 import { createPinia } from 'pinia';
 import App from './App.vue';
 import './style.css';
 import axios from 'axios';
 import { useAuthStore } from './stores/auth';
+import { useSpotsStore } from './stores/spots';
 import Toast from 'vue-toastification';
 import 'vue-toastification/dist/index.css';
 
@@ -26,4 +27,11 @@ axios.interceptors.request.use(config => {
   return config;
 });
 
+// Cached spots carry the signed-in user's `my_vote`.
+const spotsStore = useSpotsStore(pinia);
+watch(
+  () => authStore.token,
+  () => spotsStore.clearTileCache()
+);
+
 app.mount('#app');
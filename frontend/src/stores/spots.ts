@@ -1,6 +1,7 @@
 import { defineStore } from 'pinia';
 import { ref, readonly, computed } from 'vue';
 import axios from 'axios';
+import { cellSize, cover, encode } from '@/utils/geohash';
 
 export interface User {
   id: string;
@@ -30,6 +31,7 @@ export interface Spot {
   user_id?: string;
   created_at: string;
   updated_at?: string;
+  geohash?: string | null;
   comments?: Comment[];
   score: number;
   my_vote?: number | null;
@@ -44,6 +46,22 @@ export interface SpotCreatePayload {
   };
 }
 
+export interface DuplicateCandidate {
+  id: string;
+  short_id: string;
+  name: string;
+  distance_m: number;
+  name_similarity: number;
+}
+
+/** Confirmation text for creating a spot despite likely duplicates nearby. */
+export function duplicatePrompt(candidates: DuplicateCandidate[]): string {
+  const list = candidates
+    .map(c => `• ${c.name} (${Math.round(c.distance_m)} m away)`)
+    .join('\n');
+  return `This looks like a spot that's already on the map:\n${list}\n\nCreate it anyway?`;
+}
+
 export interface SpotUpdatePayload {
   name?: string;
   description?: string;
@@ -53,11 +71,64 @@ export interface SpotUpdatePayload {
   };
 }
 
+export interface Bounds {
+  north: number;
+  south: number;
+  east: number;
+  west: number;
+}
+
+/** Tiles kept in memory; the least recently used are dropped first. */
+const MAX_CACHED_TILES = 256;
+/** Most tiles a viewport is split into; sets the tile precision per zoom. */
+const MAX_VIEW_TILES = 32;
+/** Page size of tile requests; a response this long may have been cut off. */
+const TILE_PAGE_SIZE = 500;
+
+function inBounds(spot: Spot, bounds: Bounds): boolean {
+  const [lng, lat] = spot.location.coordinates;
+  return (
+    lng >= bounds.west &&
+    lng <= bounds.east &&
+    lat >= bounds.south &&
+    lat <= bounds.north
+  );
+}
+
+function spotGeohash(spot: Spot): string {
+  const [lng, lat] = spot.location.coordinates;
+  return spot.geohash ?? encode(lng, lat, 9);
+}
+
+/** The finest tile precision (up to 6, ~1 km) at which `bounds` spans few tiles. */
+function tilePrecision(bounds: Bounds): number {
+  for (let precision = 6; precision > 1; precision--) {
+    const [width, height] = cellSize(precision);
+    const columns = Math.ceil((bounds.east - bounds.west) / width) + 1;
+    const rows = Math.ceil((bounds.north - bounds.south) / height) + 1;
+    if (columns * rows <= MAX_VIEW_TILES) {
+      return precision;
+    }
+  }
+  return 1;
+}
+
+function viewTiles(bounds: Bounds, precision = tilePrecision(bounds)): string[] {
+  const { west, south, east, north } = bounds;
+  return cover(west, south, east, north, precision);
+}
+
 export const useSpotsStore = defineStore('spots', () => {
   const spots = ref<Spot[]>([]);
   const isLoading = ref(false);
   const error = ref<string | null>(null);
   const searchQuery = ref('');
+  // Loaded spots by geohash tile, least recently used first. Plain (not
+  // reactive): only `spots` is rendered.
+  const tiles = new Map<string, Spot[]>();
+  let view: Bounds | null = null;
+  let controller: AbortController | null = null;
+  let inflightKey = '';
 
   const filteredSpots = computed(() => {
     if (!searchQuery.value) {
@@ -72,30 +143,165 @@ export const useSpotsStore = defineStore('spots', () => {
     );
   });
 
-  async function fetchSpots(bounds?: {
-    north: number;
-    south: number;
-    east: number;
-    west: number;
-  }) {
+  function cachedTile(tile: string): Spot[] | undefined {
+    const hit = tiles.get(tile);
+    if (hit) {
+      tiles.delete(tile);
+      tiles.set(tile, hit);
+      return hit;
+    }
+    // Zoomed in: cut the tile out of a coarser one already loaded.
+    for (let length = tile.length - 1; length > 0; length--) {
+      const parent = tiles.get(tile.slice(0, length));
+      if (parent) {
+        return parent.filter(s => spotGeohash(s).startsWith(tile));
+      }
+    }
+    return undefined;
+  }
+
+  function cacheTile(tile: string, tileSpots: Spot[]) {
+    tiles.delete(tile);
+    tiles.set(tile, tileSpots);
+    while (tiles.size > MAX_CACHED_TILES) {
+      tiles.delete(tiles.keys().next().value!);
+    }
+  }
+
+  /** Forget every cached tile containing `spot`, so the next pan reloads them. */
+  function dropTilesOf(spot: Spot) {
+    const hash = spotGeohash(spot);
+    for (const tile of [...tiles.keys()]) {
+      if (hash.startsWith(tile)) {
+        tiles.delete(tile);
+      }
+    }
+  }
+
+  /** Forget all loaded tiles, e.g. when the user (and so `my_vote`) changes. */
+  function clearTileCache() {
+    tiles.clear();
+  }
+
+  /** Show the cached spots in the current view, plus `extra` not cached. */
+  function render(extra: Spot[] = []) {
+    const bounds = view;
+    if (!bounds) {
+      return;
+    }
+    const byId = new Map<string, Spot>();
+    for (const tile of viewTiles(bounds)) {
+      for (const spot of cachedTile(tile) ?? []) {
+        byId.set(spot.id, spot);
+      }
+    }
+    for (const spot of extra) {
+      byId.set(spot.id, spot);
+    }
+    spots.value = [...byId.values()].filter(s => inBounds(s, bounds));
+  }
+
+  /**
+   * Load the spots in `bounds` (all spots without). Only geohash tiles not
+   * loaded before are requested; a newer call aborts an older request
+   * unless it is waiting for the same tiles.
+   */
+  async function fetchSpots(bounds?: Bounds) {
+    view = bounds ?? null;
+    let params: Record<string, string | number> = {};
+    let missing: string[] = [];
+    let precision = 0;
+    if (bounds) {
+      precision = tilePrecision(bounds);
+      const wanted = viewTiles(bounds, precision);
+      const have = wanted.filter(tile => cachedTile(tile) !== undefined);
+      missing = wanted.filter(tile => !have.includes(tile));
+      if (missing.length === 0) {
+        controller?.abort();
+        render();
+        return;
+      }
+      params = {
+        ...bounds,
+        tile_precision: precision,
+        have_tiles: have.join(','),
+        limit: TILE_PAGE_SIZE,
+      };
+    }
+    const key = bounds ? missing.join(',') : '*';
+    if (controller && key === inflightKey) {
+      return; // the request on its way renders the latest `view`
+    }
+
+    controller?.abort();
+    const current = new AbortController();
+    controller = current;
+    inflightKey = key;
     isLoading.value = true;
     error.value = null;
     try {
-      const config = bounds ? { params: bounds } : {};
-      const response = await axios.get('/api/spots/', config);
-      spots.value = response.data;
+      const response = await axios.get('/api/spots/', {
+        params,
+        signal: current.signal,
+      });
+      const fresh: Spot[] = response.data;
+      const complete = bounds !== undefined && fresh.length < TILE_PAGE_SIZE;
+      if (complete) {
+        const byTile = new Map(missing.map(tile => [tile, [] as Spot[]]));
+        for (const spot of fresh) {
+          byTile.get(spotGeohash(spot).slice(0, precision))?.push(spot);
+        }
+        byTile.forEach((tileSpots, tile) => cacheTile(tile, tileSpots));
+      }
+      if (controller !== current) {
+        return; // superseded; the newer request renders
+      }
+      if (bounds) {
+        render(complete ? [] : fresh);
+      } else {
+        spots.value = fresh;
+      }
     } catch (e: any) {
+      if (axios.isCancel(e)) {
+        return;
+      }
       console.error('Failed to fetch spots', e);
       error.value = 'Could not load spots. Please try again later.';
     } finally {
-      isLoading.value = false;
+      if (controller === current) {
+        controller = null;
+        inflightKey = '';
+        isLoading.value = false;
+      }
     }
   }
 
-  async function addSpot(spotData: SpotCreatePayload) {
+  /**
+   * Create a spot. If the server reports likely duplicates, `confirmDuplicate`
+   * decides whether to create it anyway; returns whether a spot was created.
+   */
+  async function addSpot(
+    spotData: SpotCreatePayload,
+    confirmDuplicate: (candidates: DuplicateCandidate[]) => boolean = () => false
+  ): Promise<boolean> {
     try {
-      const response = await axios.post('/api/spots/', spotData);
+      let response;
+      try {
+        response = await axios.post('/api/spots/', spotData);
+      } catch (e: any) {
+        if (!axios.isAxiosError(e) || e.response?.status !== 409) {
+          throw e;
+        }
+        if (!confirmDuplicate(e.response.data?.candidates ?? [])) {
+          return false;
+        }
+        response = await axios.post('/api/spots/', spotData, {
+          params: { force: true },
+        });
+      }
+      dropTilesOf(response.data);
       spots.value.push(response.data);
+      return true;
     } catch (e: any) {
       console.error('Failed to add spot', e);
       // Optionally re-throw or handle error state
@@ -112,7 +318,10 @@ export const useSpotsStore = defineStore('spots', () => {
       );
       console.log('Update response:', response.data);
       const index = spots.value.findIndex(s => s.short_id === spotId);
+      dropTilesOf(response.data);
       if (index !== -1) {
+        // It may have moved out of its old tile.
+        dropTilesOf(spots.value[index]);
         spots.value[index] = response.data;
         console.log('Spot updated in store');
       }
@@ -125,6 +334,10 @@ export const useSpotsStore = defineStore('spots', () => {
   async function deleteSpot(spotId: string) {
     try {
       await axios.delete(`/api/spots/${spotId}/`);
+      const deleted = spots.value.find(s => s.id === spotId);
+      if (deleted) {
+        dropTilesOf(deleted);
+      }
       spots.value = spots.value.filter(s => s.id !== spotId);
     } catch (e: any) {
       console.error('Failed to delete spot', e);
@@ -185,6 +398,13 @@ export const useSpotsStore = defineStore('spots', () => {
     if (idx !== -1) {
       spots.value[idx] = serverSpot;
     }
+    // Votes do not move a spot: patch the cached copy instead of reloading.
+    for (const tileSpots of tiles.values()) {
+      const cached = tileSpots.findIndex(s => s.id === serverSpot.id);
+      if (cached !== -1) {
+        tileSpots[cached] = serverSpot;
+      }
+    }
   }
 
   return {
@@ -194,6 +414,7 @@ export const useSpotsStore = defineStore('spots', () => {
     isLoading: readonly(isLoading),
     error: readonly(error),
     fetchSpots,
+    clearTileCache,
     addSpot,
     updateSpot,
     deleteSpot,
@@ -0,0 +1,110 @@
+/**
+ * Geohash helpers matching backend_py/app/geohash.py (and PostGIS
+ * `ST_GeoHash`), so tile keys computed here line up with `spot.geohash`.
+ * Arguments are lng/lat ordered like GeoJSON.
+ */
+
+const BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz';
+
+/** west, south, east, north */
+export type Bounds = [number, number, number, number];
+
+export function encode(lng: number, lat: number, precision: number): string {
+  let west = -180;
+  let east = 180;
+  let south = -90;
+  let north = 90;
+  let hash = '';
+  let value = 0;
+  let bits = 0;
+  let even = true; // bits alternate lng, lat, starting with lng
+  while (hash.length < precision) {
+    if (even) {
+      const mid = (west + east) / 2;
+      value <<= 1;
+      if (lng >= mid) {
+        value |= 1;
+        west = mid;
+      } else {
+        east = mid;
+      }
+    } else {
+      const mid = (south + north) / 2;
+      value <<= 1;
+      if (lat >= mid) {
+        value |= 1;
+        south = mid;
+      } else {
+        north = mid;
+      }
+    }
+    even = !even;
+    if (++bits === 5) {
+      hash += BASE32[value];
+      value = 0;
+      bits = 0;
+    }
+  }
+  return hash;
+}
+
+export function bounds(geohash: string): Bounds {
+  let west = -180;
+  let east = 180;
+  let south = -90;
+  let north = 90;
+  let even = true;
+  for (const char of geohash) {
+    const value = BASE32.indexOf(char);
+    if (value < 0) {
+      throw new Error(`invalid geohash: ${geohash}`);
+    }
+    for (let bit = 4; bit >= 0; bit--) {
+      const on = (value >> bit) & 1;
+      if (even) {
+        const mid = (west + east) / 2;
+        if (on) west = mid;
+        else east = mid;
+      } else {
+        const mid = (south + north) / 2;
+        if (on) south = mid;
+        else north = mid;
+      }
+      even = !even;
+    }
+  }
+  return [west, south, east, north];
+}
+
+/** Width and height in degrees of a cell of `precision`. */
+export function cellSize(precision: number): [number, number] {
+  const lngBits = Math.ceil((precision * 5) / 2);
+  const latBits = Math.floor((precision * 5) / 2);
+  return [360 / 2 ** lngBits, 180 / 2 ** latBits];
+}
+
+/** The cells of `precision` that intersect a bounding box, row by row from the south-west. */
+export function cover(
+  west: number,
+  south: number,
+  east: number,
+  north: number,
+  precision: number
+): string[] {
+  const [cellWest, cellSouth, cellEast, cellNorth] = bounds(
+    encode(west, south, precision)
+  );
+  const width = cellEast - cellWest;
+  const height = cellNorth - cellSouth;
+  const columns = Math.max(1, Math.ceil((east - cellWest) / width));
+  const rows = Math.max(1, Math.ceil((north - cellSouth) / height));
+  const cells = new Set<string>();
+  for (let row = 0; row < rows; row++) {
+    const lat = Math.min(cellSouth + (row + 0.5) * height, 90 - height / 2);
+    for (let column = 0; column < columns; column++) {
+      const lng = cellWest + (column + 0.5) * width;
+      cells.add(encode(((lng + 540) % 360) - 180, lat, precision));
+    }
+  }
+  return [...cells];
+}
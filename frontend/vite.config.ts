@@ -17,6 +17,7 @@ export default defineConfig({
       '/api': {
         target: process.env.VITE_BACKEND_URL || 'http://localhost:3000',
         changeOrigin: true,
+        xfwd: true,
       },
     },
     watch: {